@@ -1,4 +1,5 @@
 from collections import namedtuple
+from squares import square_table
 
 # Using a class for Ability for potential future methods, though namedtuple is also good.
 class Ability:
@@ -7,131 +8,159 @@ class Ability:
         self.description = description
         self.effect_logic = effect_logic
         self.cooldown_max = cooldown_max
-        self.target_type = target_type # e.g., 'empty_square_range_2', 'ally_piece_adjacent'
-        self.range_limit = range_limit # For abilities like Teleport
+        self.target_type = target_type # A key of TARGET_RULES, e.g. 'empty_square', 'ally_piece_adjacent'
+        self.range_limit = range_limit # Chebyshev reach for targeted abilities (e.g. 2 for Teleport (2))
+        self._reach = {} # (width, height) -> (per-square reach bitmasks, per-square reach square lists)
+        self.reach_tables(8, 8) # Precompiled for the standard board
 
     def __repr__(self):
         return f"Ability({self.name}, CD:{self.cooldown_max}, Target:{self.target_type})"
 
+    def reach_tables(self, width=8, height=8):
+        """Per-square (bitmask, squares) of the targets within range_limit (the own square excluded), compiled once per board size."""
+        tables = self._reach.get((width, height))
+        if tables is None:
+            reach = self.range_limit if self.range_limit is not None else DEFAULT_RANGE[self.target_type]
+            offsets = tuple((dr, dc) for dr in range(-reach, reach + 1) for dc in range(-reach, reach + 1) if (dr, dc) != (0, 0))
+            targets = square_table(width, height).steps(offsets)
+            tables = self._reach[(width, height)] = (tuple(sum(1 << t for t in squares) for squares in targets), targets)
+        return tables
+
+    def in_reach(self, start, target, width=8, height=8):
+        """True if square target is within reach of square start."""
+        masks, _ = self.reach_tables(width, height)
+        return bool(masks[start] >> target & 1)
+
+    def target_candidates(self, game, piece):
+        """Targets the ability could be aimed at from piece's square ([None] for self-targeted abilities)."""
+        rule = TARGET_RULES[self.target_type]
+        if rule is None: return [None]
+        board = game.board
+        _, squares = self.reach_tables(board.width, board.height)
+        targets = []
+        for sq in squares[piece.position]:
+            if board.tile_effects[sq] == board.LAVA_EFFECT: continue
+            occupant = board.grid[sq]
+            if rule == 'empty' and occupant is None or occupant is not None and \
+               (rule == 'ally' and occupant.color == piece.color or rule == 'enemy' and occupant.color != piece.color):
+                targets.append(sq)
+        return targets
+
+# What a target square must hold for each target type (None: the ability takes no target)
+TARGET_RULES = {'self': None, 'empty_square': 'empty', 'ally_piece_adjacent': 'ally', 'enemy_piece_adjacent': 'enemy'}
+DEFAULT_RANGE = {'self': 0, 'empty_square': 2, 'ally_piece_adjacent': 1, 'enemy_piece_adjacent': 1}
+
 # --- Effect Logic Functions ---
 # These functions will modify the board and piece states.
 # They should return True if the ability was successfully used, False otherwise.
 
-def teleport_effect(game, piece, target_coords):
+def teleport_effect(game, piece, target_sq):
     """
-    Effect: Moves the piece to an empty target_coords if it's within range_limit.
+    Effect: Moves the piece to an empty target_sq if it's within range_limit.
     game: The current Game instance (provides access to board, etc.)
     piece: The piece activating the ability.
-    target_coords: The (row, col) tuple for the destination.
+    target_sq: The destination square (see squares.py).
     """
-    board = game.board
+    board = game.board; names = board.squares.names
     range_limit = piece.ability.range_limit if piece.ability and piece.ability.range_limit is not None else 2 # Default range
 
-    if not target_coords: # Basic check if a target is even provided (might be handled by input parser too)
+    if target_sq is None: # Basic check if a target is even provided (might be handled by input parser too)
         print("Teleport failed: No target square provided.")
         return False
 
     start_pos = piece.position
-    row_diff = abs(start_pos[0] - target_coords[0])
-    col_diff = abs(start_pos[1] - target_coords[1])
+    if piece.ability: in_range = piece.ability.in_reach(start_pos, target_sq, board.width, board.height)
+    else:
+        (sr, sc), (tr, tc) = board.squares.coords[start_pos], board.squares.coords[target_sq]
+        in_range = max(abs(sr - tr), abs(sc - tc)) <= range_limit
 
-    # Check if target is empty and within range (using Chebyshev distance for square range)
-    if board.get_piece(target_coords) is None and max(row_diff, col_diff) <= range_limit:
-        if start_pos == target_coords: # Cannot teleport to own square
+    # Check if target is empty and within range (Chebyshev distance, looked up in the ability's reach table)
+    if board.get_piece(target_sq) is None and in_range:
+        if start_pos == target_sq: # Cannot teleport to own square
             print(f"{piece} Teleport failed: Cannot teleport to the same square.")
             return False
 
-        board.grid[start_pos[0]][start_pos[1]] = None # Empty old square
-        board.grid[target_coords[0]][target_coords[1]] = piece # Place piece in new square
-        piece.position = target_coords
-        print(f"{piece} at {game.utils.coords_to_algebraic(start_pos)} teleported to {game.utils.coords_to_algebraic(target_coords)}.")
+        board.grid[start_pos] = None # Empty old square
+        board.grid[target_sq] = piece # Place piece in new square
+        piece.position = target_sq
+        game.invalidate_legal_moves()
+        print(f"{piece} at {names[start_pos]} teleported to {names[target_sq]}.")
         return True
     else:
-        if board.get_piece(target_coords) is not None:
-            print(f"{piece} Teleport failed: Target square {game.utils.coords_to_algebraic(target_coords)} is occupied by {board.get_piece(target_coords)}.")
+        if board.get_piece(target_sq) is not None:
+            print(f"{piece} Teleport failed: Target square {names[target_sq]} is occupied by {board.get_piece(target_sq)}.")
         else: # Out of range
-            print(f"{piece} Teleport failed: Target {game.utils.coords_to_algebraic(target_coords)} is out of range (max {range_limit} units).")
+            print(f"{piece} Teleport failed: Target {names[target_sq]} is out of range (max {range_limit} units).")
         return False
 
-def swap_ally_effect(game, piece, target_ally_coords):
+def swap_ally_effect(game, piece, target_ally_sq):
     """
-    Effect: Swaps the position of 'piece' with an allied piece at 'target_ally_coords'.
+    Effect: Swaps the position of 'piece' with an allied piece at 'target_ally_sq'.
     game: The current Game instance.
     piece: The piece activating the ability.
-    target_ally_coords: The (row, col) of the allied piece to swap with.
+    target_ally_sq: The square of the allied piece to swap with.
     """
-    board = game.board
+    board = game.board; names = board.squares.names
 
-    if not target_ally_coords:
+    if target_ally_sq is None:
         print("Swap failed: No target piece provided.")
         return False
 
     start_pos_piece1 = piece.position
-    piece2 = board.get_piece(target_ally_coords)
+    piece2 = board.get_piece(target_ally_sq)
 
     if piece2 is None:
-        print(f"{piece} Swap failed: No piece at target square {game.utils.coords_to_algebraic(target_ally_coords)}.")
+        print(f"{piece} Swap failed: No piece at target square {names[target_ally_sq]}.")
         return False
     if piece2.color != piece.color:
-        print(f"{piece} Swap failed: Cannot swap with opponent's piece {piece2} at {game.utils.coords_to_algebraic(target_ally_coords)}.")
+        print(f"{piece} Swap failed: Cannot swap with opponent's piece {piece2} at {names[target_ally_sq]}.")
         return False
     if piece == piece2: # Cannot swap with oneself
         print(f"{piece} Swap failed: Cannot swap with itself.")
         return False
+    if piece.ability and not piece.ability.in_reach(start_pos_piece1, target_ally_sq, board.width, board.height):
+        print(f"{piece} Swap failed: {piece2} at {names[target_ally_sq]} is out of reach.")
+        return False
 
     # Perform swap
-    board.grid[start_pos_piece1[0]][start_pos_piece1[1]] = piece2
-    board.grid[target_ally_coords[0]][target_ally_coords[1]] = piece
+    board.grid[start_pos_piece1] = piece2
+    board.grid[target_ally_sq] = piece
 
-    piece.position = target_ally_coords
+    piece.position = target_ally_sq
     piece2.position = start_pos_piece1
+    game.invalidate_legal_moves()
 
-    print(f"{piece} at {game.utils.coords_to_algebraic(start_pos_piece1)} swapped with {piece2} at {game.utils.coords_to_algebraic(target_ally_coords)}.")
+    print(f"{piece} at {names[start_pos_piece1]} swapped with {piece2} at {names[target_ally_sq]}.")
     return True
 
-# --- Ability Definitions ---
-ABILITIES_POOL = {
-    "Teleport_R2": Ability(name="Teleport (2)",
-                           description="Teleport to an empty square within 2 units.",
-                           effect_logic=teleport_effect,
-                           cooldown_max=4,
-                           target_type='empty_square', # Generic, actual validation in effect_logic
-                           range_limit=2),
-    "SwapWithAlly_Adj": Ability(name="Swap Ally (Adj)",
-                                description="Swap places with an adjacent allied piece.",
-                                effect_logic=swap_ally_effect,
-                                cooldown_max=5,
-                                target_type='ally_piece_adjacent'), # Adjacency check could be part of effect or pre-check
+# --- Ability Registry ---
+# One row per ability: pool key, name, description, effect (key of EFFECTS), cooldown,
+# target type (key of TARGET_RULES), range (None: DEFAULT_RANGE of the target type) and
+# the random-assignment weight per piece type. Reach tables are compiled when a row is
+# registered, so a new ability only needs a row here (and an effect function).
+EFFECTS = {'teleport': teleport_effect, 'swap_ally': swap_ally_effect}
+
+ABILITY_TABLE = (
+    ("Teleport_R2", "Teleport (2)", "Teleport to an empty square within 2 units.", 'teleport', 4, 'empty_square', 2,
+     {"PAWN": 0.6, "ROOK": 0.5, "KNIGHT": 0.3, "BISHOP": 0.5, "QUEEN": 0.8}), # Queen with teleport is very strong
+    ("SwapWithAlly_Adj", "Swap Ally (Adj)", "Swap places with an adjacent allied piece.", 'swap_ally', 5,
+     'ally_piece_adjacent', None, {"PAWN": 0.4, "KNIGHT": 0.7, "BISHOP": 0.5, "QUEEN": 0.2}),
     # Future abilities:
-    # "Stun": Ability("Stun", "Stun an adjacent enemy piece for 1 turn.", stun_effect, cooldown_max=3, target_type='enemy_piece_adjacent'),
-}
-
-# --- Piece Ability Assignments ---
-# Defines which abilities pieces can get, and the weight for random selection.
-# (Ability_Object, weight)
-PIECE_ABILITIES = {
-    "Pawn": [
-        (ABILITIES_POOL["Teleport_R2"], 0.6),
-        (ABILITIES_POOL["SwapWithAlly_Adj"], 0.4), # Pawns might swap with other pawns or backline pieces
-    ],
-    "Rook": [
-        (ABILITIES_POOL["Teleport_R2"], 0.5), # Could be a shorter range teleport for rooks or a different ability
-        # (ABILITIES_POOL["Barricade"], 0.5),
-    ],
-    "Knight": [
-        (ABILITIES_POOL["SwapWithAlly_Adj"], 0.7),
-        (ABILITIES_POOL["Teleport_R2"], 0.3), # Knights are already mobile, so teleport is less impactful or differently used
-    ],
-    "Bishop": [
-        (ABILITIES_POOL["Teleport_R2"], 0.5),
-        (ABILITIES_POOL["SwapWithAlly_Adj"], 0.5), # Bishops swapping could open diagonal lines
-    ],
-    "Queen": [
-        (ABILITIES_POOL["Teleport_R2"], 0.8), # Queen with teleport is very strong
-        (ABILITIES_POOL["SwapWithAlly_Adj"], 0.2),
-    ],
-    "King": [] # Kings do not get abilities
-}
+    # ("Stun", "Stun", "Stun an adjacent enemy piece for 1 turn.", 'stun', 3, 'enemy_piece_adjacent', None, {"KNIGHT": 0.3}),
+)
+
+ABILITIES_POOL = {} # key -> Ability
+# Which abilities pieces can get, and the weight for random selection: piece type -> [(Ability, weight)]
+PIECE_ABILITIES = {piece_type: [] for piece_type in ("PAWN", "ROOK", "KNIGHT", "BISHOP", "QUEEN", "KING")} # Kings get none
+
+def register_abilities(table):
+    """Adds the abilities of a table shaped like ABILITY_TABLE to ABILITIES_POOL and PIECE_ABILITIES."""
+    for key, name, description, effect, cooldown, target_type, range_limit, weights in table:
+        if target_type not in TARGET_RULES: raise ValueError(f"Ability {key}: unknown target type {target_type!r}.")
+        ability = ABILITIES_POOL[key] = Ability(name, description, EFFECTS[effect], cooldown, target_type, range_limit)
+        for piece_type, weight in weights.items(): PIECE_ABILITIES.setdefault(piece_type, []).append((ability, weight))
+
+register_abilities(ABILITY_TABLE)
 
 if __name__ == '__main__':
     # Basic test for ability definition
@@ -157,7 +186,7 @@ if __name__ == '__main__':
     #         self.ptype = ptype
     #         self.ability = ability_obj
     #         self.ability_cooldown = 0
-    #         self.position = (0,0) # dummy
+    #         self.position = 0 # dummy
     #         self.color = "white"
     #     def __repr__(self):
     #         return f"{self.color} {self.ptype}"
@@ -167,6 +196,6 @@ if __name__ == '__main__':
     # print(f"\nMock Pawn has ability: {mock_pawn.ability.name}")
 
     # The effect functions teleport_effect and swap_ally_effect expect a 'game' object
-    # which has 'board' and 'utils', and a 'piece' object.
+    # which has a 'board', and a 'piece' object.
     # A full test would require more setup.
     print("\nNote: Effect logic functions require a game context to be fully tested.")
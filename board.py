@@ -1,5 +1,9 @@
 from pieces import Piece, Pawn, Rook, Knight, Bishop, Queen, King
+from utils import MAX_FILES
+from squares import square_table
+from timers import due_after, turn_clock, turns_left
 import random
+import sys
 
 NO_EFFECT = None
 LAVA_EFFECT = "lava"
@@ -13,14 +17,21 @@ FOG_SYMBOL = "~~~"
 ALL_TILE_EFFECTS = [LAVA_EFFECT, BUFF_SPEED_EFFECT, HEAL_TILE_EFFECT]
 TILE_EFFECT_WEIGHTS = [0.2, 0.4, 0.4]
 
+MIN_SIZE = 8
+MAX_SQUARES = 256 # Action codes and hash features number squares in one byte
+
 class Board:
-    def __init__(self, game_ref): # game_ref is the Game instance
+    def __init__(self, game_ref, width=8, height=8): # game_ref is the Game instance
+        if not (MIN_SIZE <= width <= MAX_FILES and MIN_SIZE <= height and width * height <= MAX_SQUARES):
+            raise ValueError(f"Unsupported board size {width}x{height}.")
         self.game = game_ref # Store reference to game instance
-        self.grid = [[None for _ in range(8)] for _ in range(8)]
-        self.tile_effects = [[NO_EFFECT for _ in range(8)] for _ in range(8)]
+        self.width = width; self.height = height
+        self.squares = square_table(width, height) # Integer square conversions (see squares.py)
+        self.grid = [None] * self.squares.count # Indexed by square, like tile_effects and visibility_grid
+        self.tile_effects = [NO_EFFECT] * self.squares.count
         self.board_evolution_timer = 0
         self.turns_before_evolution = 5
-        self.visibility_grid = [[False for _ in range(8)] for _ in range(8)]
+        self.visibility_grid = [False] * self.squares.count
         self.fog_of_war_on = True
         self.LAVA_EFFECT = LAVA_EFFECT
         self.NO_EFFECT = NO_EFFECT
@@ -29,122 +40,115 @@ class Board:
             "BISHOP": Bishop, "QUEEN": Queen, "KING": King
         }
         self.setup_pieces()
+        # Board evolution rolls come from this seed (drawn from the global RNG once the pieces
+        # are set up) and the full turn, so AI and search randomness cannot shift them
+        self.evolution_seed = random.getrandbits(64)
 
-    def create_piece_by_str_and_color(self, piece_type_name_str, color, position_tuple):
+    def create_piece_by_str_and_color(self, piece_type_name_str, color, square):
         """Creates and returns a new piece instance."""
         piece_type_upper = piece_type_name_str.upper()
         PieceClass = self.PIECE_CLASS_MAP.get(piece_type_upper)
         if PieceClass:
             # Piece constructor: color, position, piece_type_name, board_ref=None, abilities_module=None
             # abilities_module comes from game instance
-            new_piece = PieceClass(color, position_tuple, abilities_module=self.game.abilities_module)
+            new_piece = PieceClass(color, square, abilities_module=self.game.abilities_module)
             return new_piece
         # print(f"Error: Unknown piece type '{piece_type_name_str}' for creation.") # Debug
         return None
 
     def get_all_pieces(self):
-        pieces = []
-        for r in range(8):
-            for c in range(8):
-                if self.grid[r][c]: pieces.append(self.grid[r][c])
-        return pieces
-
-    def update_visibility(self, current_player_color):
-        self.visibility_grid = [[False for _ in range(8)] for _ in range(8)]
-        if not self.fog_of_war_on:
-            self.visibility_grid = [[True for _ in range(8)] for _ in range(8)]; return
+        return [p for p in self.grid if p]
 
+    def compute_visibility(self, viewer_color):
+        """Returns the visibility grid for viewer_color (None = omniscient) without changing board state."""
+        if not self.fog_of_war_on or viewer_color is None:
+            return [True] * self.squares.count
+        visibility = [False] * self.squares.count
         all_board_pieces_pos = {p.position for p in self.get_all_pieces() if p}
-        current_player_pieces = [p for p in self.get_all_pieces() if p and p.color == current_player_color]
+        current_player_pieces = [p for p in self.get_all_pieces() if p and p.color == viewer_color]
 
         for piece in current_player_pieces:
-            if self._is_on_board(piece.position[0], piece.position[1]):
-                 self.visibility_grid[piece.position[0]][piece.position[1]] = True
-            revealed_by_piece = piece.get_revealed_squares(self, all_board_pieces_pos)
-            for r, c in revealed_by_piece:
-                if self._is_on_board(r,c): self.visibility_grid[r][c] = True
-
-    def _is_on_board(self, r, c): return 0 <= r < 8 and 0 <= c < 8
-
-    def setup_pieces(self):
-        # Piece type names (strings) for the constructor
-        piece_configs = {
-            0: ("black", [("Rook", Rook), ("Knight", Knight), ("Bishop", Bishop), ("Queen", Queen),
-                          ("King", King), ("Bishop", Bishop), ("Knight", Knight), ("Rook", Rook)]),
-            1: ("black", [("Pawn", Pawn)] * 8),
-            6: ("white", [("Pawn", Pawn)] * 8),
-            7: ("white", [("Rook", Rook), ("Knight", Knight), ("Bishop", Bishop), ("Queen", Queen),
-                          ("King", King), ("Bishop", Bishop), ("Knight", Knight), ("Rook", Rook)])
-        }
-
-        for row_idx, (color, piece_row_config) in piece_configs.items():
-            for col_idx, (type_name, PieceClass) in enumerate(piece_row_config if isinstance(piece_row_config[0], tuple) else [(name_class[0], name_class[1]) for name_class in piece_row_config for _i in range(1)] if row_idx == 1 or row_idx == 6 else []):
-                # Corrected enumeration for pawn rows
-                if row_idx == 1 or row_idx == 6: # Pawn rows
-                     type_name_for_pawn_row = piece_row_config[0][0] # "Pawn"
-                     PieceClass_for_pawn_row = piece_row_config[0][1] # Pawn class
-                     # Piece constructor: color, position, piece_type_name, board_ref=None, abilities_module=None
-                     piece = PieceClass_for_pawn_row(color, (row_idx, col_idx), abilities_module=self.game.abilities_module)
-
+            visibility[piece.position] = True
+            for sq in piece.get_revealed_squares(self, all_board_pieces_pos): visibility[sq] = True
+        return visibility
 
-                else: # Back ranks
-                     piece = PieceClass(color, (row_idx, col_idx), abilities_module=self.game.abilities_module)
+    def update_visibility(self, current_player_color):
+        self.visibility_grid = self.compute_visibility(current_player_color)
 
-                self.grid[row_idx][col_idx] = piece
-                # assign_ability is now called within Piece.__init__ if abilities_module is provided,
-                # or can be called after if abilities_module is resolved later.
-                # Let's ensure it's called after piece creation if not in init.
-                # Current Piece.__init__ does not call assign_ability. It expects abilities_module for later call.
-                # The plan was "assign_ability(self, abilities_module)"
-                # The pieces.py has assign_ability(self) which uses self.abilities_module.
-                # So, Piece.__init__ correctly stores abilities_module, then assign_ability is called.
-                piece.assign_ability() # This should now work as abilities_module is set on piece.
+    def back_rank(self):
+        """Back-rank piece classes: the standard rank, widened with alternating knights and bishops on wider boards."""
+        extra = [(Knight, Bishop)[i % 2] for i in range(self.width - 8)]
+        left, right = extra[:len(extra) // 2], extra[len(extra) // 2:]
+        return [Rook, Knight, Bishop] + left + [Queen, King] + right[::-1] + [Bishop, Knight, Rook]
 
+    def setup_pieces(self):
+        back_rank = self.back_rank()
+        piece_configs = {0: ("black", back_rank), 1: ("black", [Pawn] * self.width),
+                         self.height - 2: ("white", [Pawn] * self.width), self.height - 1: ("white", back_rank)}
+        for row_idx, (color, piece_classes) in piece_configs.items():
+            for col_idx, PieceClass in enumerate(piece_classes):
+                # Piece constructor: color, position, piece_type_name, board_ref=None, abilities_module=None
+                sq = row_idx * self.width + col_idx
+                piece = PieceClass(color, sq, abilities_module=self.game.abilities_module)
+                self.grid[sq] = piece
+                piece.assign_ability() # Uses the abilities_module stored on the piece
 
     def generate_tile_effects(self, game_instance): # game_instance is self.game from Board's perspective
         print("\n--- The Board is Evolving! ---")
-        num_effects = random.randint(2,4); generated=0; attempts=0
+        scale = max(1, self.width * self.height // 64) # More tiles on larger boards
+        rng = random.Random(self.evolution_seed + game_instance.full_turn_counter)
+        num_effects = rng.randint(2 * scale, 4 * scale); generated=0; attempts=0
         kings = {p.position for p in self.get_all_pieces() if p.piece_type_name == "KING"}
         newly_affected = []
-        while generated < num_effects and attempts < 50:
-            attempts+=1; r,c = random.randint(0,7), random.randint(0,7)
-            effect = random.choices(ALL_TILE_EFFECTS, weights=TILE_EFFECT_WEIGHTS, k=1)[0]
-            if effect == self.LAVA_EFFECT and ((r,c) in kings or self.get_piece((r,c)) is not None): continue
-            self.tile_effects[r][c] = effect; generated+=1
-            sq_name = self.game.utils['coords_to_algebraic']((r,c))
-            print(f"Square {sq_name} is now {effect.upper()}!")
-            newly_affected.append(((r,c), effect))
+        while generated < num_effects and attempts < 50 * scale:
+            attempts+=1; r,c = rng.randint(0,self.height-1), rng.randint(0,self.width-1); sq = r*self.width+c
+            effect = rng.choices(ALL_TILE_EFFECTS, weights=TILE_EFFECT_WEIGHTS, k=1)[0]
+            if effect == self.LAVA_EFFECT and (sq in kings or self.get_piece(sq) is not None): continue
+            self.tile_effects[sq] = effect; generated+=1; self.game.invalidate_legal_moves()
+            print(f"Square {self.squares.names[sq]} is now {effect.upper()}!")
+            newly_affected.append((sq, effect))
         for (pos, effect) in newly_affected:
             if effect == self.LAVA_EFFECT:
                 p = self.get_piece(pos)
-                if p : print(f"{p} at {self.game.utils['coords_to_algebraic'](pos)} is on new LAVA! Destroyed."); self.grid[pos[0]][pos[1]] = None
+                if p : print(f"{p} at {self.squares.names[pos]} is on new LAVA! Destroyed."); self.grid[pos] = None
         self.board_evolution_timer = 0
 
-    def display(self, game_instance): # game_instance is self.game
-        print("\n  a    b    c    d    e    f    g    h")
-        print("  -----------------------------------------")
-        for r_idx in range(8):
-            l1=f"{8-r_idx}|"; l2=" |"
-            for c_idx in range(8):
-                vis = not self.fog_of_war_on or self.visibility_grid[r_idx][c_idx]
+    def frame_lines(self, visibility_grid=None):
+        """Returns the text lines of one board frame as seen through visibility_grid (None = current)."""
+        if visibility_grid is None: visibility_grid = self.visibility_grid
+        label_w = len(str(self.height)); pad = " " * label_w
+        files = pad + " " + "    ".join(chr(ord('a') + c) for c in range(self.width))
+        rule = pad + " " + "-" * (5 * self.width + 1)
+        lines = ["", files, rule]
+        for r_idx in range(self.height):
+            rank = self.height - r_idx
+            l1=f"{rank:>{label_w}}|"; l2=pad+"|"
+            for sq in range(r_idx * self.width, (r_idx + 1) * self.width):
+                vis = not self.fog_of_war_on or visibility_grid[sq]
                 if vis:
-                    p = self.get_piece((r_idx,c_idx)); l1+=f"{str(p):^5}" if p else "     "
-                    eff = self.tile_effects[r_idx][c_idx]
+                    p = self.grid[sq]; l1+=f"{str(p):^5}" if p else "     "
+                    eff = self.tile_effects[sq]
                     l2+=f"{TILE_EFFECT_SYMBOLS[eff]:^5}" if eff!=self.NO_EFFECT else (" ..  " if not p else "     ")
                 else: l1+=f"{FOG_SYMBOL:^5}"; l2+=f"{FOG_SYMBOL:^5}"
-            print(l1+f"|{8-r_idx}"); print(l2+"|")
-            if r_idx<7: print(" |-----|-----|-----|-----|-----|-----|-----|-----|")
-        print("  -----------------------------------------")
-        print("  a    b    c    d    e    f    g    h\n")
-        print(f"Tiles: LAVA | SPD+ | HEAL | FoW: {'ON' if self.fog_of_war_on else 'OFF'}")
+            lines.append(l1+f"|{rank}"); lines.append(l2+"|")
+            if r_idx<self.height-1: lines.append(pad + "|-----" * self.width + "|")
+        lines += [rule, files, "",
+                  f"Tiles: LAVA | SPD+ | HEAL | FoW: {'ON' if self.fog_of_war_on else 'OFF'}"]
+        return lines
+
+    def display(self, game_instance, renderer=None): # game_instance is self.game
+        """Prints the board for the current player; a renderer (see renderer.py) redraws only changed cells."""
+        if renderer is not None: renderer.render(self, game_instance.current_player); return
+        sys.stdout.write("\n".join(self.frame_lines()) + "\n")
 
 
-    def get_piece(self, position):
-        r,c = position; return self.grid[r][c] if self._is_on_board(r,c) else None
+    def get_piece(self, square):
+        return self.grid[square] if 0 <= square < self.squares.count else None
 
     def move_piece(self, start_pos, end_pos, game_instance): # game_instance is self.game
         piece_to_move = self.get_piece(start_pos)
         if not piece_to_move: return None
+        self.game.invalidate_legal_moves()
         if piece_to_move.has_speed_buff: piece_to_move.has_speed_buff = False
 
         captured_piece = self.get_piece(end_pos)
@@ -156,15 +160,15 @@ class Board:
             # print(f"{piece_to_move.color} gains {sp_val} SP for capturing {captured_piece.piece_type_name}") # Debug
             # print(f"{captured_piece.color} lost pieces: {self.game.player_lost_pieces[captured_piece.color]}") # Debug
 
-        sr,sc = start_pos; er,ec = end_pos
-        self.grid[er][ec] = piece_to_move; self.grid[sr][sc] = None
-        piece_to_move.position = (er,ec)
+        self.grid[end_pos] = piece_to_move; self.grid[start_pos] = None
+        piece_to_move.position = end_pos
 
-        eff = self.tile_effects[er][ec]
+        eff = self.tile_effects[end_pos]
         if eff == BUFF_SPEED_EFFECT and not piece_to_move.has_speed_buff:
             piece_to_move.has_speed_buff = True; print(f"{piece_to_move} landed on Speed Tile! Next move buffed.")
-        elif eff == HEAL_TILE_EFFECT and piece_to_move.ability and piece_to_move.ability_cooldown > 0:
-            orig_cd = piece_to_move.ability_cooldown
-            piece_to_move.ability_cooldown = max(0, orig_cd - 2)
-            print(f"{piece_to_move} on Heal Tile. Cooldown {orig_cd} -> {piece_to_move.ability_cooldown}.")
+        elif eff == HEAL_TILE_EFFECT and piece_to_move.ability and piece_to_move.ability_ready_at:
+            clock = turn_clock(self.game); orig_cd = turns_left(piece_to_move.ability_ready_at, clock)
+            piece_to_move.ability_ready_at = due_after(piece_to_move.color, clock, orig_cd - 2) # Moves the timer two turns earlier
+            self.game.timers.track(self.game, piece_to_move, 'cooldown')
+            print(f"{piece_to_move} on Heal Tile. Cooldown {orig_cd} -> {max(0, orig_cd - 2)}.")
         return captured_piece
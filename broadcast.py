@@ -0,0 +1,144 @@
+import struct
+
+from board import ALL_TILE_EFFECTS
+from features import ABILITY_IDS, PIECE_TYPES
+from timers import turn_clock, turns_left
+
+# Spectator broadcast. Observers subscribe to one view of the game: 'white' or 'black'
+# (that side's fog of war) or None (omniscient). After each ply, publish() computes each
+# subscribed view once, encodes it once as a compact binary delta against the previous
+# ply of that view, and hands the same bytes object to every subscriber of the view, so
+# the cost per ply grows with the number of distinct views, not the number of observers.
+#
+# Messages (big-endian):
+#   header  kind (B: KEYFRAME or DELTA), flags (B: bit 0 black to move, bit 1 game over,
+#           bits 2-3 winner: 0 none, 1 white, 2 black), ply (H), width (B), height (B),
+#           sp_white (H), sp_black (H), cell count (H)
+#   KEYFRAME  count cells, one per square in square order (see squares.py)
+#   DELTA     count (square (B), cell) pairs for the squares that changed
+#   cell    3 bytes: piece code (bits 0-3: 0 empty, 1-12 piece, FOG_CODE hidden) | tile
+#           code << 4 (0 none, 1-3 ALL_TILE_EFFECTS) | frozen << 6 | speed buff << 7,
+#           ability id (features.ABILITY_IDS, 0 none), cooldown turns left (capped at 255)
+# A new subscriber gets a keyframe first; ViewDecoder rebuilds the cells on the client.
+
+KEYFRAME, DELTA = 0, 1
+HEADER = struct.Struct('>BBHBBHHH')
+CELL = struct.Struct('>BBB')
+DELTA_CELL = struct.Struct('>BBBB')
+FOG_CODE = 15
+FOG_CELL = (FOG_CODE, 0, 0)
+EMPTY_CELL = (0, 0, 0)
+VIEWS = ('white', 'black', None)
+COLORS = ('white', 'black')
+PIECE_CODES = {(color, piece_type): 1 + i * len(PIECE_TYPES) + j
+               for i, color in enumerate(COLORS) for j, piece_type in enumerate(PIECE_TYPES)}
+CODE_PIECES = {code: key for key, code in PIECE_CODES.items()}
+TILE_CODES = {effect: i + 1 for i, effect in enumerate(ALL_TILE_EFFECTS)}
+CODE_TILES = {code: effect for effect, code in TILE_CODES.items()}
+
+def encode_cell(piece, effect, clock=0):
+    if piece is None: return (TILE_CODES.get(effect, 0) << 4, 0, 0)
+    return (PIECE_CODES[piece.color, piece.piece_type_name] | TILE_CODES.get(effect, 0) << 4 |
+            bool(piece.status_effects.get('frozen', 0)) << 6 | piece.has_speed_buff << 7,
+            ABILITY_IDS.get(piece.ability.name, 0) if piece.ability is not None else 0,
+            min(turns_left(piece.ability_ready_at, clock), 255))
+
+def decode_cell(cell):
+    """(piece (color, type) or None, tile effect or None, frozen, speed buff, ability id, cooldown); None if fogged."""
+    b0, ability_id, cooldown = cell
+    if b0 & 0x0F == FOG_CODE: return None
+    return (CODE_PIECES.get(b0 & 0x0F), CODE_TILES.get(b0 >> 4 & 3), bool(b0 & 0x40), bool(b0 & 0x80), ability_id, cooldown)
+
+def view_cells(game, viewer):
+    """Cells of game's board as viewer sees it (fogged squares hide both piece and tile)."""
+    board = game.board; clock = turn_clock(game)
+    if not board.fog_of_war_on or viewer is None: visibility = None
+    elif viewer == game.current_player: visibility = board.visibility_grid
+    else: visibility = board.compute_visibility(viewer)
+    return tuple(encode_cell(piece, effect, clock) if visibility is None or visibility[sq] else FOG_CELL
+                 for sq, (piece, effect) in enumerate(zip(board.grid, board.tile_effects)))
+
+def _header(kind, game, ply, count):
+    winner = {None: 0, 'white': 1, 'black': 2}[game.winner]
+    flags = (game.current_player == 'black') | game.game_over << 1 | winner << 2
+    return HEADER.pack(kind, flags, ply & 0xFFFF, game.board.width, game.board.height,
+                       min(game.player_sp['white'], 0xFFFF), min(game.player_sp['black'], 0xFFFF), count)
+
+def encode_keyframe(game, ply, cells):
+    return _header(KEYFRAME, game, ply, len(cells)) + b"".join(CELL.pack(*cell) for cell in cells)
+
+def encode_delta(game, ply, previous, cells):
+    changed = [(sq, cell) for sq, (old, cell) in enumerate(zip(previous, cells)) if old != cell]
+    return _header(DELTA, game, ply, len(changed)) + b"".join(DELTA_CELL.pack(sq, *cell) for sq, cell in changed)
+
+class ViewDecoder:
+    """Client side: applies keyframes and deltas; cells and the header fields are the current view."""
+
+    def __init__(self): self.cells = None; self.ply = None
+
+    def apply(self, message):
+        kind, flags, self.ply, self.width, self.height, sp_white, sp_black, count = HEADER.unpack_from(message)
+        self.current_player = 'black' if flags & 1 else 'white'
+        self.game_over = bool(flags & 2); self.winner = (None, 'white', 'black')[flags >> 2 & 3]
+        self.player_sp = {'white': sp_white, 'black': sp_black}
+        offset = HEADER.size
+        if kind == KEYFRAME:
+            self.cells = [CELL.unpack_from(message, offset + i * CELL.size) for i in range(count)]
+        else:
+            if self.cells is None: raise ValueError("Delta received before a keyframe.")
+            for i in range(count):
+                sq, *cell = DELTA_CELL.unpack_from(message, offset + i * DELTA_CELL.size)
+                self.cells[sq] = tuple(cell)
+        return self
+
+    def square(self, sq): return decode_cell(self.cells[sq])
+
+class Broadcaster:
+    """Fans one game out to subscribers of its views. Call publish(game) after every ply."""
+
+    def __init__(self):
+        self._subscribers = {view: {} for view in VIEWS} # view -> token -> send(bytes)
+        self._cells = {} # view -> cells last published
+        self._keyframes = {} # view -> keyframe bytes of the last published ply (built on demand)
+        self._last = None # (game, ply) of the last publish, for keyframes
+        self._next_token = 0
+        self.encoded = 0 # Messages encoded (once per view per ply, however many subscribers)
+
+    def subscribe(self, view, send):
+        """Adds send (a callable taking bytes) to view's subscribers; returns a token for unsubscribe()."""
+        if view not in self._subscribers: raise ValueError(f"Unknown view {view!r}; use one of {VIEWS}.")
+        token = self._next_token; self._next_token += 1
+        self._subscribers[view][token] = send
+        if view in self._cells: send(self._keyframe(view)) # Catch up from the current ply
+        return token
+
+    def unsubscribe(self, token):
+        for view, subscribers in self._subscribers.items():
+            if subscribers.pop(token, None) is not None and not subscribers:
+                self._cells.pop(view, None); self._keyframes.pop(view, None) # Nobody to stay in sync with
+
+    def subscribers(self, view): return len(self._subscribers[view])
+
+    def _keyframe(self, view):
+        if view not in self._keyframes:
+            game, ply = self._last
+            self._keyframes[view] = encode_keyframe(game, ply, self._cells[view]); self.encoded += 1
+        return self._keyframes[view]
+
+    def publish(self, game, ply=None):
+        """Sends the current position (ply defaults to game.ply) to every subscribed view; returns {view: bytes}."""
+        if ply is None: ply = game.ply if game.history is not None else 0
+        self._last = (game, ply); self._keyframes.clear()
+        sent = {}; computed = {}; deltas = {} # Identical views (no fog) are computed and encoded once
+        for view, subscribers in self._subscribers.items():
+            if not subscribers: continue
+            fog_key = view if game.board.fog_of_war_on else 'all'
+            if fog_key not in computed: computed[fog_key] = view_cells(game, view)
+            cells = computed[fog_key]
+            previous = self._cells.get(view); self._cells[view] = cells
+            if previous is None: message = self._keyframe(view)
+            elif (fog_key, id(previous)) in deltas: message = deltas[fog_key, id(previous)]
+            else: message = deltas[fog_key, id(previous)] = encode_delta(game, ply, previous, cells); self.encoded += 1
+            for send in list(subscribers.values()): send(message)
+            sent[view] = message
+        return sent
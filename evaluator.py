@@ -0,0 +1,78 @@
+from features import PLANES, SCALARS, PIECE_PLANE, COLORS, encode_position, np, require_numpy
+from search import MATE_SCORE
+
+# Learned leaf evaluation for the search.
+#
+# A model is a stack of dense layers over the flattened features.py encoding (planes,
+# then scalars): ReLU between layers, one output, no activation at the end. A single
+# layer is a linear evaluator. The output is a score from white's point of view in
+# model units; multiplying by `scale` gives search score units. Weights are stored in an
+# .npz file as W0, b0, W1, b1, ... and an optional scale.
+#
+# Game(evaluator=...) makes the search score all children of a depth-1 node in one
+# evaluate_batch call instead of one Python evaluation per leaf.
+
+BOARD_SIZE = (8, 8) # Models are for the standard board
+FEATURE_SIZE = len(PLANES) * BOARD_SIZE[0] * BOARD_SIZE[1] + len(SCALARS)
+SCORE_LIMIT = MATE_SCORE // 2 # Learned scores stay well clear of mate scores
+
+class NumpyEvaluator:
+    def __init__(self, layers, scale=1.0):
+        require_numpy()
+        self.layers = [(np.asarray(W, dtype=np.float32), np.asarray(b, dtype=np.float32)) for W, b in layers]
+        if not self.layers or self.layers[0][0].shape[0] != FEATURE_SIZE or self.layers[-1][0].shape[1] != 1:
+            raise ValueError(f"Model must map {FEATURE_SIZE} features to 1 output.")
+        self.scale = float(scale)
+
+    @staticmethod
+    def check_board(width, height):
+        """Raises ValueError unless models fit a width x height board."""
+        if (width, height) != BOARD_SIZE:
+            raise ValueError(f"NumpyEvaluator models are for {BOARD_SIZE[0]}x{BOARD_SIZE[1]} boards, not {width}x{height}.")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            layers = []
+            while f"W{len(layers)}" in data: layers.append((data[f"W{len(layers)}"], data[f"b{len(layers)}"]))
+            return cls(layers, float(data['scale']) if 'scale' in data else 1.0)
+
+    def save(self, path):
+        arrays = {'scale': np.float32(self.scale)}
+        for i, (W, b) in enumerate(self.layers): arrays[f"W{i}"] = W; arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    @classmethod
+    def material(cls, piece_values, scale=1.0):
+        """Linear model scoring piece_values ({'QUEEN': 9, ...}) for white minus black."""
+        W = np.zeros((FEATURE_SIZE, 1), dtype=np.float32)
+        for (color, piece_type), plane in PIECE_PLANE.items():
+            W[plane * 64:(plane + 1) * 64] = piece_values.get(piece_type, 0) * (1 if color == 'white' else -1)
+        return cls([(W, np.zeros(1))], scale)
+
+    def encode_batch(self, games):
+        """Returns the (len(games), FEATURE_SIZE) float32 input matrix."""
+        board = games[0].board; self.check_board(board.width, board.height)
+        planes = np.zeros((len(games), len(PLANES), board.height, board.width), dtype=np.uint8)
+        scalars = np.zeros((len(games), len(SCALARS)), dtype=np.int16)
+        for i, game in enumerate(games): encode_position(game, planes[i], scalars[i])
+        return np.concatenate((planes.reshape(len(games), -1), scalars), axis=1).astype(np.float32)
+
+    def forward(self, inputs):
+        """Raw model output (white's point of view, model units) for a batch of feature rows."""
+        x = inputs
+        for i, (W, b) in enumerate(self.layers):
+            x = x @ W + b
+            if i < len(self.layers) - 1: np.maximum(x, 0, out=x)
+        return x[:, 0]
+
+    def evaluate_batch(self, games):
+        """Integer scores of (non-terminal) games, each from its side to move's point of view."""
+        if not games: return []
+        white_scores = np.clip(np.rint(self.forward(self.encode_batch(games)) * self.scale), -SCORE_LIMIT, SCORE_LIMIT)
+        return [int(score) if game.current_player == COLORS[0] else -int(score) for game, score in zip(games, white_scores)]
+
+    def evaluate(self, game, color):
+        """Score of a single game from color's point of view."""
+        score = self.evaluate_batch([game])[0]
+        return score if color == game.current_player else -score
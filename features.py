@@ -0,0 +1,54 @@
+from board import ALL_TILE_EFFECTS
+from timers import turn_clock, turns_left
+import abilities as abilities_module
+
+try:
+    import numpy as np
+except ImportError: # numpy is only needed for training data and learned evaluators
+    np = None
+
+# Fixed-size numeric encoding of a position, shared by the training-data exporter and
+# learned evaluators. Planes are (len(PLANES), height, width) uint8 arrays in board
+# coordinates (row 0 is the top rank); scalars are an int16 vector.
+
+PIECE_TYPES = ('PAWN', 'KNIGHT', 'BISHOP', 'ROOK', 'QUEEN', 'KING')
+COLORS = ('white', 'black')
+PLANES = tuple(f"{color}_{piece_type.lower()}" for color in COLORS for piece_type in PIECE_TYPES) + \
+         tuple(f"tile_{effect}" for effect in ALL_TILE_EFFECTS) + \
+         ('ability', 'cooldown', 'frozen', 'speed_buff', 'visible')
+SCALARS = ('side_to_move', 'sp_white', 'sp_black', 'full_turn_counter', 'evolution_timer', 'lost_white', 'lost_black')
+
+PIECE_PLANE = {(color, piece_type): i * len(PIECE_TYPES) + j
+               for i, color in enumerate(COLORS) for j, piece_type in enumerate(PIECE_TYPES)}
+TILE_PLANE = {effect: len(COLORS) * len(PIECE_TYPES) + i for i, effect in enumerate(ALL_TILE_EFFECTS)}
+ABILITY_PLANE, COOLDOWN_PLANE, FROZEN_PLANE, SPEED_PLANE, VISIBLE_PLANE = range(len(PLANES) - 5, len(PLANES))
+ABILITY_IDS = {ability.name: i + 1 for i, (_, ability) in enumerate(sorted(abilities_module.ABILITIES_POOL.items()))} # 0: none
+
+def require_numpy():
+    if np is None: raise ImportError("numpy is required for position features (pip install numpy).")
+
+def encode_position(game, planes=None, scalars=None):
+    """
+    Writes the planes and scalars of game's position into the given arrays (e.g. rows
+    of a memmap, so nothing is copied) or into new ones. Returns (planes, scalars).
+    """
+    require_numpy()
+    board = game.board; clock = turn_clock(game)
+    if planes is None: planes = np.zeros((len(PLANES), board.height, board.width), dtype=np.uint8)
+    else: planes[...] = 0
+    if scalars is None: scalars = np.zeros(len(SCALARS), dtype=np.int16)
+    for sq, (r, c) in enumerate(board.squares.coords):
+        effect = board.tile_effects[sq]
+        if effect is not None: planes[TILE_PLANE[effect], r, c] = 1
+        if board.visibility_grid[sq]: planes[VISIBLE_PLANE, r, c] = 1
+        piece = board.grid[sq]
+        if piece is None: continue
+        planes[PIECE_PLANE[piece.color, piece.piece_type_name], r, c] = 1
+        if piece.ability is not None: planes[ABILITY_PLANE, r, c] = ABILITY_IDS.get(piece.ability.name, 0)
+        planes[COOLDOWN_PLANE, r, c] = min(turns_left(piece.ability_ready_at, clock), 255)
+        planes[FROZEN_PLANE, r, c] = min(turns_left(piece.status_effects.get('frozen', 0), clock), 255)
+        planes[SPEED_PLANE, r, c] = piece.has_speed_buff
+    scalars[:] = (COLORS.index(game.current_player), game.player_sp['white'], game.player_sp['black'],
+                  game.full_turn_counter, board.board_evolution_timer,
+                  len(game.player_lost_pieces['white']), len(game.player_lost_pieces['black']))
+    return planes, scalars
@@ -0,0 +1,312 @@
+import random
+import time
+from collections import namedtuple
+
+from board import ALL_TILE_EFFECTS, LAVA_EFFECT, BUFF_SPEED_EFFECT, HEAL_TILE_EFFECT, MIN_SIZE, MAX_SQUARES
+from game import Game
+from search import quiet
+from squares import square_table
+from timers import due_after, turn_clock
+from utils import MAX_FILES
+import abilities as abilities_module
+
+# Differential fuzzing of the engine's fast paths against the reference rules.
+#
+# The reference is the plain rule code: Piece.is_valid_move over every square,
+# Game.is_in_check, the deep-copying king-safety test and Piece.get_revealed_squares.
+# Each entry of CHECKS computes one result both ways for a position (legal moves from
+# candidate squares, the capture and check-evasion generators, the row-copying
+# king-safety test, checkers(), compute_visibility()); a speed-up that changes
+# a Chaos rule - lava stopping rays, speed-buffed pawn advances, frozen pieces - shows up
+# as a mismatch. Positions are random but legal (the side not to move is not in check),
+# with random tiles, abilities, cooldowns, frozen counters and speed buffs. A mismatch is
+# shrunk to a minimal position and reported as Chaos-FEN:
+#
+#   <placement> <side> <tiles> <piece states>
+#   4k3/8/8/3p4/8/8/8/R3K3 w d5L,e4S -
+#   placement  FEN ranks from the top, uppercase white, digits count empty squares
+#   side       w or b
+#   tiles      comma-separated <square><L|S|H> (lava, speed, heal), or -
+#   states     comma-separated <square>=<token>/<token>..., or -; tokens are f<n>
+#              (frozen for n turns), c<n> (ability cooldown), s (speed buff) and an
+#              ABILITIES_POOL key
+#
+# Positions are specs: (width, height, side, pieces, tiles) with pieces
+# (square, color, piece type, ability key, cooldown, frozen, speed) and tiles
+# (square, effect), squares numbered as in squares.py.
+
+Position = namedtuple('Position', ['width', 'height', 'side', 'pieces', 'tiles'])
+Mismatch = namedtuple('Mismatch', ['check', 'fen', 'original_fen'])
+
+PIECE_LETTERS = {'PAWN': 'p', 'KNIGHT': 'n', 'BISHOP': 'b', 'ROOK': 'r', 'QUEEN': 'q', 'KING': 'k'}
+LETTER_PIECES = {letter: piece_type for piece_type, letter in PIECE_LETTERS.items()}
+TILE_LETTERS = {LAVA_EFFECT: 'L', BUFF_SPEED_EFFECT: 'S', HEAL_TILE_EFFECT: 'H'}
+LETTER_TILES = {letter: effect for effect, letter in TILE_LETTERS.items()}
+PIECE_WEIGHTS = {'PAWN': 4, 'KNIGHT': 2, 'BISHOP': 2, 'ROOK': 2, 'QUEEN': 1}
+
+# --- Chaos-FEN ---
+
+def to_chaos_fen(position):
+    width, height = position.width, position.height
+    names = square_table(width, height).names
+    by_square = {piece[0]: piece for piece in position.pieces}
+    ranks = []
+    for r in range(height):
+        rank = ""; empty = 0
+        for c in range(width):
+            piece = by_square.get(r * width + c)
+            if piece is None: empty += 1; continue
+            if empty: rank += str(empty); empty = 0
+            letter = PIECE_LETTERS[piece[2]]
+            rank += letter.upper() if piece[1] == 'white' else letter
+        ranks.append(rank + (str(empty) if empty else ""))
+    tiles = ",".join(names[sq] + TILE_LETTERS[effect] for sq, effect in sorted(position.tiles)) or "-"
+    states = []
+    for sq, _, _, ab_key, cooldown, frozen, speed in sorted(position.pieces):
+        tokens = ([ab_key] if ab_key else []) + ([f"c{cooldown}"] if cooldown else []) + \
+                 ([f"f{frozen}"] if frozen else []) + (["s"] if speed else [])
+        if tokens: states.append(names[sq] + "=" + "/".join(tokens))
+    return " ".join(["/".join(ranks), position.side[0], tiles, ",".join(states) or "-"])
+
+def parse_chaos_fen(fen):
+    """Position spec of a Chaos-FEN string; raises ValueError if it is malformed."""
+    fields = fen.split()
+    if len(fields) != 4 or fields[1] not in ('w', 'b'): raise ValueError(f"Bad Chaos-FEN: {fen!r}")
+    rows = fields[0].split("/")
+    grid = []
+    for rank in rows:
+        row = []; digits = ""
+        for ch in rank + " ":
+            if ch.isdigit(): digits += ch; continue
+            if digits: row.extend([None] * int(digits)); digits = ""
+            if ch == " ": break
+            if ch.lower() not in LETTER_PIECES: raise ValueError(f"Bad piece {ch!r} in Chaos-FEN.")
+            row.append(('white' if ch.isupper() else 'black', LETTER_PIECES[ch.lower()]))
+        grid.append(row)
+    width, height = len(grid[0]), len(grid)
+    if any(len(row) != width for row in grid): raise ValueError(f"Ragged Chaos-FEN placement: {fields[0]!r}")
+    if not (MIN_SIZE <= width <= MAX_FILES and MIN_SIZE <= height and width * height <= MAX_SQUARES):
+        raise ValueError(f"Unsupported board size {width}x{height} in Chaos-FEN.")
+    squares = square_table(width, height).by_name
+    def square(name):
+        if name not in squares: raise ValueError(f"Bad square {name!r} in Chaos-FEN.")
+        return squares[name]
+    states = {}
+    for item in fields[3].split(",") if fields[3] != "-" else []:
+        name, _, tokens = item.partition("=")
+        state = states.setdefault(square(name), [None, 0, 0, False])
+        for token in tokens.split("/"):
+            if token == "s": state[3] = True
+            elif token[:1] in ('c', 'f') and token[1:].isdigit(): state[1 if token[0] == 'c' else 2] = int(token[1:])
+            elif token in abilities_module.ABILITIES_POOL: state[0] = token
+            else: raise ValueError(f"Bad piece state {token!r} in Chaos-FEN.")
+    pieces = tuple((r * width + c, color, piece_type, *states.get(r * width + c, (None, 0, 0, False)))
+                   for r, row in enumerate(grid) for c, (color, piece_type) in
+                   ((c, cell) for c, cell in enumerate(row) if cell is not None))
+    tiles = tuple((square(item[:-1]), LETTER_TILES[item[-1]]) for item in fields[2].split(",") if fields[2] != "-")
+    return Position(width, height, 'white' if fields[1] == 'w' else 'black', pieces, tiles)
+
+# --- Positions ---
+
+def new_game(width=8, height=8):
+    """A quiet Game to load positions into; the global random state is left untouched."""
+    rng_state = random.getstate()
+    try:
+        with quiet(): return Game(width=width, height=height)
+    finally:
+        random.setstate(rng_state)
+
+def load_position(game, position):
+    """Puts position on game's board (which must have the same size) and makes its side the player to move."""
+    board = game.board; count = position.width * position.height
+    game.current_player = position.side; clock = turn_clock(game)
+    board.grid = [None] * count
+    board.tile_effects = [board.NO_EFFECT] * count
+    for sq, color, piece_type, ab_key, cooldown, frozen, speed in position.pieces:
+        piece = board.create_piece_by_str_and_color(piece_type, color, sq)
+        piece.ability = abilities_module.ABILITIES_POOL[ab_key] if ab_key else None
+        piece.ability_ready_at = due_after(color, clock, cooldown); piece.has_speed_buff = speed
+        if frozen: piece.status_effects['frozen'] = due_after(color, clock, frozen)
+        board.grid[sq] = piece
+    for sq, effect in position.tiles: board.tile_effects[sq] = effect
+    board.fog_of_war_on = True
+    game.game_over = False; game.winner = None
+    game.invalidate_legal_moves(); game.reset_timers()
+    return game
+
+def is_legal(game):
+    """Both kings on the board and the side not to move is not in check."""
+    kings = [p.color for p in game.board.get_all_pieces() if p.piece_type_name == "KING"]
+    if sorted(kings) != ['black', 'white']: return False
+    return not game.is_in_check('black' if game.current_player == 'white' else 'white', game.board)
+
+def random_position(rng, width=8, height=8, max_pieces=12, tile_rate=0.15, game=None):
+    """A random legal Position drawn from rng (a random.Random); game is reused to test legality."""
+    if game is None: game = new_game(width, height)
+    while True:
+        squares = rng.sample(range(width * height), 2 + rng.randint(0, max_pieces))
+        pieces = []
+        for i, sq in enumerate(squares):
+            color = ('white', 'black')[i % 2]
+            piece_type = 'KING' if i < 2 else rng.choices(list(PIECE_WEIGHTS), weights=list(PIECE_WEIGHTS.values()))[0]
+            if piece_type == 'PAWN' and not 0 < sq // width < height - 1: piece_type = 'KNIGHT' # No pawns on the end ranks
+            options = abilities_module.PIECE_ABILITIES.get(piece_type, [])
+            ab_key = None
+            if options and rng.random() < 0.5:
+                ability = rng.choice(options)[0]
+                ab_key = next(key for key, pooled in abilities_module.ABILITIES_POOL.items() if pooled is ability)
+            pieces.append((sq, color, piece_type, ab_key, rng.randint(0, 3) if ab_key else 0,
+                           rng.randint(1, 2) if rng.random() < 0.2 else 0, rng.random() < 0.2))
+        occupied = set(squares)
+        tiles = tuple((sq, effect) for sq in range(width * height) if rng.random() < tile_rate
+                      for effect in [rng.choice(ALL_TILE_EFFECTS)] if not (effect == LAVA_EFFECT and sq in occupied))
+        position = Position(width, height, rng.choice(('white', 'black')), tuple(pieces), tiles)
+        if is_legal(load_position(game, position)): return position
+
+# --- Reference rules and fast paths ---
+
+class Reference:
+    """Reference results for one loaded position, computed on first use and shared by the checks."""
+
+    def __init__(self, game):
+        self.game = game; self._moves = {}; self._exposes = {}
+
+    def pseudo_moves(self, color):
+        """(start, end) of every move of color allowed by is_valid_move over the whole board, before king safety."""
+        if color not in self._moves:
+            board = self.game.board; moves = []
+            for piece in board.get_all_pieces():
+                if piece.color != color: continue
+                for sq in range(board.squares.count):
+                    if sq != piece.position and board.tile_effects[sq] != LAVA_EFFECT and \
+                       piece.is_valid_move(board, piece.position, sq):
+                        moves.append((piece.position, sq))
+            self._moves[color] = sorted(moves)
+        return self._moves[color]
+
+    def exposes_king(self, color):
+        """{(start, end): True if the move leaves color's king in check} from the deep-copying king-safety test."""
+        if color not in self._exposes:
+            self._exposes[color] = {move: self.game._is_move_putting_king_in_check(color, *move) for move in self.pseudo_moves(color)}
+        return self._exposes[color]
+
+    def moves(self, color):
+        """Legal (start, end) moves of color."""
+        return {move for move, exposes in self.exposes_king(color).items() if not exposes}
+
+    def visibility(self, color):
+        """Visibility grid of color built from each piece's own square and get_revealed_squares."""
+        board = self.game.board
+        grid = [False] * board.squares.count
+        occupied = {p.position for p in board.get_all_pieces()}
+        for piece in board.get_all_pieces():
+            if piece.color != color: continue
+            for sq in [piece.position] + list(piece.get_revealed_squares(board, occupied)):
+                if 0 <= sq < len(grid): grid[sq] = True
+        return grid
+
+def _move_set(actions): return {(a['start_pos'], a['end_pos']) for a in actions}
+
+def check_moves(game, reference):
+    color = game.current_player
+    return _move_set(game._iter_standard_moves(game._movable_pieces(color))), reference.moves(color)
+
+def check_captures(game, reference):
+    color = game.current_player; board = game.board
+    captures = {move for move in reference.moves(color) if board.get_piece(move[1]) is not None}
+    return _move_set(game._iter_capture_moves(game._movable_pieces(color))), captures
+
+def check_evasions(game, reference):
+    color = game.current_player
+    if not game.is_in_check(color, game.board): return None, None
+    return _move_set(game._iter_check_evasions(color)), reference.moves(color)
+
+def check_king_safety(game, reference):
+    color = game.current_player; expected = reference.exposes_king(color)
+    return {move: game._move_exposes_king(color, *move) for move in expected}, expected
+
+def check_check(game, reference):
+    return ({color: bool(game.checkers(color)) for color in ('white', 'black')},
+            {color: game.is_in_check(color, game.board) for color in ('white', 'black')})
+
+def check_visibility(game, reference):
+    return ({color: game.board.compute_visibility(color) for color in ('white', 'black')},
+            {color: reference.visibility(color) for color in ('white', 'black')})
+
+# name -> function(game, reference) returning (fast result, reference result); add entries for new fast paths
+CHECKS = {'moves': check_moves, 'captures': check_captures, 'evasions': check_evasions,
+          'king_safety': check_king_safety, 'check': check_check, 'visibility': check_visibility}
+
+def failing_checks(game, checks=None):
+    """Names of the checks whose fast and reference results differ for game's position."""
+    failing = []; reference = Reference(game)
+    with quiet():
+        for name in checks or CHECKS:
+            fast, expected = CHECKS[name](game, reference)
+            if fast != expected: failing.append(name)
+    return failing
+
+# --- Shrinking ---
+
+def _smaller(position):
+    """Candidate positions one simplification away: a piece removed, a tile cleared or a piece state reset."""
+    for i, piece in enumerate(position.pieces):
+        if piece[2] != 'KING': yield position._replace(pieces=position.pieces[:i] + position.pieces[i + 1:])
+    for i in range(len(position.tiles)):
+        yield position._replace(tiles=position.tiles[:i] + position.tiles[i + 1:])
+    for i, (sq, color, piece_type, ab_key, cooldown, frozen, speed) in enumerate(position.pieces):
+        for simpler in ((sq, color, piece_type, None, 0, frozen, speed), (sq, color, piece_type, ab_key, 0, frozen, speed),
+                        (sq, color, piece_type, ab_key, cooldown, 0, speed), (sq, color, piece_type, ab_key, cooldown, frozen, False)):
+            if simpler != position.pieces[i]:
+                yield position._replace(pieces=position.pieces[:i] + (simpler,) + position.pieces[i + 1:])
+
+def shrink(position, check, game=None):
+    """Greedily simplifies position while it stays legal and still fails check; returns the minimal Position."""
+    if game is None: game = new_game(position.width, position.height)
+    shrinking = True
+    while shrinking:
+        shrinking = False
+        for candidate in _smaller(position):
+            load_position(game, candidate)
+            if is_legal(game) and check in failing_checks(game, [check]):
+                position = candidate; shrinking = True; break
+    return position
+
+# --- Driver ---
+
+def fuzz(positions=1000, seed=0, width=8, height=8, checks=None, max_pieces=12):
+    """Runs checks on random positions; returns ([Mismatch], positions per second)."""
+    rng = random.Random(seed)
+    game = new_game(width, height)
+    mismatches = []; seen = set()
+    start = time.perf_counter()
+    for _ in range(positions):
+        position = random_position(rng, width, height, max_pieces, game=game)
+        for name in failing_checks(game, checks):
+            minimal = shrink(position, name, game)
+            fen = to_chaos_fen(minimal)
+            if (name, fen) not in seen:
+                seen.add((name, fen)); mismatches.append(Mismatch(name, fen, to_chaos_fen(position)))
+            load_position(game, position)
+    elapsed = time.perf_counter() - start
+    return mismatches, positions / elapsed if elapsed > 0 else float('inf')
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the engine's fast paths against the reference rules.")
+    parser.add_argument('--positions', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=8)
+    parser.add_argument('--height', type=int, default=8)
+    parser.add_argument('--max-pieces', type=int, default=12)
+    parser.add_argument('--check', action='append', choices=sorted(CHECKS), help='Run only these checks (repeatable).')
+    parser.add_argument('--fen', help='Run the checks on one Chaos-FEN position instead of fuzzing.')
+    args = parser.parse_args()
+    if args.fen:
+        position = parse_chaos_fen(args.fen)
+        failing = failing_checks(load_position(new_game(position.width, position.height), position), args.check)
+        print("Mismatches: " + ", ".join(failing) if failing else "All checks agree.")
+    else:
+        mismatches, rate = fuzz(args.positions, args.seed, args.width, args.height, args.check, args.max_pieces)
+        for mismatch in mismatches: print(f"{mismatch.check}: {mismatch.fen}")
+        print(f"{args.positions} positions, {rate:.0f}/s, {len(mismatches)} mismatches.")
@@ -1,26 +1,48 @@
 from board import Board, LAVA_EFFECT
 from pieces import Piece
-from utils import algebraic_to_coords, coords_to_algebraic
+from zobrist import position_hash
+from history import GameHistory
+from timers import TimerWheel, due_after, turn_clock
 import copy
 import random
 import abilities as abilities_module
+import search
 
 class Game:
     PIECE_SP_VALUES = {"PAWN": 1, "KNIGHT": 3, "BISHOP": 3, "ROOK": 5, "QUEEN": 9, "KING": 0}
-    CENTRAL_ZONES = [(3,3), (3,4), (4,3), (4,4)]
+    CENTRAL_ZONES = [27, 28, 35, 36] # Squares d5, e5, d4, e4 (see squares.py)
     SP_PER_CENTRAL_ZONE = 1
     QUICK_DECISION_SP_BONUS = 1
 
-    def __init__(self, ai_player_color='black'):
+    SHARED_ATTRS = ('abilities_module', 'opening_book', 'tablebase', 'parallel_search',
+                    'transposition_table', 'ponderer', 'training_exporter',
+                    'evaluator') # Not copied by __deepcopy__
+
+    def __init__(self, ai_player_color='black', ai_depth=0, opening_book=None, tablebase=None, parallel_search=None,
+                 transposition_table=None, ponderer=None, training_exporter=None,
+                 evaluator=None, width=8, height=8, quiescence_depth=0):
         self.abilities_module = abilities_module
-        self.board = Board(self)
+        self.board = Board(self, width, height)
         self.current_player = "white"
         self.ai_player_color = ai_player_color
         self.game_over = False; self.winner = None
-        self.utils = {'algebraic_to_coords': algebraic_to_coords, 'coords_to_algebraic': coords_to_algebraic}
+        self.ai_depth = ai_depth # 0 keeps the original random AI; >0 searches that many plies
+        self.quiescence_depth = quiescence_depth # >0: search leaves resolve up to that many capture/evasion plies
+        self.opening_book = opening_book # OpeningBook instance (see opening_book.py) or None
+        self.tablebase = tablebase # Tablebase instance (see tablebase.py) or None
+        self.parallel_search = parallel_search # ParallelSearcher (see parallel_search.py) used when ai_depth > 0
+        self.transposition_table = transposition_table # e.g. SharedTranspositionTable (see shared_tt.py)
+        self.ponderer = ponderer # Ponderer (see ponder.py) that searches during the human's turn when ai_depth > 0
+        self.training_exporter = training_exporter # TrainingExporter (see training_export.py) fed the AI's positions
+        self.export_token = None # Assigned by the exporter when it records this game; copies get none
+        self.evaluator = evaluator # e.g. NumpyEvaluator (see evaluator.py) scoring search leaves in batches
+        if evaluator is not None and hasattr(evaluator, 'check_board'): evaluator.check_board(width, height)
+        if (width, height) != (8, 8): # The four squares around the center of the board
+            self.CENTRAL_ZONES = [(height // 2 + dr) * width + width // 2 + dc for dr in (-1, 0) for dc in (-1, 0)]
         self.full_turn_counter = 0
         self.player_sp = {'white': 0, 'black': 0}
         self.player_lost_pieces = {'white': [], 'black': []}
+        self._legal_moves_cache = None; self._legal_moves_by_square = None
         self.SPECIAL_MOVES = {
             'redeploy': {
                 'name': 'Redeploy Captured Piece', 'sp_cost': 10, 'effect': self._redeploy_captured_piece_effect,
@@ -31,61 +53,133 @@ class Game:
                 'requires_target': False, 'target_prompt': ""
             }
         }
+        self.timers = TimerWheel() # Frozen, cooldown and evolution timers (see timers.py)
+        self.reset_timers()
         self._start_turn_prep()
+        self.reset_history()
+
+    def __deepcopy__(self, memo):
+        """Deep-copies game state; SHARED_ATTRS (modules, books, tables) are shared, not copied, and copies keep no history."""
+        new_game = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new_game
+        for attr, value in self.__dict__.items():
+            if attr in self.SHARED_ATTRS: setattr(new_game, attr, value)
+            elif attr in ('_legal_moves_cache', '_legal_moves_by_square', 'history', 'export_token'): setattr(new_game, attr, None)
+            else: setattr(new_game, attr, copy.deepcopy(value, memo))
+        return new_game
 
-    def _start_turn_prep(self): # (Unchanged)
+    def _start_turn_prep(self): # Frozen counters tick in switch_player (see timers.py)
         self.board.update_visibility(self.current_player)
         self.check_zone_control_sp(self.current_player)
-        for piece in self.board.get_all_pieces():
-            if piece.color == self.current_player and 'frozen' in piece.status_effects:
-                piece.status_effects['frozen'] -= 1
-                if piece.status_effects['frozen'] <= 0:
-                    del piece.status_effects['frozen']
-                    print(f"{piece} @ {self.utils['coords_to_algebraic'](piece.position)} unfrozen.")
+        self._check_game_end()
+
+    def _check_game_end(self):
+        """Ends the game if a king is gone (e.g. lava), the player to move has no legal action or the tablebase knows the result."""
+        self._detect_game_end()
+        if self.game_over and self.training_exporter is not None and self.export_token is not None:
+            self.training_exporter.finish_game(self) # However the game ended, and whoever ended it
+
+    def _detect_game_end(self):
+        for color in ('white', 'black'):
+            if self._find_king_position(color, self.board) is None:
+                self.game_over = True; self.winner = "black" if color == "white" else "white"
+                print(f"{color.capitalize()} King has been destroyed! {self.winner.capitalize()} wins."); return
+        if not self.has_legal_action(self.current_player):
+            self.game_over = True
+            if self.is_in_check(self.current_player, self.board):
+                self.winner = "black" if self.current_player == "white" else "white"
+                print(f"CHECKMATE! {self.winner.capitalize()} wins.")
+            else:
+                self.winner = None; print(f"STALEMATE! {self.current_player.capitalize()} has no legal action. Draw.")
+            return
+        if self.tablebase is not None: # Adjudicate mates the tables trust instead of playing them out; never draws
+            verdict = self.tablebase.winner(self)
+            if verdict is not None:
+                self.game_over = True; self.winner = verdict
+                print(f"Endgame tablebase: {verdict.capitalize()} mates with perfect play.")
+
+    def _post_action_cleanup(self, action=None):
+        self.switch_player()
+        if self.history is not None: self.history.record(self, action)
+
+    def reset_timers(self):
+        """Rebuilds the timer wheel from the pieces' counters; call after rewriting the position directly."""
+        self.timers.rebuild(self)
+
+    def reset_history(self):
+        """Starts a new history (see history.py) whose ply 0 is the current position."""
+        self.history = GameHistory(); self.history.record(self)
+
+    @property
+    def ply(self): return self.history.ply
 
-    def _post_action_cleanup(self): self.switch_player() # (Unchanged)
+    def undo(self):
+        """Steps back one ply (one player's action). Returns False at the start of the history."""
+        return self.history.undo(self)
 
-    def switch_player(self): # (Unchanged)
+    def redo(self):
+        """Replays the next ply after an undo. Returns False if there is nothing to redo."""
+        return self.history.redo(self)
+
+    def jump_to_ply(self, ply):
+        """Puts the position after ply actions on the board; a new action from there discards the redo plies."""
+        return self.history.jump(self, ply)
+
+    def switch_player(self):
         self.current_player = "black" if self.current_player == "white" else "white"
+        self.invalidate_legal_moves()
         if self.current_player == "white":
             self.full_turn_counter += 1; self.board.board_evolution_timer +=1
-            if self.board.board_evolution_timer >= self.board.turns_before_evolution:
-                self.board.generate_tile_effects(self)
+        self.timers.advance(self) # Board evolution, unfreezing and cooldowns due this turn
         self._start_turn_prep()
 
-    def add_sp(self, player, amount): # (Unchanged)
+    def add_sp(self, player, amount): # SP decides which specials are affordable
         if amount > 0: self.player_sp[player] += amount; print(f"{player.capitalize()} +{amount} SP! Total: {self.player_sp[player]}.")
         elif amount < 0: self.player_sp[player] = max(0, self.player_sp[player] + amount)
+        if amount: self.invalidate_legal_moves()
 
-    def add_lost_piece(self, owner, type_name_upper): self.player_lost_pieces[owner].append(type_name_upper) # (Unchanged)
+    def add_lost_piece(self, owner, type_name_upper): self.player_lost_pieces[owner].append(type_name_upper); self.invalidate_legal_moves()
     def check_zone_control_sp(self, player): # (Unchanged)
-        gain = sum(self.SP_PER_CENTRAL_ZONE for r,c in self.CENTRAL_ZONES if self.board.get_piece((r,c)) and self.board.get_piece((r,c)).color == player)
+        gain = sum(self.SP_PER_CENTRAL_ZONE for sq in self.CENTRAL_ZONES if self.board.grid[sq] and self.board.grid[sq].color == player)
         if gain > 0: self.add_sp(player, gain)
 
-    def _is_move_putting_king_in_check(self, player_color, start_coords, end_coords): # (Unchanged)
+    def _is_move_putting_king_in_check(self, player_color, start_sq, end_sq): # (Unchanged)
         hypo_board = copy.deepcopy(self.board)
-        original_piece = self.board.get_piece(start_coords)
+        original_piece = self.board.get_piece(start_sq)
         if not original_piece : return True
-        hypo_piece = hypo_board.get_piece(start_coords)
+        hypo_piece = hypo_board.get_piece(start_sq)
         if hypo_piece: hypo_piece.has_speed_buff = original_piece.has_speed_buff
-        hypo_board.move_piece(start_coords, end_coords, self)
+        hypo_board.move_piece(start_sq, end_sq, self)
+        return self.is_in_check(player_color, hypo_board)
+
+    def _move_exposes_king(self, player_color, start_sq, end_sq):
+        """
+        _is_move_putting_king_in_check without copying pieces or the game: the move is made on
+        a board that only copies the grid. A move's side effects (SP, tile buffs) cannot
+        change who attacks the king. fuzz.py checks the two against each other.
+        """
+        grid = self.board.grid[:]
+        piece = grid[start_sq]
+        if not piece: return True
+        grid[end_sq] = piece; grid[start_sq] = None
+        hypo_board = copy.copy(self.board); hypo_board.grid = grid
         return self.is_in_check(player_color, hypo_board)
 
     def _redeploy_captured_piece_effect(self, player, args): # (Unchanged)
         if len(args)<2: print("Redeploy: Need type & target sq."); return False
-        type_str, sq_str = args[0], args[1]; coords = self.utils['algebraic_to_coords'](sq_str)
-        if not coords: print(f"Redeploy: Invalid target {sq_str}."); return False
-        r,c=coords
-        if self.board.get_piece(coords): print(f"Redeploy: Target {sq_str} occupied."); return False
-        if self.board.tile_effects[r][c] == self.board.LAVA_EFFECT: print(f"Redeploy: Target {sq_str} is LAVA."); return False
-        valid_row = 7 if player=='white' else 0 # White redeploys on row 7 (rank 1), Black on row 0 (rank 8)
+        type_str, sq_str = args[0], args[1]; target_sq = self.board.squares.square(sq_str) if isinstance(sq_str, str) else None
+        if target_sq is None: print(f"Redeploy: Invalid target {sq_str}."); return False
+        r=self.board.squares.coords[target_sq][0]
+        if self.board.get_piece(target_sq): print(f"Redeploy: Target {sq_str} occupied."); return False
+        if self.board.tile_effects[target_sq] == self.board.LAVA_EFFECT: print(f"Redeploy: Target {sq_str} is LAVA."); return False
+        valid_row = self.board.height-1 if player=='white' else 0 # White redeploys on the bottom row (rank 1), Black on row 0
         if r!=valid_row: print(f"Redeploy: Not on back rank for {player}. Target row {r}, expected {valid_row}"); return False
         type_upper = type_str.upper()
         if type_upper in self.player_lost_pieces[player]:
-            new_p = self.board.create_piece_by_str_and_color(type_upper, player, coords)
+            new_p = self.board.create_piece_by_str_and_color(type_upper, player, target_sq)
             if new_p:
-                self.board.grid[r][c]=new_p; new_p.assign_ability()
-                self.player_lost_pieces[player].remove(type_upper)
+                self.board.grid[target_sq]=new_p; new_p.assign_ability()
+                self.player_lost_pieces[player].remove(type_upper); self.invalidate_legal_moves()
                 print(f"{player.capitalize()} redeployed {type_upper} to {sq_str}!"); self.board.update_visibility(player)
                 return True
         print(f"Redeploy: No captured '{type_upper}' for {player}. Lost: {self.player_lost_pieces[player]}"); return False
@@ -94,225 +188,384 @@ class Game:
     def _global_freeze_pawns_effect(self, player, args=None): # (Unchanged)
         print(f"{player.capitalize()} activates Global Freeze Pawns!"); frozen=False
         for p in self.board.get_all_pieces():
-            if p.piece_type_name=="PAWN": p.status_effects['frozen']=1; frozen=True; print(f"{p.color} Pawn @ {self.utils['coords_to_algebraic'](p.position)} frozen!")
+            if p.piece_type_name=="PAWN": p.status_effects['frozen']=due_after(p.color, turn_clock(self), 1); self.timers.track(self, p, 'frozen'); frozen=True; print(f"{p.color} Pawn @ {self.board.squares.names[p.position]} frozen!")
         if not frozen: print("No pawns to freeze.");
+        else: self.invalidate_legal_moves()
         return True
 
     def handle_special_move(self, player, key, args_list=None): # (Unchanged)
         if args_list is None: args_list=[]
+        if self.game_over: print("The game is over."); return False
         move=self.SPECIAL_MOVES.get(key)
         if not move: print(f"Unknown special: {key}"); return False
         if self.player_sp[player] < move['sp_cost']: print(f"Not enough SP for {move['name']}."); return False
+        if self.is_in_check(player, self.board) and not self._special_keeps_king_safe(player, key, args_list):
+            print(f"{move['name']} does not get the King out of check."); return False
         # print(f"{player.capitalize()} attempts Special: {move['name']}...") # Moved to AI specific message
         if move['effect'](player, args_list):
-            self.player_sp[player]-=move['sp_cost']; print(f"{move['name']} successful! Cost {move['sp_cost']}.")
-            self.add_sp(player, self.QUICK_DECISION_SP_BONUS); self._post_action_cleanup(); return True
+            self.player_sp[player]-=move['sp_cost']; self.invalidate_legal_moves(); print(f"{move['name']} successful! Cost {move['sp_cost']}.")
+            self.add_sp(player, self.QUICK_DECISION_SP_BONUS)
+            self._post_action_cleanup({'type': 'special', 'key': key, 'args': list(args_list)}); return True
         else: print(f"{move['name']} failed."); return False
 
-    def play_turn(self, start_str, end_str): # (Unchanged)
-        start_coords, end_coords = self.utils['algebraic_to_coords'](start_str), self.utils['algebraic_to_coords'](end_str)
-        if not start_coords or not end_coords: print("Invalid coords."); return False
-        if start_coords==end_coords: print("Same start/end."); return False
-        if self.board.tile_effects[end_coords[0]][end_coords[1]]==self.board.LAVA_EFFECT: print("Dest is LAVA."); return False
-        p=self.board.get_piece(start_coords)
-        if not p: print(f"No piece @ {start_str}."); return False
+    def play_turn(self, start_str, end_str):
+        """Plays a move given as algebraic squares ('e2', 'e4')."""
+        if self.game_over: print("The game is over."); return False
+        square = self.board.squares.square
+        return self.play_move(square(start_str), square(end_str))
+
+    def _on_board(self, *squares):
+        """True if every argument is an integer square of this board."""
+        return all(isinstance(sq, int) and 0 <= sq < self.board.squares.count for sq in squares)
+
+    def play_move(self, start_sq, end_sq):
+        """play_turn for integer squares (see squares.py), as in action dicts; the engine's entry point, with no notation to parse."""
+        if self.game_over: print("The game is over."); return False
+        if not self._on_board(start_sq, end_sq): print("Invalid coords."); return False
+        if start_sq==end_sq: print("Same start/end."); return False
+        if self.board.tile_effects[end_sq]==self.board.LAVA_EFFECT: print("Dest is LAVA."); return False
+        names = self.board.squares.names
+        p=self.board.get_piece(start_sq)
+        if not p: print(f"No piece @ {names[start_sq]}."); return False
         if p.color!=self.current_player: print("Not your piece."); return False
         if not p.is_action_allowed(): print(f"{p} is frozen!"); return False
-        if not p.is_valid_move(self.board,start_coords,end_coords) or self._is_move_putting_king_in_check(self.current_player,start_coords,end_coords):
+        if not p.is_valid_move(self.board,start_sq,end_sq) or self._move_exposes_king(self.current_player,start_sq,end_sq):
             # print(f"Invalid move for {p} {start_str}->{end_str}."); # AI will print its own, human gets this
-            if self.current_player != self.ai_player_color: print(f"Invalid move for {p} {start_str}->{end_str}.")
+            if self.current_player != self.ai_player_color: print(f"Invalid move for {p} {names[start_sq]}->{names[end_sq]}.")
             return False
-        cap=self.board.move_piece(start_coords,end_coords,self)
+        cap=self.board.move_piece(start_sq,end_sq,self)
         # Message printing moved to AI handler for AI moves
         if self.current_player != self.ai_player_color:
             if cap: print(f"{p} captures {cap}.")
-            else: print(f"{p} moves {start_str}->{end_str}.")
-        self.add_sp(self.current_player,self.QUICK_DECISION_SP_BONUS); self._post_action_cleanup(); return True
+            else: print(f"{p} moves {names[start_sq]}->{names[end_sq]}.")
+        self.add_sp(self.current_player,self.QUICK_DECISION_SP_BONUS)
+        self._post_action_cleanup({'type': 'move', 'start_pos': start_sq, 'end_pos': end_sq}); return True
+
+    def handle_ability_activation(self, piece_str, target_str=None):
+        """Uses the ability of the piece on piece_str ('e2'), aimed at target_str if it takes a target."""
+        if self.game_over: print("The game is over."); return False
+        square = self.board.squares.square
+        pc_sq = square(piece_str)
+        if pc_sq is None: print("Invalid piece_pos"); return False
+        tgt_sq = None
+        if target_str:
+            tgt_sq = square(target_str)
+            if tgt_sq is None: print("Invalid target_pos"); return False
+        return self.use_ability(pc_sq, tgt_sq)
 
-    def handle_ability_activation(self, piece_str, target_str=None): # (Unchanged)
-        pc_coords=self.utils['algebraic_to_coords'](piece_str)
-        if not pc_coords: print("Invalid piece_pos"); return False
-        p=self.board.get_piece(pc_coords)
+    def use_ability(self, pc_sq, target_sq=None):
+        """handle_ability_activation for integer squares, as in action dicts; target_sq None for self-targeted abilities."""
+        if self.game_over: print("The game is over."); return False
+        if not self._on_board(pc_sq): print("Invalid piece_pos"); return False
+        if target_sq is not None and not self._on_board(target_sq): print("Invalid target_pos"); return False
+        p=self.board.get_piece(pc_sq)
         if not p: print("No piece"); return False
         if p.color!=self.current_player: print("Not your piece"); return False
         if not p.is_action_allowed(): print(f"{p} is frozen!"); return False
         if not p.ability: print("No ability"); return False
-        if p.ability_cooldown>0: print("Ability on CD"); return False
-        tgt_coords=None
+        if p.ability_ready_at: print("Ability on CD"); return False
+        tgt_sq=None
         if p.ability.target_type!='self':
-            if not target_str and ('square' in p.ability.target_type or 'piece' in p.ability.target_type): print("Needs target"); return False
-            if target_str:
-                tgt_coords=self.utils['algebraic_to_coords'](target_str)
-                if not tgt_coords: print("Invalid target_pos"); return False
-                if self.board.tile_effects[tgt_coords[0]][tgt_coords[1]]==self.board.LAVA_EFFECT: print("Target LAVA"); return False
-        hypo_b=copy.deepcopy(self.board); hypo_p=hypo_b.get_piece(pc_coords); hypo_g=copy.copy(self); hypo_g.board=hypo_b
+            if target_sq is None and ('square' in p.ability.target_type or 'piece' in p.ability.target_type): print("Needs target"); return False
+            if target_sq is not None:
+                tgt_sq=target_sq
+                if self.board.tile_effects[tgt_sq]==self.board.LAVA_EFFECT: print("Target LAVA"); return False
+        hypo_b=copy.deepcopy(self.board); hypo_p=hypo_b.get_piece(pc_sq); hypo_g=copy.copy(self); hypo_g.board=hypo_b
         # Make sure hypothetical piece has correct ability reference for effect_logic
         if hypo_p: hypo_p.ability = p.ability
 
-        if p.ability.effect_logic(hypo_g,hypo_p,tgt_coords):
+        with search.quiet(): applied = p.ability.effect_logic(hypo_g,hypo_p,tgt_sq) # Only the real use below reports
+        if applied:
             if self.is_in_check(self.current_player,hypo_b): print("Ability puts King in check."); return False
         else: return False
-        if p.ability.effect_logic(self,p,tgt_coords):
+        if p.ability.effect_logic(self,p,tgt_sq):
             # Message printing moved to AI handler for AI
             if self.current_player != self.ai_player_color: print(f"{p} used {p.ability.name}.")
-            p.ability_cooldown=p.ability.cooldown_max
-            self.add_sp(self.current_player,self.QUICK_DECISION_SP_BONUS); self._post_action_cleanup(); return True
+            p.ability_ready_at=due_after(p.color, turn_clock(self), p.ability.cooldown_max); self.timers.track(self, p, 'cooldown'); self.invalidate_legal_moves()
+            self.add_sp(self.current_player,self.QUICK_DECISION_SP_BONUS)
+            self._post_action_cleanup({'type': 'ability', 'piece_pos': pc_sq, 'target_pos': tgt_sq}); return True
         return False
 
-    def _generate_ai_ability_uses(self, ai_pieces): # (Unchanged from previous step)
-        possible_ability_uses = []
-        for piece in ai_pieces:
-            if piece.ability and piece.ability_cooldown == 0 and piece.is_action_allowed():
-                ability_name = piece.ability.name
-                target_type = piece.ability.target_type
-                potential_targets = []
-                if target_type == 'empty_square':
-                    for _ in range(5):
-                        range_limit = piece.ability.range_limit if hasattr(piece.ability, 'range_limit') else 2
-                        rand_r_offset = random.randint(-range_limit, range_limit)
-                        rand_c_offset = random.randint(-range_limit, range_limit)
-                        tr, tc = piece.position[0] + rand_r_offset, piece.position[1] + rand_c_offset
-                        if self.board._is_on_board(tr, tc) and self.board.get_piece((tr,tc)) is None and \
-                           self.board.tile_effects[tr][tc] != self.board.LAVA_EFFECT:
-                            potential_targets.append((tr,tc))
-                elif target_type == 'ally_piece_adjacent':
-                    for dr in [-1,0,1]:
-                        for dc in [-1,0,1]:
-                            if dr==0 and dc==0: continue
-                            tr, tc = piece.position[0]+dr, piece.position[1]+dc
-                            if self.board._is_on_board(tr,tc):
-                                target_piece = self.board.get_piece((tr,tc))
-                                if target_piece and target_piece.color == self.ai_player_color and target_piece != piece:
-                                    potential_targets.append((tr,tc))
-                elif target_type == 'self': potential_targets.append(None)
-                for target_coords in potential_targets:
-                    hypo_b_abil = copy.deepcopy(self.board); hypo_p_abil = hypo_b_abil.get_piece(piece.position)
-                    if hypo_p_abil: hypo_p_abil.ability = piece.ability # Ensure correct ability ref for hypo piece
-                    hypo_g_abil = copy.copy(self); hypo_g_abil.board = hypo_b_abil
-                    if piece.ability.effect_logic(hypo_g_abil, hypo_p_abil, target_coords):
-                        if not self.is_in_check(self.ai_player_color, hypo_b_abil):
-                            possible_ability_uses.append({'type': 'ability', 'piece_pos': piece.position,
-                                                          'target_pos': target_coords, 'ability_name': ability_name,
-                                                          'piece_repr': str(piece)})
-                    if len(possible_ability_uses) > 5 and target_type != 'self': break
-            if len(possible_ability_uses) > 10 : break
-        return possible_ability_uses
-
-    def _generate_ai_special_moves(self, player_color):
-        possible_special_moves = []
-        available_sp = self.player_sp[player_color]
+    def _ability_target_candidates(self, piece):
+        """Squares (or None for self-targeted abilities) an ability could be aimed at, before simulation."""
+        return piece.ability.target_candidates(self, piece)
+
+    def _iter_ability_uses(self, pieces):
+        """Yields every ability use of the given pieces that succeeds and keeps their king safe."""
+        for piece in pieces:
+            if not (piece.ability and not piece.ability_ready_at and piece.is_action_allowed()): continue
+            for target_sq in self._ability_target_candidates(piece):
+                hypo_b_abil = copy.deepcopy(self.board); hypo_p_abil = hypo_b_abil.get_piece(piece.position)
+                if hypo_p_abil: hypo_p_abil.ability = piece.ability # Ensure correct ability ref for hypo piece
+                hypo_g_abil = copy.copy(self); hypo_g_abil.board = hypo_b_abil
+                with search.quiet(): applied = piece.ability.effect_logic(hypo_g_abil, hypo_p_abil, target_sq) # Effects print
+                if applied and not self.is_in_check(piece.color, hypo_b_abil):
+                    yield {'type': 'ability', 'piece_pos': piece.position, 'target_pos': target_sq,
+                           'ability_name': piece.ability.name, 'piece_repr': str(piece)}
 
+    def _special_keeps_king_safe(self, player, key, args):
+        """True if the special succeeds on a copy of the game and leaves player's king out of check."""
+        hypo_g = copy.deepcopy(self)
+        with search.quiet(): applied = hypo_g.SPECIAL_MOVES[key]['effect'](player, list(args))
+        return applied and not self.is_in_check(player, hypo_g.board)
+
+    def _iter_special_moves(self, player_color):
+        """Yields every affordable special move: each redeployable type on each free back-rank square; in check, only those that answer it."""
+        available_sp = self.player_sp[player_color]
+        in_check = None # Only worked out if some special is affordable
         for key, move_data in self.SPECIAL_MOVES.items():
-            if available_sp >= move_data['sp_cost']:
-                if key == 'redeploy':
-                    if self.player_lost_pieces[player_color]:
-                        lost_piece_type = random.choice(self.player_lost_pieces[player_color])
-                        redeploy_row = 0 if player_color == 'black' else 7
-                        # Try a few random columns for redeployment
-                        possible_cols = list(range(8))
-                        random.shuffle(possible_cols)
-                        for col in possible_cols[:3]: # Try up to 3 random columns
-                            target_coords = (redeploy_row, col)
-                            target_sq_str = self.utils['coords_to_algebraic'](target_coords)
-                            # Validate target square (must be empty, not lava)
-                            if self.board.get_piece(target_coords) is None and \
-                               self.board.tile_effects[target_coords[0]][target_coords[1]] != self.board.LAVA_EFFECT:
-                                # Redeploy doesn't cause self-check in a direct way
-                                possible_special_moves.append({'type': 'special', 'key': key,
-                                                               'args': [lost_piece_type, target_sq_str],
-                                                               'name': move_data['name']})
-                                break # Found a valid spot for this piece type
-                elif key == 'freeze_pawns':
-                    # No target, no complex validation beyond SP cost
-                    # Effect does not alter board state to cause self-check
-                    possible_special_moves.append({'type': 'special', 'key': key, 'args': [],
-                                                   'name': move_data['name']})
-        return possible_special_moves
+            if available_sp < move_data['sp_cost']: continue
+            if in_check is None: in_check = self.is_in_check(player_color, self.board)
+            if key == 'redeploy':
+                redeploy_row = 0 if player_color == 'black' else self.board.height - 1
+                for lost_piece_type in sorted(set(self.player_lost_pieces[player_color])):
+                    for sq in range(redeploy_row * self.board.width, (redeploy_row + 1) * self.board.width):
+                        # Validate target square (must be empty, not lava); redeploy cannot cause self-check
+                        if self.board.grid[sq] is None and self.board.tile_effects[sq] != self.board.LAVA_EFFECT:
+                            args = [lost_piece_type, self.board.squares.names[sq]]
+                            if in_check and not self._special_keeps_king_safe(player_color, key, args): continue # Does not block
+                            yield {'type': 'special', 'key': key, 'args': args, 'name': move_data['name']}
+            elif key == 'freeze_pawns':
+                # No target; the effect moves nothing, so it cannot expose the king - but it cannot answer a check either
+                if in_check and not self._special_keeps_king_safe(player_color, key, []): continue
+                yield {'type': 'special', 'key': key, 'args': [], 'name': move_data['name']}
 
-    def handle_ai_turn(self): # (Now includes special moves)
-        print(f"\n--- {self.ai_player_color.capitalize()}'s Turn (AI) ---")
-        if self.current_player != self.ai_player_color: return
+    def _moves_to(self, piece, squares):
+        """Yields move actions of piece to the given squares that pass the move rules and keep its king safe."""
+        start_pos = piece.position
+        for end_pos in squares:
+            if start_pos == end_pos or self.board.tile_effects[end_pos] == self.board.LAVA_EFFECT: continue
+            if piece.is_valid_move(self.board, start_pos, end_pos) and \
+               not self._move_exposes_king(piece.color, start_pos, end_pos):
+                yield {'type': 'move', 'start_pos': start_pos, 'end_pos': end_pos, 'piece_repr': str(piece)}
 
-        ai_pieces = [p for p in self.board.get_all_pieces() if p.color == self.ai_player_color and p.is_action_allowed()]
-        possible_std_moves = []
-        for piece in ai_pieces: # (Standard move generation unchanged)
-            start_pos = piece.position
-            for r_idx in range(8):
-                for c_idx in range(8):
-                    end_pos = (r_idx, c_idx)
-                    if start_pos == end_pos or self.board.tile_effects[r_idx][c_idx] == self.board.LAVA_EFFECT: continue
-                    if piece.is_valid_move(self.board, start_pos, end_pos) and \
-                       not self._is_move_putting_king_in_check(self.ai_player_color, start_pos, end_pos):
-                        possible_std_moves.append({'type': 'move', 'start_pos': start_pos, 'end_pos': end_pos,
-                                                   'piece_repr': str(piece)})
-
-        possible_ability_uses = self._generate_ai_ability_uses(ai_pieces)
-        possible_special_moves = self._generate_ai_special_moves(self.ai_player_color)
-
-        all_possible_actions = possible_std_moves + possible_ability_uses + possible_special_moves
-        if not all_possible_actions:
-            print(f"AI ({self.ai_player_color}) has no valid actions. Passing."); self._post_action_cleanup(); return
+    def _iter_standard_moves(self, pieces, captures=None):
+        """Yields move actions for the given (unfrozen) pieces, filtered for king safety; captures=False keeps only quiet moves."""
+        if captures: yield from self._iter_capture_moves(pieces); return
+        for piece in pieces:
+            squares = sorted(piece.candidate_squares(self.board)) # Sorted: same order as a full board scan
+            if captures is not None: squares = [sq for sq in squares if self.board.get_piece(sq) is None]
+            yield from self._moves_to(piece, squares)
 
-        selected_action = random.choice(all_possible_actions)
-        action_type = selected_action['type']
-        print(f"AI ({self.ai_player_color}) is thinking...")
+    def _iter_capture_moves(self, pieces):
+        """Yields only the capturing moves of the given pieces (see Piece.capture_squares)."""
+        for piece in pieces: yield from self._moves_to(piece, sorted(piece.capture_squares(self.board)))
+
+    def checkers(self, player_color):
+        """Squares of the opposing pieces giving check to player_color's king."""
+        king_pos = self._find_king_position(player_color, self.board)
+        if king_pos is None: return []
+        return [p.position for p in self.board.get_all_pieces()
+                if p.color != player_color and p.is_valid_move(self.board, p.position, king_pos)]
+
+    def _iter_check_evasions(self, player_color):
+        """Yields the moves that get player_color out of check (see Piece.evasion_squares); abilities and specials are not tried."""
+        king_pos = self._find_king_position(player_color, self.board)
+        if king_pos is None: return
+        checkers = self.checkers(player_color)
+        for piece in self._movable_pieces(player_color):
+            yield from self._moves_to(piece, sorted(piece.evasion_squares(self.board, king_pos, checkers)))
+
+    def _movable_pieces(self, player_color):
+        return [p for p in self.board.get_all_pieces() if p.color == player_color and p.is_action_allowed()]
 
+    def _iter_legal_actions(self, player_color):
+        """Lazily yields moves, then ability uses, then affordable specials for player_color."""
+        pieces = self._movable_pieces(player_color)
+        yield from self._iter_standard_moves(pieces)
+        yield from self._iter_ability_uses(pieces)
+        yield from self._iter_special_moves(player_color)
+
+    def has_legal_action(self, player_color=None):
+        """True if player_color (default: current player) has any action; stops at the first one found."""
+        if player_color is None: player_color = self.current_player
+        if player_color == self.current_player and getattr(self, '_legal_moves_cache', None) is not None:
+            return bool(self._legal_moves_cache)
+        # Specials need no simulation unless in check, so try them before moves and abilities
+        if next(self._iter_special_moves(player_color), None) is not None: return True
+        pieces = self._movable_pieces(player_color)
+        if next(self._iter_standard_moves(pieces), None) is not None: return True
+        return next(self._iter_ability_uses(pieces), None) is not None
+
+    def invalidate_legal_moves(self):
+        """Drops the cached legal moves; called wherever pieces, tiles, cooldowns, status, SP or the turn change."""
+        self._legal_moves_cache = None; self._legal_moves_by_square = None
+
+    def legal_moves(self):
+        """All actions available to the current player, computed once per position."""
+        if getattr(self, '_legal_moves_cache', None) is None:
+            self._legal_moves_cache = list(self._iter_legal_actions(self.current_player))
+            self._legal_moves_by_square = None
+        return list(self._legal_moves_cache)
+
+    def legal_moves_for(self, square):
+        """Moves and ability uses of the current player's piece on square ('e2' or an integer square)."""
+        sq = self.board.squares.square(square) if isinstance(square, str) else square
+        actions = self.legal_moves()
+        if self._legal_moves_by_square is None:
+            by_square = {}
+            for action in actions:
+                if action['type'] == 'move': by_square.setdefault(action['start_pos'], []).append(action)
+                elif action['type'] == 'ability': by_square.setdefault(action['piece_pos'], []).append(action)
+            self._legal_moves_by_square = by_square
+        return list(self._legal_moves_by_square.get(sq, []))
+
+    def generate_actions(self, player_color):
+        """Collects the moves, ability uses and special moves available to player_color."""
+        if player_color == self.current_player: return self.legal_moves()
+        return list(self._iter_legal_actions(player_color))
+
+    def execute_action(self, action):
+        """Plays an action dict (as built by generate_actions) for the current player. Returns success."""
+        action_type = action['type']
+        if action_type == 'move':
+            return self.play_move(action['start_pos'], action['end_pos'])
+        elif action_type == 'ability':
+            return self.use_ability(action['piece_pos'], action['target_pos'])
+        elif action_type == 'special':
+            return self.handle_special_move(self.current_player, action['key'], action.get('args', []))
+        return False
+
+    def _announce_ai_action(self, selected_action):
+        action_type = selected_action['type']
         if action_type == 'move':
-            start_sq_str = self.utils['coords_to_algebraic'](selected_action['start_pos'])
-            end_sq_str = self.utils['coords_to_algebraic'](selected_action['end_pos'])
+            start_sq_str = self.board.squares.names[selected_action['start_pos']]
+            end_sq_str = self.board.squares.names[selected_action['end_pos']]
             print(f"AI MOVE: {selected_action['piece_repr']} from {start_sq_str} to {end_sq_str}.")
-            self.play_turn(start_sq_str, end_sq_str)
         elif action_type == 'ability':
-            piece_pos_str = self.utils['coords_to_algebraic'](selected_action['piece_pos'])
-            target_pos_str = self.utils['coords_to_algebraic'](selected_action['target_pos']) if selected_action['target_pos'] else None
+            target_pos_str = self.board.squares.names[selected_action['target_pos']] if selected_action['target_pos'] is not None else None
             print(f"AI ABILITY: {selected_action['ability_name']} by {selected_action['piece_repr']} "
                   f"{('targeting ' + target_pos_str) if target_pos_str else ''}.")
-            self.handle_ability_activation(piece_pos_str, target_pos_str)
         elif action_type == 'special':
-            key = selected_action['key']
-            args = selected_action.get('args', [])
-            print(f"AI SPECIAL: {selected_action['name']} with args {args}.")
-            self.handle_special_move(self.ai_player_color, key, args)
-        else: print("AI chose unknown action. Passing."); self._post_action_cleanup()
+            print(f"AI SPECIAL: {selected_action['name']} with args {selected_action.get('args', [])}.")
+
+    def _probe_opening_book(self):
+        """Returns the book action for the current position, or None if the book has no entry."""
+        if self.opening_book is None: return None
+        return self.opening_book.probe(position_hash(self, abilities=False), self) # opening_book.book_hash
+
+    def choose_ai_action(self, all_possible_actions):
+        """Picks one of all_possible_actions: tablebase-perfect if in the tables, else random at ai_depth 0 or by search."""
+        if self.tablebase is not None:
+            table_action = self.tablebase.best_action(self, all_possible_actions)
+            if table_action is not None: return table_action
+        if self.ai_depth > 0:
+            if self.parallel_search is not None:
+                return self.parallel_search.best_action(self, self.ai_depth, all_possible_actions)
+            return search.best_action(self, self.ai_depth, all_possible_actions, self.transposition_table)
+        return random.choice(all_possible_actions)
+
+    def handle_ai_turn(self): # (Now includes special moves)
+        if self.game_over:
+            if self.ponderer is not None: self.ponderer.stop()
+            return
+        print(f"\n--- {self.ai_player_color.capitalize()}'s Turn (AI) ---")
+        if self.current_player != self.ai_player_color: return
+
+        book_action = self._probe_opening_book()
+        if book_action is not None:
+            if self.ponderer is not None: self.ponderer.stop() # The book answers; the ponder search is not needed
+            print(f"AI ({self.ai_player_color}) plays from the opening book.")
+            self._announce_ai_action(book_action)
+            if self._play_ai_action(book_action): return
+            print("Book move rejected; thinking instead.")
+
+        if self.ponderer is not None and self.tablebase is not None and self.tablebase.probe(self) is not None:
+            self.ponderer.stop() # The tables' perfect move beats any search
+        elif self.ponderer is not None:
+            pondered_action = self.ponderer.take(self)
+            if pondered_action is not None:
+                print(f"AI ({self.ai_player_color}) answers from its ponder search.")
+                self._announce_ai_action(pondered_action)
+                if self._play_ai_action(pondered_action): return
+
+        all_possible_actions = self.generate_actions(self.ai_player_color)
+        if not all_possible_actions:
+            print(f"AI ({self.ai_player_color}) has no valid actions. Passing."); self._post_action_cleanup(); return
+
+        selected_action = self.choose_ai_action(all_possible_actions)
+        print(f"AI ({self.ai_player_color}) is thinking...")
+        if selected_action['type'] not in ('move', 'ability', 'special'):
+            print("AI chose unknown action. Passing."); self._post_action_cleanup(); return
+        self._announce_ai_action(selected_action)
+        self._play_ai_action(selected_action)
+
+    def _play_ai_action(self, action):
+        """Executes an AI action, reporting the position and choice to the exporter."""
+        exporter = self.training_exporter
+        if exporter is not None: exporter.record(self, action)
+        played = self.execute_action(action)
+        if exporter is not None and not played: exporter.discard_last(self)
+        return played # Results are filled in by _check_game_end
 
     def _find_king_position(self, player, board_state): # (Unchanged)
-        for r,row_data in enumerate(board_state.grid):
-            for c,p_obj in enumerate(row_data):
-                if p_obj and p_obj.piece_type_name=="KING" and p_obj.color==player: return (r,c)
+        for sq,p_obj in enumerate(board_state.grid):
+            if p_obj and p_obj.piece_type_name=="KING" and p_obj.color==player: return sq
         return None
     def is_in_check(self, player, board_state): # (Unchanged)
         king_pos=self._find_king_position(player,board_state)
-        if not king_pos: return True
+        if king_pos is None: return True
         opp= "black" if player=="white" else "white"
         # Iterate over a copy of the grid for safety if board_state can change during iteration
         grid_to_check = board_state.grid
-        for r,row_data in enumerate(grid_to_check):
-            for c,p_obj in enumerate(row_data): # p_obj is from board_state
-                if p_obj and p_obj.color==opp:
-                    # Pass board_state to is_valid_move
-                    if p_obj.is_valid_move(board_state,(r,c),king_pos): return True
+        for sq,p_obj in enumerate(grid_to_check): # p_obj is from board_state
+            if p_obj and p_obj.color==opp:
+                # Pass board_state to is_valid_move
+                if p_obj.is_valid_move(board_state,sq,king_pos): return True
         return False
 
-if __name__ == "__main__": # (Main loop unchanged)
-    game = Game(ai_player_color='black')
+    def handle_command(self, line):
+        """Runs one console command of the human player; returns False for 'quit'."""
+        action = line.lower().split()
+        if not action: return True
+        cmd = action[0]
+        if cmd=='quit': return False
+        elif cmd in ('undo', 'redo'):
+            step = self.undo if cmd == 'undo' else self.redo
+            if not step(): print(f"Nothing to {cmd}."); return True
+            if self.current_player == self.ai_player_color: step() # Also take back / replay the AI's ply
+            print(f"{cmd.capitalize()} done. Ply {self.ply}.")
+        elif cmd=='togglefog': self.board.fog_of_war_on = not self.board.fog_of_war_on; self.board.update_visibility(self.current_player); print(f"FoW {'ON' if self.board.fog_of_war_on else 'OFF'}.")
+        elif cmd=='move':
+            if len(action)==3: self.play_turn(action[1],action[2])
+            else: print("Format: move S E")
+        elif cmd=='ability':
+            if len(action)>=2: self.handle_ability_activation(action[1],action[2] if len(action)==3 else None)
+            else: print("Format: ability P [T]")
+        elif cmd=='special':
+            if len(action)>=2: self.handle_special_move(self.current_player,action[1],action[2:] if len(action)>2 else [])
+            else: print("Format: special M [params...]")
+        else: print(f"Unknown: {cmd}.")
+        return True
+
+if __name__ == "__main__":
+    import argparse, contextlib, io, sys
+    from renderer import DiffRenderer
+    parser = argparse.ArgumentParser(description="Play Chaos Chess against the AI.")
+    parser.add_argument('--depth', type=int, default=0, help='AI search depth (0: random AI).')
+    parser.add_argument('--ponder', action='store_true', help='Let the AI search while you think (needs --depth > 0).')
+    args = parser.parse_args()
+    ponderer = None
+    if args.ponder:
+        from ponder import Ponderer
+        ponderer = Ponderer()
+    game = Game(ai_player_color='black', ai_depth=args.depth, ponderer=ponderer)
+    renderer = DiffRenderer(); messages = "" # Output of the last action, shown under the next frame
     while not game.game_over:
-        game.board.display(game)
+        output = io.StringIO()
+        if game.current_player == game.ai_player_color: # The board is drawn from the human's side only, so each frame diffs against the last
+            with contextlib.redirect_stdout(output): game.handle_ai_turn()
+            messages += output.getvalue(); continue
+        game.board.display(game, renderer=renderer)
+        sys.stdout.write("\x1b[J" + messages); messages = "" # Clear what the last frame left below the board
         print(f"Player: {game.current_player} (SP: {game.player_sp[game.current_player]}) | Lost: W{game.player_lost_pieces['white']} B{game.player_lost_pieces['black']} | Turn: {game.full_turn_counter+1}")
         if game.is_in_check(game.current_player, game.board): print(f"{game.current_player.upper()} IS IN CHECK!")
-        if game.current_player == game.ai_player_color and not game.game_over: game.handle_ai_turn()
-        else:
-            action = input("Action ('move S E', 'ability P [T]', 'special M [ARGS...]', 'togglefog', 'quit'): ").lower().split()
-            if not action: continue; cmd=action[0]
-            if cmd=='quit': break
-            elif cmd=='togglefog': game.board.fog_of_war_on = not game.board.fog_of_war_on; game.board.update_visibility(game.current_player); print(f"FoW {'ON' if game.board.fog_of_war_on else 'OFF'}.")
-            elif cmd=='move':
-                if len(action)==3: game.play_turn(action[1],action[2])
-                else: print("Format: move S E")
-            elif cmd=='ability':
-                if len(action)>=2: game.handle_ability_activation(action[1],action[2] if len(action)==3 else None)
-                else: print("Format: ability P [T]")
-            elif cmd=='special':
-                if len(action)>=2: game.handle_special_move(game.current_player,action[1],action[2:] if len(action)>2 else [])
-                else: print("Format: special M [params...]")
-            else: print(f"Unknown: {cmd}.")
-    print("\nGame finished.")
+        if game.ponderer is not None and game.ai_depth > 0: game.ponderer.start(game, game.ai_depth)
+        line = input("Action ('move S E', 'ability P [T]', 'special M [ARGS...]', 'undo', 'redo', 'togglefog', 'quit'): ")
+        with contextlib.redirect_stdout(output): keep_playing = game.handle_command(line)
+        messages = output.getvalue()
+        if not keep_playing: break
+    if game.ponderer is not None: game.ponderer.stop()
+    sys.stdout.write(messages)
+    if game.game_over: print(f"\nGame finished. {'Winner: ' + game.winner.capitalize() if game.winner else 'Draw.'}")
+    else: print("\nGame finished.")
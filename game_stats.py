@@ -0,0 +1,238 @@
+import gzip
+import json
+import random
+from collections import Counter
+
+from serialization import ability_key
+
+# Game logs and streaming statistics for balance analysis.
+#
+# A log is a JSON-lines file, gzip-compressed if its name ends in .gz, with one record
+# per finished game. Records are built from the game's history (history.py), so playing
+# a game needs no extra hooks:
+#   {"v": 1, "seed": 7, "width": 8, "height": 8, "winner": "white" | "black" | null,
+#    "plies": 83, "abilities": {"white": ["Teleport_R2", ...], "black": [...]},
+#    "sp": {"white": [banked SP after each full turn, ...], "black": [...]},
+#    "events": [[kind, ply, color, detail, value], ...]}
+# with event kinds
+#   capture  detail: victim piece type
+#   sp       detail: banked SP after the ply, value: change (gains and special costs)
+#   special  detail: special move key
+#   ability  detail: ABILITIES_POOL key
+#   tile     detail: effect generated on square value (color is null)
+#   landing  detail: effect of the tile a moved piece landed on
+#
+# GameStats reads records one at a time and only keeps counters and fixed-size
+# histograms, so memory does not grow with the number of games. Partial results from
+# shards merge exactly (merge(), to_json()/from_json()), and aggregate() runs one shard
+# per worker process.
+
+LOG_VERSION = 1
+COLORS = ('white', 'black')
+MAX_CURVE_TURNS = 100 # SP curves stop here; later turns are counted in the last point
+PLY_BIN = 10 # Width of the game-length histogram bins
+MAX_PLY_BINS = 50
+
+def _opponent(color): return 'black' if color == 'white' else 'white'
+
+# --- Writing logs ---
+
+def game_record(game, seed=None):
+    """Log record of a played game, read from game.history."""
+    versions = game.history.versions[:game.history.cursor + 1]
+    names = game.board.squares.names; width = game.board.width
+    start = versions[0]
+    abilities = {color: sorted(ability_key(state.ability) for row in start.rows for state in row
+                               if state is not None and state.color == color and state.ability is not None)
+                 for color in COLORS}
+    events = []; sp = {color: [] for color in COLORS}
+    for ply in range(1, len(versions)):
+        prev, version = versions[ply - 1], versions[ply]
+        mover = prev.current_player; action = version.action
+        for color, (before, after) in zip(COLORS, zip(prev.lost_pieces, version.lost_pieces)):
+            for victim in after[len(before):]: events.append(['capture', ply, _opponent(color), victim, None])
+        for color, before, after in zip(COLORS, prev.player_sp, version.player_sp):
+            if after != before: events.append(['sp', ply, color, after, after - before])
+        if action is not None and action['type'] == 'special': events.append(['special', ply, mover, action['key'], None])
+        elif action is not None and action['type'] == 'ability':
+            r, c = divmod(action['piece_pos'], width); state = prev.rows[r][c]
+            if state is not None and state.ability is not None:
+                events.append(['ability', ply, mover, ability_key(state.ability), None])
+        elif action is not None and action['type'] == 'move':
+            r, c = divmod(action['end_pos'], width)
+            if prev.tiles[r][c] is not None: events.append(['landing', ply, mover, prev.tiles[r][c], None])
+        for r, (old_row, new_row) in enumerate(zip(prev.tiles, version.tiles)):
+            if old_row is new_row: continue
+            for c, (old, new) in enumerate(zip(old_row, new_row)):
+                if new is not None and new != old: events.append(['tile', ply, None, new, names[r * width + c]])
+        if ply % 2 == 0 or ply == len(versions) - 1:
+            for color, banked in zip(COLORS, version.player_sp): sp[color].append(banked)
+    return {'v': LOG_VERSION, 'seed': seed, 'width': game.board.width, 'height': game.board.height,
+            'winner': game.winner if game.game_over else None, 'plies': len(versions) - 1,
+            'abilities': abilities, 'sp': sp, 'events': events}
+
+def _open(path, mode):
+    return gzip.open(path, mode + 't', encoding='utf-8') if path.endswith('.gz') else open(path, mode, encoding='utf-8')
+
+class GameLogWriter:
+    """Appends game records to a JSON-lines log (.jsonl.gz is compressed)."""
+
+    def __init__(self, path): self.path = path; self._file = _open(path, 'a'); self.written = 0
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n"); self.written += 1
+
+    def write_game(self, game, seed=None): self.write(game_record(game, seed))
+    def close(self): self._file.close()
+
+def log_self_play(path, games=100, depth=0, seed=0, max_plies=300, width=8, height=8):
+    """Plays games AI-vs-AI (game i seeded with seed + i) and appends their records to path."""
+    from game import Game
+    from search import quiet
+    rng_state = random.getstate()
+    try:
+        with GameLogWriter(path) as writer, quiet():
+            for game_index in range(games):
+                random.seed(seed + game_index)
+                game = Game(ai_player_color='white', ai_depth=depth, width=width, height=height)
+                for _ in range(max_plies):
+                    if game.game_over: break
+                    game.ai_player_color = game.current_player; game.handle_ai_turn()
+                writer.write_game(game, seed + game_index)
+    finally:
+        random.setstate(rng_state)
+    return writer.written
+
+# --- Reading and aggregating ---
+
+def read_records(paths):
+    """Lazily yields the records of one or more logs, one line at a time."""
+    if isinstance(paths, str): paths = [paths]
+    for path in paths:
+        with _open(path, 'r') as f:
+            for line in f:
+                if line.strip(): yield json.loads(line)
+
+class GameStats:
+    """Running counters over game records; add() one record at a time, merge() shards."""
+
+    def __init__(self):
+        self.games = 0
+        self.results = Counter() # 'white' / 'black' / 'draw' -> games
+        self.ply_histogram = Counter() # bin index (plies // PLY_BIN, capped) -> games
+        self.ability_games = Counter() # ability key -> sides that had it at the start
+        self.ability_score = Counter() # ability key -> sum of those sides' results (win 1, draw 0.5)
+        self.ability_uses = Counter()
+        self.special_uses = Counter(); self.special_score = Counter() # key -> uses / summed result of the user
+        self.captures = Counter() # victim piece type -> captures
+        self.sp_gains = Counter() # SP change per ply -> occurrences
+        self.sp_curve_sum = Counter(); self.sp_curve_count = Counter() # full turn -> banked SP sum / samples
+        self.tiles_generated = Counter()
+        self.tile_landings = Counter(); self.tile_landing_score = Counter() # effect -> landings / summed lander result
+
+    def add(self, record):
+        winner = record['winner']
+        score = {color: 1.0 if winner == color else (0.5 if winner is None else 0.0) for color in COLORS}
+        self.games += 1; self.results[winner or 'draw'] += 1
+        self.ply_histogram[min(record['plies'] // PLY_BIN, MAX_PLY_BINS - 1)] += 1
+        for color in COLORS:
+            for key in set(record['abilities'][color]): self.ability_games[key] += 1; self.ability_score[key] += score[color]
+            for turn, banked in enumerate(record['sp'][color]):
+                turn = min(turn, MAX_CURVE_TURNS - 1); self.sp_curve_sum[turn] += banked; self.sp_curve_count[turn] += 1
+        for kind, ply, color, detail, value in record['events']:
+            if kind == 'capture': self.captures[detail] += 1
+            elif kind == 'sp': self.sp_gains[value] += 1
+            elif kind == 'special': self.special_uses[detail] += 1; self.special_score[detail] += score[color]
+            elif kind == 'ability': self.ability_uses[detail] += 1
+            elif kind == 'tile': self.tiles_generated[detail] += 1
+            elif kind == 'landing': self.tile_landings[detail] += 1; self.tile_landing_score[detail] += score[color]
+        return self
+
+    def update(self, records):
+        for record in records: self.add(record)
+        return self
+
+    COUNTERS = ('results', 'ply_histogram', 'ability_games', 'ability_score', 'ability_uses', 'special_uses',
+                'special_score', 'captures', 'sp_gains', 'sp_curve_sum', 'sp_curve_count', 'tiles_generated',
+                'tile_landings', 'tile_landing_score')
+    INT_KEYED = ('ply_histogram', 'sp_gains', 'sp_curve_sum', 'sp_curve_count') # JSON turns their keys into strings
+
+    def merge(self, other):
+        """Adds another shard's counts into this one; returns self."""
+        self.games += other.games
+        for name in self.COUNTERS: getattr(self, name).update(getattr(other, name))
+        return self
+
+    def to_json(self):
+        return {'games': self.games, **{name: dict(getattr(self, name)) for name in self.COUNTERS}}
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls(); stats.games = data['games']
+        for name in cls.COUNTERS:
+            counts = data.get(name, {})
+            getattr(stats, name).update({int(k) if name in cls.INT_KEYED else k: v for k, v in counts.items()})
+        return stats
+
+    def report(self):
+        """Win rates overall and by ability assignment, the SP curve and tile-effect impact."""
+        def rate(total, count): return round(total / count, 4) if count else None
+        return {
+            'games': self.games,
+            'results': {key: rate(self.results[key], self.games) for key in ('white', 'black', 'draw')},
+            'ability_win_rate': {key: {'sides': self.ability_games[key], 'score': rate(self.ability_score[key], self.ability_games[key]),
+                                       'uses': self.ability_uses[key]} for key in sorted(self.ability_games)},
+            'special_win_rate': {key: {'uses': self.special_uses[key], 'score': rate(self.special_score[key], self.special_uses[key])}
+                                 for key in sorted(self.special_uses)},
+            'sp_curve': [(turn, rate(self.sp_curve_sum[turn], self.sp_curve_count[turn])) for turn in sorted(self.sp_curve_count)],
+            'sp_gains': dict(sorted(self.sp_gains.items())),
+            'tile_impact': {effect: {'generated': self.tiles_generated[effect], 'landings': self.tile_landings[effect],
+                                     'lander_score': rate(self.tile_landing_score[effect], self.tile_landings[effect])}
+                            for effect in sorted(set(self.tiles_generated) | set(self.tile_landings))},
+            'captures': dict(self.captures.most_common()),
+            'game_length': {f"{b * PLY_BIN}-{b * PLY_BIN + PLY_BIN - 1}": n for b, n in sorted(self.ply_histogram.items())},
+        }
+
+def aggregate_file(path):
+    """GameStats of one log (a shard); the unit of work of aggregate()."""
+    return GameStats().update(read_records(path))
+
+def aggregate(paths, workers=None):
+    """Aggregates logs with one shard per file, in worker processes if workers > 1, and merges the shards."""
+    total = GameStats()
+    if workers is None or workers <= 1 or len(paths) <= 1:
+        for path in paths: total.merge(aggregate_file(path))
+        return total
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard in executor.map(aggregate_file, paths): total.merge(shard)
+    return total
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Self-play game logs and streaming balance statistics.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    log = commands.add_parser('log', help='Append self-play games to a .jsonl(.gz) log.')
+    log.add_argument('path')
+    log.add_argument('--games', type=int, default=100)
+    log.add_argument('--depth', type=int, default=0)
+    log.add_argument('--seed', type=int, default=0)
+    log.add_argument('--max-plies', type=int, default=300)
+    stats = commands.add_parser('stats', help='Aggregate logs (and saved partial results) into a report.')
+    stats.add_argument('paths', nargs='*', help='Game logs, one shard each.')
+    stats.add_argument('--workers', type=int, default=1)
+    stats.add_argument('--merge', action='append', default=[], help='Partial result JSON to merge in (repeatable).')
+    stats.add_argument('--save', help='Write the merged counts as partial-result JSON instead of a report.')
+    args = parser.parse_args()
+    if args.command == 'log':
+        print(f"Logged {log_self_play(args.path, args.games, args.depth, args.seed, args.max_plies)} games to {args.path}.")
+    else:
+        total = aggregate(args.paths, args.workers)
+        for path in args.merge:
+            with open(path) as f: total.merge(GameStats.from_json(json.load(f)))
+        if args.save:
+            with open(args.save, 'w') as f: json.dump(total.to_json(), f)
+            print(f"Saved counts of {total.games} games to {args.save}.")
+        else: print(json.dumps(total.report(), indent=2))
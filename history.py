@@ -0,0 +1,92 @@
+from collections import namedtuple
+
+# Persistent position history with structural sharing.
+#
+# Every version stores the board as a tuple of row tuples (one per rank of the flat,
+# square-indexed grid; see squares.py). A new version reuses its
+# parent's row objects for every row the action did not change, and identical piece
+# states are interned, so the history costs memory in proportion to what changed, not
+# plies x board size. Moving between versions only rebuilds the rows that differ from
+# the version currently on the board, which makes undo/redo O(changed rows).
+
+PieceState = namedtuple('PieceState', ['type_name', 'color', 'ability', 'ready_at', 'frozen', 'speed_buff']) # Timer clocks, as on the piece
+Version = namedtuple('Version', ['rows', 'tiles', 'current_player', 'full_turn_counter', 'evolution_timer',
+                                 'player_sp', 'lost_pieces', 'game_over', 'winner', 'action'])
+
+def piece_state(piece):
+    return PieceState(piece.piece_type_name, piece.color, piece.ability, piece.ability_ready_at,
+                      piece.status_effects.get('frozen', 0), piece.has_speed_buff)
+
+class GameHistory:
+    """Linear history of a Game with a cursor; recording after an undo discards the redo branch."""
+
+    def __init__(self):
+        self.versions = []
+        self.cursor = -1 # Index of the version currently on the board
+        self._interned = {}
+
+    def __len__(self): return len(self.versions)
+
+    @property
+    def ply(self): return self.cursor
+
+    def can_undo(self): return self.cursor > 0
+    def can_redo(self): return self.cursor < len(self.versions) - 1
+
+    def _intern(self, value): return self._interned.setdefault(value, value)
+
+    def _share(self, new_rows, old_rows):
+        if old_rows is None: return tuple(self._intern(row) for row in new_rows)
+        return tuple(old if old == new else self._intern(new) for new, old in zip(new_rows, old_rows))
+
+    def record(self, game, action=None):
+        """Appends the game's current position as a new version (after the cursor)."""
+        board = game.board
+        parent = self.versions[self.cursor] if self.cursor >= 0 else None
+        starts = range(0, len(board.grid), board.width) # First square of each rank
+        rows = [tuple(self._intern(piece_state(p)) if p is not None else None for p in board.grid[i:i + board.width]) for i in starts]
+        tiles = [tuple(board.tile_effects[i:i + board.width]) for i in starts]
+        version = Version(self._share(rows, parent.rows if parent else None),
+                          self._share(tiles, parent.tiles if parent else None),
+                          game.current_player, game.full_turn_counter, board.board_evolution_timer,
+                          (game.player_sp['white'], game.player_sp['black']),
+                          (tuple(game.player_lost_pieces['white']), tuple(game.player_lost_pieces['black'])),
+                          game.game_over, game.winner, action)
+        del self.versions[self.cursor + 1:]
+        self.versions.append(version); self.cursor += 1
+        return version
+
+    def _materialize(self, game, target):
+        """Rewrites only the rows and tile rows of the board that differ from the target version."""
+        board = game.board; live = self.versions[self.cursor]
+        for r in range(len(target.rows)):
+            first = r * board.width
+            if target.rows[r] is not live.rows[r]:
+                for sq, state in enumerate(target.rows[r], first):
+                    board.grid[sq] = self._build_piece(board, state, sq) if state is not None else None
+            if target.tiles[r] is not live.tiles[r]: board.tile_effects[first:first + board.width] = target.tiles[r]
+        board.board_evolution_timer = target.evolution_timer
+        game.current_player = target.current_player; game.full_turn_counter = target.full_turn_counter
+        game.player_sp = {'white': target.player_sp[0], 'black': target.player_sp[1]}
+        game.player_lost_pieces = {'white': list(target.lost_pieces[0]), 'black': list(target.lost_pieces[1])}
+        game.game_over = target.game_over; game.winner = target.winner
+        board.update_visibility(game.current_player)
+        game.invalidate_legal_moves(); game.reset_timers()
+
+    @staticmethod
+    def _build_piece(board, state, position):
+        piece = board.create_piece_by_str_and_color(state.type_name, state.color, position)
+        piece.ability = state.ability; piece.ability_ready_at = state.ready_at
+        if state.frozen: piece.status_effects['frozen'] = state.frozen
+        piece.has_speed_buff = state.speed_buff
+        return piece
+
+    def jump(self, game, index):
+        """Puts version index on the board. Returns False if index is out of range."""
+        if not 0 <= index < len(self.versions): return False
+        if index != self.cursor:
+            self._materialize(game, self.versions[index]); self.cursor = index
+        return True
+
+    def undo(self, game): return self.can_undo() and self.jump(game, self.cursor - 1)
+    def redo(self, game): return self.can_redo() and self.jump(game, self.cursor + 1)
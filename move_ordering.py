@@ -0,0 +1,92 @@
+import search
+
+# Move ordering for the alpha-beta search. Actions are tried in stages:
+#   1. the transposition table's best action for the position
+#   2. captures, most valuable victim / least valuable attacker first (PIECE_SP_VALUES)
+#   3. killer actions: quiet actions that caused a cutoff at the same ply elsewhere
+#   4. redeploys, most valuable piece first
+#   5. quiet moves by history score (cutoffs they caused, weighted by depth)
+#   6. ability uses by history score
+#   7. Global Freeze Pawns
+# staged() generates each stage only when the previous ones failed to cut off, so
+# the expensive stages (quiet moves and ability uses need a king-safety simulation per
+# action) are skipped at most cut nodes. Stored actions (TT, killers) are tried from
+# their codes without generating anything; the search's simulate() rejects illegal ones.
+
+KILLERS_PER_PLY = 2
+MVV_WEIGHT = 16 # Victim value dominates the attacker value
+KING_ATTACKER_VALUE = 10 # PIECE_SP_VALUES gives the king 0; as an attacker it is the last choice
+STAGE_TT, STAGE_CAPTURE, STAGE_KILLER, STAGE_REDEPLOY, STAGE_QUIET, STAGE_ABILITY, STAGE_FREEZE = range(7)
+
+def mvv_lva(game, action):
+    """MVV-LVA score of a move, or None if it captures nothing."""
+    if action['type'] != 'move': return None
+    victim = game.board.get_piece(action['end_pos'])
+    if victim is None: return None
+    attacker = game.board.get_piece(action['start_pos'])
+    attacker_value = KING_ATTACKER_VALUE if attacker is None or attacker.piece_type_name == "KING" else \
+        game.PIECE_SP_VALUES.get(attacker.piece_type_name, 0)
+    return game.PIECE_SP_VALUES.get(victim.piece_type_name, 0) * MVV_WEIGHT - attacker_value
+
+class MoveOrderer:
+    """Killer and history tables for one search; create one per root search (or clear() it)."""
+
+    def __init__(self):
+        self.killers = {} # ply -> [action code, ...] most recent first
+        self.history = {} # (color, action code) -> score
+
+    def clear(self): self.killers.clear(); self.history.clear()
+
+    def capture_score(self, game, action): return mvv_lva(game, action)
+
+    def sort_key(self, game, action, ply=0, tt_action=None):
+        """(stage, rank within the stage); lower sorts first."""
+        code = search.game_action_code(game, action)
+        if code == tt_action: return (STAGE_TT, 0)
+        capture = self.capture_score(game, action)
+        if capture is not None: return (STAGE_CAPTURE, -capture)
+        killers = self.killers.get(ply, [])
+        if code in killers: return (STAGE_KILLER, killers.index(code))
+        history = self.history.get((game.current_player, code), 0)
+        if action['type'] == 'move': return (STAGE_QUIET, -history)
+        if action['type'] == 'ability': return (STAGE_ABILITY, -history)
+        if action['key'] == 'redeploy': return (STAGE_REDEPLOY, -game.PIECE_SP_VALUES.get(action['args'][0].upper(), 0))
+        return (STAGE_FREEZE, 0)
+
+    def order(self, game, actions, ply=0, tt_action=None):
+        """Returns actions (an already generated list) sorted by stage and rank; ties keep their order."""
+        return sorted(actions, key=lambda action: self.sort_key(game, action, ply, tt_action))
+
+    def staged(self, game, ply=0, tt_action=None):
+        """Lazily yields the current player's actions in stage order, each at most once."""
+        color = game.current_player
+        tried = set()
+        def fresh(action):
+            code = search.game_action_code(game, action)
+            if code in tried: return False
+            tried.add(code); return True
+        for code in ([tt_action] if tt_action is not None else []):
+            action = search.decode_action(code, game)
+            if action is not None and fresh(action): yield action
+        pieces = game._movable_pieces(color)
+        captures = list(game._iter_capture_moves(pieces))
+        captures.sort(key=lambda action: -self.capture_score(game, action))
+        yield from filter(fresh, captures)
+        for code in self.killers.get(ply, []):
+            action = search.decode_action(code, game)
+            if action is not None and fresh(action): yield action
+        specials = list(game._iter_special_moves(color))
+        yield from filter(fresh, self.order(game, [a for a in specials if a['key'] == 'redeploy'], ply))
+        yield from filter(fresh, self.order(game, list(game._iter_standard_moves(pieces, captures=False)), ply))
+        yield from filter(fresh, self.order(game, list(game._iter_ability_uses(pieces)), ply))
+        yield from filter(fresh, [a for a in specials if a['key'] != 'redeploy'])
+
+    def record_cutoff(self, game, action, ply, depth):
+        """Credits an action that failed high: killer slot at this ply (if quiet) and history."""
+        if self.capture_score(game, action) is not None: return # Captures are already ordered first
+        code = search.game_action_code(game, action)
+        killers = self.killers.setdefault(ply, [])
+        if code in killers: killers.remove(code)
+        killers.insert(0, code); del killers[KILLERS_PER_PLY:]
+        key = (game.current_player, code)
+        self.history[key] = self.history.get(key, 0) + depth * depth
@@ -0,0 +1,138 @@
+import mmap
+import os
+import random
+import struct
+
+from game import Game
+from search import quiet, rank_actions, simulate, encode_action, decode_action, game_action_code
+from zobrist import position_hash
+
+# Opening book: precomputed best replies for the first plies after setup_pieces.
+# The file is a header followed by fixed-size records sorted by position hash, so the
+# AI can mmap it (instant startup, pages shared between worker processes) and
+# binary-search it without parsing anything.
+#
+# Abilities are assigned at random when a game is set up, so no two games start from
+# the same position_hash. Book positions are keyed by book_hash, which leaves abilities
+# out, and the builder samples many setups: each position's reply is the move or special
+# with the best average score over the ability assignments sampled. Ability uses are
+# never book replies, and probe() only returns a reply that is legal in the actual game.
+
+BOOK_MAGIC = b'CCOB'
+BOOK_VERSION = 2 # 2: keys are book_hash (abilities left out)
+HEADER = struct.Struct('<4sHHI') # magic, version, record size, record count
+RECORD = struct.Struct('<QBBBBh') # position hash, action code (4 bytes), score
+KEY = struct.Struct('<Q')
+SCORE_LIMIT = 32767
+
+def book_hash(game):
+    """The book key of game's position: position_hash without the pieces' abilities."""
+    return position_hash(game, abilities=False)
+
+class OpeningBook:
+    """Read-only, memory-mapped view of an opening book file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # mmap refuses empty files
+            self._file.close(); raise ValueError(f"{path} is not an opening book (empty file).")
+        magic, version, record_size, self._count = HEADER.unpack_from(self._mm, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or record_size != RECORD.size or \
+           len(self._mm) < HEADER.size + self._count * RECORD.size:
+            self.close(); raise ValueError(f"{path} is not a version {BOOK_VERSION} opening book.")
+
+    def __len__(self): return self._count
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def close(self):
+        if getattr(self, '_mm', None) is not None: self._mm.close(); self._mm = None
+        self._file.close()
+
+    def lookup(self, pos_hash):
+        """Binary-searches the records; returns (action_code, score) or None."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = KEY.unpack_from(self._mm, HEADER.size + mid * RECORD.size)[0]
+            if key < pos_hash: lo = mid + 1
+            elif key > pos_hash: hi = mid
+            else:
+                _, kind, a, b, c, score = RECORD.unpack_from(self._mm, HEADER.size + mid * RECORD.size)
+                return (kind, a, b, c), score
+        return None
+
+    def probe(self, pos_hash, game):
+        """Returns the book action (as an action dict for game) for pos_hash (see book_hash), or None if it has none legal."""
+        entry = self.lookup(pos_hash)
+        if entry is None: return None
+        action = decode_action(entry[0], game)
+        if action is None or action['type'] == 'ability': return None
+        code = game_action_code(game, action)
+        return action if any(game_action_code(game, legal) == code for legal in game.legal_moves()) else None
+
+def write_opening_book(path, entries):
+    """Writes {position_hash: (action_code, score)} as a sorted book file (atomically replaced)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, RECORD.size, len(entries)))
+        for pos_hash in sorted(entries):
+            code, score = entries[pos_hash]
+            f.write(RECORD.pack(pos_hash, *code, max(-SCORE_LIMIT, min(SCORE_LIMIT, score))))
+    os.replace(tmp_path, path)
+
+def build_opening_book(path, plies=4, samples=8, depth=1, width=2, seed=0):
+    """
+    Searches the first `plies` plies of `samples` freshly set-up games (each seed gives
+    the ability assignment a real game would get) and writes, for every visited book
+    position, the move or special with the best average score over the samples that
+    reached it. The top `width` of those replies are expanded so the book also covers
+    reasonable deviations. Returns the number of positions written.
+    """
+    totals = {} # book_hash -> action code -> [summed score, samples]
+    rng_state = random.getstate()
+    try:
+        with quiet():
+            for sample in range(samples):
+                random.seed(seed + sample)
+                frontier = [Game(ai_player_color=None)]; seen = set()
+                for _ in range(plies):
+                    next_frontier = []
+                    for position in frontier:
+                        key = book_hash(position)
+                        if key in seen: continue
+                        seen.add(key)
+                        ranked = [(score, action) for score, action in rank_actions(position, depth) if action['type'] != 'ability']
+                        scores = totals.setdefault(key, {})
+                        for score, action in ranked:
+                            total = scores.setdefault(encode_action(action), [0, 0]); total[0] += score; total[1] += 1
+                        for _, action in ranked[:width]:
+                            child = simulate(position, action)
+                            if child is not None and not child.game_over: next_frontier.append(child)
+                    frontier = next_frontier
+    finally:
+        random.setstate(rng_state)
+    entries = {}
+    for key, scores in totals.items():
+        if not scores: continue
+        code, (total, count) = max(scores.items(), key=lambda item: item[1][0] / item[1][1])
+        entries[key] = (code, round(total / count))
+    write_opening_book(path, entries)
+    return len(entries)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a Chaos Chess opening book.")
+    parser.add_argument('path')
+    parser.add_argument('--plies', type=int, default=4)
+    parser.add_argument('--samples', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--width', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    count = build_opening_book(args.path, args.plies, args.samples, args.depth, args.width, args.seed)
+    print(f"Wrote {count} positions to {args.path}.")
@@ -0,0 +1,80 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from move_ordering import MoveOrderer
+from search import INF, negamax, quiet, simulate
+from serialization import game_from_state, game_to_state
+
+# Root-parallel search: every root action (move, ability use or special) becomes a task
+# for a process pool. Workers get the compact serialized position instead of a pickled
+# Game, and share the best root score found so far through a shared value; each task
+# starts its search with that bound as alpha, so root actions searched later are
+# refuted with cheaper null-window-like searches once a good action is known.
+# Pass a SharedTranspositionTable (shared_tt.py) so positions searched by one worker are
+# hits for all the others.
+
+_shared_alpha = None
+_worker_tablebase = None
+_worker_tt = None
+_worker_evaluator = None
+_worker_orderer = None # Killer/history tables kept across this worker's tasks
+
+def _init_worker(shared_alpha, tablebase_path, transposition_table, evaluator_path=None):
+    global _shared_alpha, _worker_tablebase, _worker_tt, _worker_evaluator, _worker_orderer
+    _shared_alpha = shared_alpha; _worker_orderer = MoveOrderer()
+    _worker_tt = transposition_table # A SharedTranspositionTable unpickles by attaching to the segment
+    if tablebase_path is not None:
+        from tablebase import Tablebase
+        _worker_tablebase = Tablebase(tablebase_path)
+    if evaluator_path is not None:
+        from evaluator import NumpyEvaluator
+        _worker_evaluator = NumpyEvaluator.load(evaluator_path)
+
+def _search_root_action(state, action, depth, quiescence_depth=0):
+    """Worker task: returns (score, exact) for one root action, or None if it is rejected.
+    exact is False when the score only bounds a root action that failed low against the shared alpha."""
+    game = game_from_state(state, tablebase=_worker_tablebase, evaluator=_worker_evaluator)
+    game.quiescence_depth = quiescence_depth
+    with quiet():
+        child = simulate(game, action)
+        if child is None: return None
+        alpha = _shared_alpha.value
+        score = -negamax(child, depth - 1, -INF, -alpha, _worker_tt, _worker_orderer, 1)
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value: _shared_alpha.value = score
+    return score, score > alpha
+
+class ParallelSearcher:
+    """Process pool that searches root actions in parallel. Reuse one instance across moves."""
+
+    def __init__(self, workers=None, tablebase_path=None, transposition_table=None, evaluator_path=None):
+        context = multiprocessing.get_context()
+        self._shared_alpha = context.Value('d', -INF)
+        self.workers = workers or multiprocessing.cpu_count()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker,
+                                             initargs=(self._shared_alpha, tablebase_path, transposition_table,
+                                                       evaluator_path))
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def close(self): self._executor.shutdown(cancel_futures=True)
+
+    def rank_actions(self, game, depth, actions=None):
+        """Returns [(score, action)] best first; scores below the best are upper bounds only."""
+        if actions is None: actions = game.generate_actions(game.current_player)
+        actions = MoveOrderer().order(game, actions) # Likely-best actions first raise the shared alpha early
+        with self._shared_alpha.get_lock(): self._shared_alpha.value = -INF
+        state = game_to_state(game)
+        futures = [self._executor.submit(_search_root_action, state, action, depth, game.quiescence_depth) for action in actions]
+        scored = [(future.result(), index) for index, future in enumerate(futures)]
+        ranked = sorted(((result[0], result[1], index) for result, index in scored if result is not None),
+                        key=lambda item: (-item[0], not item[1], item[2]))
+        return [(score, actions[index]) for score, _, index in ranked]
+
+    def best_action(self, game, depth, actions=None):
+        """Best root action by parallel alpha-beta search (earliest action wins ties)."""
+        if actions is None: actions = game.generate_actions(game.current_player)
+        ranked = self.rank_actions(game, depth, actions)
+        return ranked[0][1] if ranked else (actions[0] if actions else None)
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from squares import square_table
+import copy
 import random
 
 # Assuming abilities.py might not be directly importable during the sequence of file creations.
@@ -6,26 +8,55 @@ import random
 # LAVA_EFFECT_FALLBACK is for vision checks if board constants aren't available yet.
 LAVA_EFFECT_FALLBACK = "lava"
 
+def board_dims(board):
+    """(width, height) of a board; boards without dimensions (e.g. test doubles) are 8x8."""
+    return getattr(board, 'width', 8), getattr(board, 'height', 8)
+
+def board_squares(board):
+    """The board's SquareTable (see squares.py)."""
+    return square_table(*board_dims(board))
+
+def squares_between(table, a, b):
+    """Squares strictly between squares a and b if they share a rank, file or diagonal, else []."""
+    step = table.line_step(a, b)
+    return list(range(a + step, b, step)) if step else []
+
+def line_clear(board, start, end, step, lava_val):
+    """True if no piece and no lava lies strictly between start and end, walking by step."""
+    for sq in range(start + step, end, step):
+        if board.get_piece(sq) is not None or board.tile_effects[sq] == lava_val: return False
+    return True
+
 class Piece(ABC):
+    STEPS = () # (dr, dc) offsets of single-step moves, for candidate_squares
+    RAYS = () # (dr, dc) directions of sliding moves, for candidate_squares
+
     def __init__(self, color, position, piece_type_name, board_ref=None, abilities_module=None): # board_ref is for future use, not strictly needed by Piece itself yet
         self.color = color
-        self.position = position # (row, col) tuple
+        self.position = position # Integer square (see squares.py)
         self.piece_type_name = piece_type_name.upper() # Store as uppercase e.g. "PAWN"
 
         self.abilities_module = abilities_module # Reference to the abilities module/object
         self.ability = None
-        self.ability_cooldown = 0
+        self.ability_ready_at = 0 # Turn clock at which the ability is ready again, 0 if ready (see timers.py)
         self.ability_recharges_on_capture = True
 
         self.has_speed_buff = False
-        self.status_effects = {} # e.g., {'frozen': 2} means frozen for 2 more of this player's turns
+        self.status_effects = {} # e.g., {'frozen': 9} means frozen until the turn starting at clock 9 (see timers.py)
+
+    def __deepcopy__(self, memo):
+        """Copies piece state; the abilities module and Ability objects are shared, not copied."""
+        new_piece = copy.copy(self)
+        memo[id(self)] = new_piece
+        new_piece.status_effects = dict(self.status_effects)
+        return new_piece
 
     def assign_ability(self):
         """Assigns an ability based on piece type using self.abilities_module."""
         if not self.abilities_module or not hasattr(self.abilities_module, 'PIECE_ABILITIES') or \
            not self.piece_type_name in self.abilities_module.PIECE_ABILITIES:
             self.ability = None
-            self.ability_cooldown = 0
+            self.ability_ready_at = 0
             return
 
         possible_abilities_with_weights = self.abilities_module.PIECE_ABILITIES.get(self.piece_type_name, [])
@@ -35,29 +66,27 @@ class Piece(ABC):
             # And Ability object has a 'name' attribute
             valid_options = [(item[0], item[1]) for item in possible_abilities_with_weights if hasattr(item[0], 'name')]
             if not valid_options:
-                 self.ability = None; self.ability_cooldown = 0; return
+                 self.ability = None; self.ability_ready_at = 0; return
 
             abilities = [item[0] for item in valid_options]
             weights = [item[1] for item in valid_options]
 
             if not abilities: # Should not happen if valid_options was populated
-                 self.ability = None; self.ability_cooldown = 0; return
+                 self.ability = None; self.ability_ready_at = 0; return
 
             chosen_ability_list = random.choices(abilities, weights=weights, k=1)
             if chosen_ability_list:
                  self.ability = chosen_ability_list[0]
-                 self.ability_cooldown = 0
+                 self.ability_ready_at = 0
             else: # Should not be reached if random.choices works as expected with valid inputs
-                 self.ability = None; self.ability_cooldown = 0;
+                 self.ability = None; self.ability_ready_at = 0;
         else:
             self.ability = None
-            self.ability_cooldown = 0
+            self.ability_ready_at = 0
 
     def is_action_allowed(self):
         """Checks if status effects prevent any action."""
-        if 'frozen' in self.status_effects and self.status_effects['frozen'] > 0:
-            # print(f"{self} is frozen for {self.status_effects['frozen']} more turn(s).") # Debug
-            return False
+        if self.status_effects.get('frozen', 0): return False
         return True
 
     @abstractmethod
@@ -68,8 +97,42 @@ class Piece(ABC):
     def get_revealed_squares(self, board_object, all_pieces_positions):
         pass
 
-    def _is_on_board(self, r, c):
-        return 0 <= r < 8 and 0 <= c < 8
+    def _is_on_board(self, r, c, board=None):
+        width, height = board_dims(board)
+        return 0 <= r < height and 0 <= c < width
+
+    def candidate_squares(self, board):
+        """
+        Squares the piece might move to by geometry alone, so move generation scales with
+        mobility instead of board area. Rays stop at the first piece (a possible capture)
+        and before lava; is_valid_move still has the final say.
+        """
+        table = board_squares(board); sq = self.position
+        lava_val = getattr(board, 'LAVA_EFFECT', LAVA_EFFECT_FALLBACK)
+        squares = list(table.steps(self.STEPS)[sq]) if self.STEPS else []
+        for ray in table.rays(self.RAYS)[sq] if self.RAYS else ():
+            for t in ray:
+                if board.tile_effects[t] == lava_val: break
+                squares.append(t)
+                if board.get_piece(t) is not None: break
+        return squares
+
+    def capture_squares(self, board):
+        """Squares where the piece can capture an enemy piece now (empty if frozen; lava is never a target)."""
+        if not self.is_action_allowed(): return []
+        return [sq for sq in self.candidate_squares(board) if sq != self.position and
+                board.get_piece(sq) is not None and board.get_piece(sq).color != self.color and
+                self.is_valid_move(board, self.position, sq)]
+
+    def evasion_squares(self, board, king_pos, checkers):
+        """
+        Squares the piece can move to that might get its king at king_pos out of check by the
+        pieces on the checkers squares: capturing the single checker or blocking its line.
+        King safety is still the caller's to verify.
+        """
+        if not self.is_action_allowed() or len(checkers) != 1: return []
+        targets = {checkers[0], *squares_between(board_squares(board), king_pos, checkers[0])}
+        return [sq for sq in self.candidate_squares(board) if sq in targets and self.is_valid_move(board, self.position, sq)]
 
     def __repr__(self):
         # Using piece_type_name which should be like "PAWN" -> "P"
@@ -79,11 +142,11 @@ class Piece(ABC):
         ability_str = ""
         if self.ability and hasattr(self.ability, 'name'):
             ability_initial = self.ability.name[0].upper()
-            cooldown_status = str(self.ability_cooldown) if self.ability_cooldown > 0 else "R"
-            ability_str = f"({ability_initial}:{cooldown_status})"
+            cooldown_status = f"@{self.ability_ready_at // 2 + 1}" if self.ability_ready_at else ":R" # @n: ready again on turn n
+            ability_str = f"({ability_initial}{cooldown_status})"
 
         status_str = ""
-        if 'frozen' in self.status_effects and self.status_effects['frozen'] > 0:
+        if self.status_effects.get('frozen', 0):
             status_str = "(F)"
 
         return f"{base_repr}{ability_str}{status_str}"
@@ -98,87 +161,89 @@ class Pawn(Piece):
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
         # (Previous logic for is_valid_move)
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        table = board_squares(board)
+        (start_row, start_col), (end_row, end_col) = table.coords[start_pos], table.coords[end_pos]
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         target_piece = board.get_piece(end_pos)
         direction = -1 if self.color == "white" else 1
+        forward = direction * table.width # Square step of one rank forward
         if start_col == end_col and target_piece is None:
             if end_row == start_row + direction * 1: return True
             if self.has_speed_buff and end_row == start_row + direction * 2 and \
-               board.get_piece((start_row + direction, start_col)) is None and \
-               board.tile_effects[start_row + direction][start_col] != lava_val: return True
-        starting_row = 6 if self.color == "white" else 1
+               board.get_piece(start_pos + forward) is None and \
+               board.tile_effects[start_pos + forward] != lava_val: return True
+        starting_row = table.height - 2 if self.color == "white" else 1
         if start_row == starting_row and start_col == end_col and target_piece is None:
-            path_step1_clear = board.get_piece((start_row + direction, start_col)) is None and \
-                               board.tile_effects[start_row + direction][start_col] != lava_val
+            path_step1_clear = board.get_piece(start_pos + forward) is None and \
+                               board.tile_effects[start_pos + forward] != lava_val
             if end_row == start_row + 2 * direction and path_step1_clear: return True
             if self.has_speed_buff and end_row == start_row + 3 * direction and path_step1_clear:
-                path_step2_clear = board.get_piece((start_row + 2 * direction, start_col)) is None and \
-                                   board.tile_effects[start_row + 2 * direction][start_col] != lava_val
+                path_step2_clear = board.get_piece(start_pos + 2 * forward) is None and \
+                                   board.tile_effects[start_pos + 2 * forward] != lava_val
                 if path_step2_clear: return True
         if abs(start_col - end_col) == 1 and end_row == start_row + direction:
             if target_piece is not None and target_piece.color != self.color: return True
         return False
 
-    def get_revealed_squares(self, board_object, all_pieces_positions):
-        revealed = []
-        r_start, c_start = self.position
+    def candidate_squares(self, board):
+        table = board_squares(board); r0, c0 = table.coords[self.position]
         direction = -1 if self.color == "white" else 1
-        diag_left_r, diag_left_c = r_start + direction, c_start - 1
-        diag_right_r, diag_right_c = r_start + direction, c_start + 1
-        if self._is_on_board(diag_left_r, diag_left_c): revealed.append((diag_left_r, diag_left_c))
-        if self._is_on_board(diag_right_r, diag_right_c): revealed.append((diag_right_r, diag_right_c))
-        return list(set(revealed))
+        squares = [(r0 + direction * k, c0) for k in (1, 2, 3)] + [(r0 + direction, c0 - 1), (r0 + direction, c0 + 1)]
+        return [r * table.width + c for r, c in squares if self._is_on_board(r, c, board)]
+
+    def capture_squares(self, board):
+        if not self.is_action_allowed(): return []
+        return [sq for sq in self.get_revealed_squares(board, ()) if board.get_piece(sq) is not None and
+                self.is_valid_move(board, self.position, sq)]
+
+    def get_revealed_squares(self, board_object, all_pieces_positions):
+        table = board_squares(board_object); r_start, c_start = table.coords[self.position]
+        r = r_start + (-1 if self.color == "white" else 1) # The two forward diagonals
+        return [r * table.width + c for c in (c_start - 1, c_start + 1) if self._is_on_board(r, c, board_object)]
 
 class Rook(Piece):
+    RAYS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
     def __init__(self, color, position, board_ref=None, abilities_module=None):
         super().__init__(color, position, "Rook", board_ref, abilities_module)
 
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        table = board_squares(board)
+        (start_row, start_col), (end_row, end_col) = table.coords[start_pos], table.coords[end_pos]
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         if start_row != end_row and start_col != end_col: return False
         target_piece = board.get_piece(end_pos)
         if target_piece is not None and target_piece.color == self.color: return False
-        if start_row == end_row:
-            step = 1 if end_col > start_col else -1
-            for col_val in range(start_col + step, end_col, step): # Corrected variable name
-                if board.get_piece((start_row, col_val)) is not None or board.tile_effects[start_row][col_val] == lava_val: return False
-        else:
-            step = 1 if end_row > start_row else -1
-            for row_val in range(start_row + step, end_row, step): # Corrected variable name
-                if board.get_piece((row_val, start_col)) is not None or board.tile_effects[row_val][start_col] == lava_val: return False
-        return True
+        return line_clear(board, start_pos, end_pos, table.line_step(start_pos, end_pos), lava_val)
 
     def get_revealed_squares(self, board_object, all_pieces_positions):
         revealed = []
-        r_start, c_start = self.position
         try: lava_val = board_object.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                nr, nc = r_start + dr * i, c_start + dc * i
-                if not self._is_on_board(nr, nc): break
-                revealed.append((nr, nc))
-                if (nr, nc) in all_pieces_positions or board_object.tile_effects[nr][nc] == lava_val: break
-        return list(set(revealed))
+        for ray in board_squares(board_object).rays(self.RAYS)[self.position]:
+            for sq in ray:
+                revealed.append(sq)
+                if sq in all_pieces_positions or board_object.tile_effects[sq] == lava_val: break
+        return revealed
 
 class Knight(Piece):
+    STEPS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+
     def __init__(self, color, position, board_ref=None, abilities_module=None):
         super().__init__(color, position, "Knight", board_ref, abilities_module)
 
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        coords = board_squares(board).coords
+        (start_row, start_col), (end_row, end_col) = coords[start_pos], coords[end_pos]
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         row_diff = abs(start_row - end_row); col_diff = abs(start_col - end_col)
         if not ((row_diff == 2 and col_diff == 1) or (row_diff == 1 and col_diff == 2)): return False
         target_piece = board.get_piece(end_pos)
@@ -186,106 +251,84 @@ class Knight(Piece):
         return True
 
     def get_revealed_squares(self, board_object, all_pieces_positions):
-        revealed = []
-        r_start, c_start = self.position
-        possible_moves = [(r_start+2,c_start+1),(r_start+2,c_start-1),(r_start-2,c_start+1),(r_start-2,c_start-1),
-                          (r_start+1,c_start+2),(r_start+1,c_start-2),(r_start-1,c_start+2),(r_start-1,c_start-2)]
-        for r, c in possible_moves:
-            if self._is_on_board(r, c): revealed.append((r,c))
-        return list(set(revealed))
+        return list(board_squares(board_object).steps(self.STEPS)[self.position])
 
 class Bishop(Piece):
+    RAYS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
     def __init__(self, color, position, board_ref=None, abilities_module=None):
         super().__init__(color, position, "Bishop", board_ref, abilities_module)
 
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        table = board_squares(board)
+        (start_row, start_col), (end_row, end_col) = table.coords[start_pos], table.coords[end_pos]
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         if abs(start_row - end_row) != abs(start_col - end_col): return False
         target_piece = board.get_piece(end_pos)
         if target_piece is not None and target_piece.color == self.color: return False
-        row_step = 1 if end_row > start_row else -1; col_step = 1 if end_col > start_col else -1
-        cr, cc = start_row + row_step, start_col + col_step
-        while cr != end_row:
-            if board.get_piece((cr, cc)) is not None or board.tile_effects[cr][cc] == lava_val: return False
-            cr += row_step; cc += col_step
-        return True
+        return line_clear(board, start_pos, end_pos, table.line_step(start_pos, end_pos), lava_val)
 
     def get_revealed_squares(self, board_object, all_pieces_positions):
         revealed = []
-        r_start, c_start = self.position
         try: lava_val = board_object.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        directions = [(1,1),(1,-1),(-1,1),(-1,-1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                nr, nc = r_start + dr*i, c_start + dc*i
-                if not self._is_on_board(nr, nc): break
-                revealed.append((nr,nc))
-                if (nr, nc) in all_pieces_positions or board_object.tile_effects[nr][nc] == lava_val: break
-        return list(set(revealed))
+        for ray in board_squares(board_object).rays(self.RAYS)[self.position]:
+            for sq in ray:
+                revealed.append(sq)
+                if sq in all_pieces_positions or board_object.tile_effects[sq] == lava_val: break
+        return revealed
 
 class Queen(Piece):
+    RAYS = Rook.RAYS + Bishop.RAYS
+
     def __init__(self, color, position, board_ref=None, abilities_module=None):
         super().__init__(color, position, "Queen", board_ref, abilities_module)
 
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        table = board_squares(board)
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         target_piece = board.get_piece(end_pos)
         if target_piece is not None and target_piece.color == self.color: return False
-        if start_row == end_row or start_col == end_col: # Rook-like
-            if start_row == end_row:
-                step = 1 if end_col > start_col else -1
-                for col_val in range(start_col + step, end_col, step):
-                    if board.get_piece((start_row, col_val)) is not None or board.tile_effects[start_row][col_val] == lava_val: return False
-            else:
-                step = 1 if end_row > start_row else -1
-                for row_val in range(start_row + step, end_row, step):
-                    if board.get_piece((row_val, start_col)) is not None or board.tile_effects[row_val][start_col] == lava_val: return False
-            return True
-        if abs(start_row - end_row) == abs(start_col - end_col): # Bishop-like
-            row_step = 1 if end_row > start_row else -1; col_step = 1 if end_col > start_col else -1
-            cr, cc = start_row + row_step, start_col + col_step
-            while cr != end_row:
-                if board.get_piece((cr, cc)) is not None or board.tile_effects[cr][cc] == lava_val: return False
-                cr += row_step; cc += col_step
-            return True
-        return False
+        step = table.line_step(start_pos, end_pos) # Rook-like or bishop-like lines only
+        return bool(step) and line_clear(board, start_pos, end_pos, step, lava_val)
 
     def get_revealed_squares(self, board_object, all_pieces_positions):
         revealed = []
-        r_start, c_start = self.position
         try: lava_val = board_object.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        directions = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                nr, nc = r_start + dr*i, c_start + dc*i
-                if not self._is_on_board(nr, nc): break
-                revealed.append((nr,nc))
-                if (nr, nc) in all_pieces_positions or board_object.tile_effects[nr][nc] == lava_val: break
-        return list(set(revealed))
+        for ray in board_squares(board_object).rays(self.RAYS)[self.position]:
+            for sq in ray:
+                revealed.append(sq)
+                if sq in all_pieces_positions or board_object.tile_effects[sq] == lava_val: break
+        return revealed
 
 class King(Piece):
+    STEPS = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0))
+
     def __init__(self, color, position, board_ref=None, abilities_module=None):
         super().__init__(color, position, "King", board_ref, abilities_module)
         self.ability = None; self.ability_recharges_on_capture = False
 
-    def assign_ability(self): self.ability = None; self.ability_cooldown = 0
+    def assign_ability(self): self.ability = None; self.ability_ready_at = 0
+
+    def evasion_squares(self, board, king_pos, checkers):
+        """The king may step anywhere it can move to (including out of a double check)."""
+        if not self.is_action_allowed(): return []
+        return [sq for sq in self.candidate_squares(board) if self.is_valid_move(board, self.position, sq)]
 
     def is_valid_move(self, board, start_pos, end_pos):
         if not self.is_action_allowed(): return False
-        start_row, start_col = start_pos; end_row, end_col = end_pos
+        coords = board_squares(board).coords
+        (start_row, start_col), (end_row, end_col) = coords[start_pos], coords[end_pos]
         try: lava_val = board.LAVA_EFFECT
         except AttributeError: lava_val = LAVA_EFFECT_FALLBACK
-        if board.tile_effects[end_row][end_col] == lava_val: return False
+        if board.tile_effects[end_pos] == lava_val: return False
         row_diff = abs(start_row - end_row); col_diff = abs(start_col - end_col)
         if not (row_diff <= 1 and col_diff <= 1 and (row_diff + col_diff > 0)): return False
         target_piece = board.get_piece(end_pos)
@@ -293,11 +336,4 @@ class King(Piece):
         return True
 
     def get_revealed_squares(self, board_object, all_pieces_positions):
-        revealed = []
-        r_start, c_start = self.position
-        for dr in [-1,0,1]:
-            for dc in [-1,0,1]:
-                if dr == 0 and dc == 0: continue
-                nr, nc = r_start + dr, c_start + dc
-                if self._is_on_board(nr, nc): revealed.append((nr,nc))
-        return list(set(revealed))
+        return list(board_squares(board_object).steps(self.STEPS)[self.position])
@@ -0,0 +1,81 @@
+import multiprocessing
+
+import search
+from serialization import game_from_state, game_to_state
+from zobrist import position_hash
+
+# Pondering: while the human sits at the input() prompt, a background process guesses
+# the human's move and searches the AI's reply to it. If the human plays the guessed
+# move the AI answers from that result; otherwise the ponder process is terminated and
+# nothing of it is kept. A separate process (rather than a thread) keeps the search off
+# the GIL and lets it silence its own output without touching the prompt. The ponder
+# game gets the AI's tablebase, evaluator and quiescence depth, so the pondered reply is
+# the one the AI's own search would find.
+
+PONDER_ATTRS = ('tablebase', 'evaluator', 'quiescence_depth') # Game settings the ponder search needs
+
+def _ponder(state, depth, predict_depth, conn, transposition_table, game_kwargs):
+    game = game_from_state(state, **game_kwargs)
+    with search.quiet():
+        expected = search.best_action(game, predict_depth, tt=transposition_table)
+        child = search.simulate(game, expected) if expected is not None else None
+        if child is None or child.game_over:
+            conn.send(('predicted', None)); return
+        conn.send(('predicted', position_hash(child)))
+        reply = search.best_action(child, depth, tt=transposition_table)
+    conn.send(('result', search.game_action_code(child, reply) if reply is not None else None))
+
+class Ponderer:
+    """Runs one ponder search at a time on behalf of a Game's AI."""
+
+    def __init__(self, predict_depth=1, transposition_table=None):
+        self.predict_depth = predict_depth # Search depth used to guess the human's move
+        self.transposition_table = transposition_table # Optional SharedTranspositionTable to fill while pondering
+        self.hits = 0; self.misses = 0
+        self._context = multiprocessing.get_context()
+        self._process = None; self._conn = None; self._root_hash = None
+
+    @property
+    def active(self): return self._process is not None
+
+    def start(self, game, depth):
+        """Starts pondering the position where the human (game.current_player) is to move."""
+        root_hash = position_hash(game)
+        if self._process is not None and self._root_hash == root_hash: return # Still pondering this position
+        self.stop()
+        if game.game_over or depth <= 0: return
+        receiver, sender = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(
+            target=_ponder, args=(game_to_state(game), depth, self.predict_depth, sender, self.transposition_table,
+                                  {attr: getattr(game, attr) for attr in PONDER_ATTRS}),
+            daemon=True)
+        self._process.start(); sender.close()
+        self._conn = receiver; self._root_hash = root_hash
+
+    def stop(self):
+        """Drops any ponder work in progress."""
+        if self._process is not None:
+            if self._process.is_alive(): self._process.terminate()
+            self._process.join(); self._process.close()
+            self._conn.close()
+        self._process = None; self._conn = None; self._root_hash = None
+
+    def take(self, game):
+        """
+        Returns the pondered reply if game (now with the AI to move) is the position that
+        was pondered, waiting for the search to finish if needed; otherwise drops the
+        ponder search and returns None.
+        """
+        if self._process is None: return None
+        code = None
+        try:
+            kind, predicted_hash = self._conn.recv()
+            if kind == 'predicted' and predicted_hash is not None and predicted_hash == position_hash(game):
+                kind, code = self._conn.recv()
+        except (EOFError, OSError): # Ponder process died; fall back to a normal search
+            code = None
+        finally:
+            self.stop()
+        if code is None: self.misses += 1; return None
+        self.hits += 1
+        return search.decode_action(code, game)
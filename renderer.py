@@ -0,0 +1,76 @@
+import sys
+
+# Diff-based terminal renderer for Board frames.
+# The last frame drawn for each viewer is cached; the next frame for that viewer only
+# rewrites the changed character runs using ANSI cursor positioning. Each frame goes
+# out in a single write.
+
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+MERGE_GAP = 4 # Runs closer than this are merged; a cursor escape costs about as much
+
+def _move_to(line_idx, col_idx): return f"\x1b[{line_idx + 1};{col_idx + 1}H"
+
+def changed_runs(old_line, new_line):
+    """Yields (start_col, text) spans of new_line that differ from old_line (equal lengths)."""
+    start = None; last_diff = None
+    for i, (old_ch, new_ch) in enumerate(zip(old_line, new_line)):
+        if old_ch == new_ch: continue
+        if start is None: start = i
+        elif i - last_diff > MERGE_GAP:
+            yield start, new_line[start:last_diff + 1]; start = i
+        last_diff = i
+    if start is not None: yield start, new_line[start:last_diff + 1]
+
+class DiffRenderer:
+    """Renders board frames per viewer ('white', 'black' or None for omniscient)."""
+
+    def __init__(self, stream=None, full_redraw_ratio=0.5):
+        self.stream = stream # Default stream for viewers without their own
+        self.full_redraw_ratio = full_redraw_ratio # Redraw everything when a diff would be larger than this share
+        self._streams = {} # viewer -> stream
+        self._frames = {} # viewer -> list of lines currently on that viewer's screen
+
+    def attach(self, viewer, stream):
+        """Sends viewer's frames to stream; the next frame is drawn in full."""
+        self._streams[viewer] = stream; self._frames.pop(viewer, None)
+
+    def invalidate(self, viewer=None):
+        """Forgets cached frames (one viewer, or all), forcing a full redraw next time."""
+        if viewer is None: self._frames.clear()
+        else: self._frames.pop(viewer, None)
+
+    def frame_for(self, board, viewer):
+        if viewer is not None and viewer == board.game.current_player: visibility = board.visibility_grid
+        else: visibility = board.compute_visibility(viewer)
+        return board.frame_lines(visibility)
+
+    def render(self, board, viewer):
+        """Draws board for viewer and returns the number of characters written."""
+        lines = self.frame_for(board, viewer)
+        previous = self._frames.get(viewer)
+        output = None
+        if previous is not None and len(previous) == len(lines):
+            output = self._diff(previous, lines)
+        if output is None:
+            output = CLEAR_SCREEN + "\n".join(lines) + "\n"
+        self._frames[viewer] = lines
+        if output:
+            stream = self._streams.get(viewer) or self.stream or sys.stdout
+            stream.write(output); stream.flush()
+        return len(output)
+
+    def _diff(self, previous, lines):
+        """Builds the cursor-addressed update, or None if a full redraw is cheaper."""
+        parts = []; changed_chars = 0
+        total_chars = sum(len(line) for line in lines)
+        for line_idx, (old_line, new_line) in enumerate(zip(previous, lines)):
+            if old_line == new_line: continue
+            if len(old_line) != len(new_line):
+                parts.append(_move_to(line_idx, 0) + new_line + "\x1b[K"); changed_chars += len(new_line)
+                continue
+            for col_idx, text in changed_runs(old_line, new_line):
+                parts.append(_move_to(line_idx, col_idx) + text); changed_chars += len(text)
+        if not parts: return ""
+        if changed_chars > total_chars * self.full_redraw_ratio: return None
+        parts.append(_move_to(len(lines), 0)) # Park the cursor below the frame
+        return "".join(parts)
@@ -0,0 +1,241 @@
+from squares import square_table
+from zobrist import position_hash
+import contextlib
+import copy
+import move_ordering
+
+# Game-tree search for the AI. Positions are explored by deep-copying the Game and
+# replaying actions through the normal Game entry points, so every rule (lava, frozen
+# pieces, speed buffs, SP bonuses, board evolution) applies inside the search exactly as
+# it does in play.
+
+INF = 10**9
+MATE_SCORE = 100000
+PIECE_WEIGHT = 100 # Score units per SP point of material (PIECE_SP_VALUES)
+SP_WEIGHT = 10 # Score units per banked SP
+CENTER_WEIGHT = 5 # Score units per piece on a central zone
+
+SPECIAL_KEYS = ('redeploy', 'freeze_pawns')
+PIECE_TYPE_CODES = ('PAWN', 'KNIGHT', 'BISHOP', 'ROOK', 'QUEEN', 'KING')
+ACTION_MOVE, ACTION_ABILITY, ACTION_SPECIAL = 1, 2, 3
+EXACT, LOWER, UPPER = 1, 2, 3 # Transposition table bounds (shared with shared_tt.py)
+
+class _NullWriter:
+    def write(self, text): return len(text)
+    def flush(self): pass
+
+def quiet():
+    """Context manager that silences the game's console output while searching."""
+    return contextlib.redirect_stdout(_NullWriter())
+
+def opponent(color): return "black" if color == "white" else "white"
+
+def terminal_score(game, color):
+    """MATE_SCORE / 0 / -MATE_SCORE for color if the game is decided (or a king is gone), else None."""
+    if game.game_over:
+        if game.winner is None: return 0
+        return MATE_SCORE if game.winner == color else -MATE_SCORE
+    kings = {p.color for p in game.board.get_all_pieces() if p.piece_type_name == "KING"}
+    if color not in kings: return -MATE_SCORE
+    if opponent(color) not in kings: return MATE_SCORE
+    return None
+
+def evaluate(game, color):
+    """Static evaluation of game from color's point of view (higher is better for color)."""
+    terminal = terminal_score(game, color)
+    if terminal is not None: return terminal
+    score = 0
+    for piece in game.board.get_all_pieces():
+        if piece.piece_type_name == "KING": continue
+        value = game.PIECE_SP_VALUES.get(piece.piece_type_name, 0) * PIECE_WEIGHT
+        score += value if piece.color == color else -value
+    score += (game.player_sp[color] - game.player_sp[opponent(color)]) * SP_WEIGHT
+    for sq in game.CENTRAL_ZONES:
+        piece = game.board.grid[sq]
+        if piece: score += CENTER_WEIGHT if piece.color == color else -CENTER_WEIGHT
+    return score
+
+def leaf_score(game, color):
+    """Evaluation at the search horizon: game.evaluator (see evaluator.py) if set, else evaluate()."""
+    if game.evaluator is None: return evaluate(game, color)
+    terminal = terminal_score(game, color)
+    return terminal if terminal is not None else game.evaluator.evaluate(game, color)
+
+def tablebase_score(game):
+    """Exact score from game.tablebase for the side to move, or None without a trusted table mate (see Tablebase.probe)."""
+    result = game.tablebase.probe(game)
+    if result is None: return None
+    outcome, plies = result
+    return MATE_SCORE - plies if outcome == 'win' else -(MATE_SCORE - plies)
+
+def simulate(game, action):
+    """Returns a copy of game with action played, or None if the action was rejected."""
+    child = copy.deepcopy(game)
+    return child if child.execute_action(action) else None
+
+def quiescence(game, alpha=-INF, beta=INF, depth=4):
+    """
+    Score of game past the search horizon: the side to move may stand pat on leaf_score or
+    try its captures (best victim first), and must answer a check with its evasions, for
+    up to depth more plies. Uses the capture-only and check-evasion generators, so quiet
+    moves, abilities and specials are never generated here.
+    """
+    color = game.current_player
+    terminal = terminal_score(game, color)
+    if terminal is not None: return terminal
+    if depth <= 0: return leaf_score(game, color)
+    in_check = game.is_in_check(color, game.board)
+    if in_check:
+        actions = list(game._iter_check_evasions(color))
+        if not actions: return leaf_score(game, color) # Only an ability or special escapes (mate ends the game)
+        best = -INF
+    else:
+        best = leaf_score(game, color) # Stand pat
+        if best >= beta: return best
+        if best > alpha: alpha = best
+        actions = sorted(game._iter_capture_moves(game._movable_pieces(color)),
+                         key=lambda action: -move_ordering.mvv_lva(game, action))
+    for action in actions:
+        child = simulate(game, action)
+        if child is None: continue
+        score = -quiescence(child, -beta, -alpha, depth - 1)
+        if score > best: best = score
+        if best > alpha: alpha = best
+        if alpha >= beta: break
+    return best if best > -INF else leaf_score(game, color)
+
+def horizon_score(game, alpha, beta):
+    """negamax's depth-0 score: quiescence() if game.quiescence_depth is set, else leaf_score()."""
+    if game.game_over or not game.quiescence_depth: return leaf_score(game, game.current_player)
+    return quiescence(game, alpha, beta, game.quiescence_depth)
+
+def _batched_child_scores(game, actions):
+    """[(score, action)] for the children of a depth-1 node, scoring every non-terminal leaf in one evaluator batch."""
+    children = [(action, child) for action, child in ((action, simulate(game, action)) for action in actions)
+                if child is not None]
+    scores = []; pending = []
+    for i, (_, child) in enumerate(children):
+        score = tablebase_score(child) if child.tablebase is not None else None
+        if score is None: score = terminal_score(child, child.current_player)
+        if score is None: pending.append(i)
+        scores.append(score)
+    for i, score in zip(pending, game.evaluator.evaluate_batch([children[i][1] for i in pending])): scores[i] = score
+    return [(-score, action) for score, (action, _) in zip(scores, children)]
+
+def _tt_first(game, actions, tt_action):
+    """Moves the action whose code is tt_action (the stored best action) to the front."""
+    if tt_action is None: return actions
+    for i, action in enumerate(actions):
+        if game_action_code(game, action) == tt_action: return [action] + actions[:i] + actions[i + 1:]
+    return actions
+
+def negamax(game, depth, alpha=-INF, beta=INF, tt=None, orderer=None, ply=0):
+    """
+    Alpha-beta negamax score of game for the side to move. tt is an optional transposition
+    table; orderer an optional MoveOrderer (see move_ordering.py) for staged, ordered
+    generation, with ply the distance from the root.
+    """
+    color = game.current_player
+    if game.tablebase is not None:
+        table_score = tablebase_score(game)
+        if table_score is not None: return table_score
+    if depth <= 0 or game.game_over: return horizon_score(game, alpha, beta)
+    alpha_orig = alpha; tt_action = None
+    if tt is not None:
+        pos_hash = position_hash(game)
+        entry = tt.probe(pos_hash)
+        if entry is not None:
+            if entry.depth >= depth:
+                if entry.bound == EXACT: return entry.score
+                if entry.bound == LOWER and entry.score >= beta: return entry.score
+                if entry.bound == UPPER and entry.score <= alpha: return entry.score
+            tt_action = entry.action
+    best = -INF; best_action = None
+    if depth == 1 and game.evaluator is not None and not game.quiescence_depth:
+        for score, action in _batched_child_scores(game, game.generate_actions(color)):
+            if score > best: best = score; best_action = action
+    else:
+        if orderer is not None: actions = orderer.staged(game, ply, tt_action)
+        else: actions = _tt_first(game, game.generate_actions(color), tt_action)
+        for action in actions:
+            child = simulate(game, action)
+            if child is None: continue
+            score = -negamax(child, depth - 1, -beta, -alpha, tt, orderer, ply + 1)
+            if score > best: best = score; best_action = action
+            if best > alpha: alpha = best
+            if alpha >= beta:
+                if orderer is not None: orderer.record_cutoff(game, action, ply, depth)
+                break
+    if best == -INF: return leaf_score(game, color)
+    if tt is not None:
+        bound = UPPER if best <= alpha_orig else (LOWER if best >= beta else EXACT)
+        tt.store(pos_hash, depth, best, bound, game_action_code(game, best_action))
+    return best
+
+def _root_tt_action(game, tt):
+    entry = tt.probe(position_hash(game)) if tt is not None else None
+    return entry.action if entry is not None else None
+
+def rank_actions(game, depth, actions=None, tt=None, orderer=None):
+    """Scores every root action with a full-window search; returns [(score, action)] best first."""
+    if actions is None: actions = game.generate_actions(game.current_player)
+    if orderer is None: orderer = move_ordering.MoveOrderer()
+    ranked = []
+    with quiet():
+        for action in actions:
+            child = simulate(game, action)
+            if child is not None: ranked.append((-negamax(child, depth - 1, tt=tt, orderer=orderer, ply=1), action))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return ranked
+
+def best_action(game, depth, actions=None, tt=None, orderer=None):
+    """Returns the best root action found by an alpha-beta search of the given depth (root actions tried in move order)."""
+    if actions is None: actions = game.generate_actions(game.current_player)
+    if orderer is None: orderer = move_ordering.MoveOrderer()
+    best, alpha = None, -INF
+    with quiet():
+        for action in orderer.order(game, actions, 0, _root_tt_action(game, tt)):
+            child = simulate(game, action)
+            if child is None: continue
+            score = -negamax(child, depth - 1, -INF, -alpha, tt, orderer, 1)
+            if best is None or score > alpha: best, alpha = action, score
+    return best if best is not None else (actions[0] if actions else None)
+
+# --- Compact action codes ---
+# Actions are stored as four small integers (kind, a, b, c) so they fit fixed-size records.
+# move: (1, start_sq, end_sq, 0); ability: (2, piece_sq, target_sq, 0), where a self-targeted
+# ability uses piece_sq as its target; special: (3, key index, piece type index, target_sq).
+# Squares are the engine's integer squares (see squares.py), so boards have at most 256 squares.
+
+def encode_action(action, width=8, height=8):
+    if action['type'] == 'move':
+        return (ACTION_MOVE, action['start_pos'], action['end_pos'], 0)
+    if action['type'] == 'ability':
+        target = action['target_pos'] if action['target_pos'] is not None else action['piece_pos']
+        return (ACTION_ABILITY, action['piece_pos'], target, 0)
+    args = action.get('args', [])
+    if action['key'] == 'redeploy' and len(args) >= 2:
+        return (ACTION_SPECIAL, SPECIAL_KEYS.index('redeploy'), PIECE_TYPE_CODES.index(args[0].upper()),
+                square_table(width, height).square(args[1]))
+    return (ACTION_SPECIAL, SPECIAL_KEYS.index(action['key']), 0, 0)
+
+def game_action_code(game, action):
+    """encode_action for an action of game (numbered for its board size)."""
+    return encode_action(action, game.board.width, game.board.height)
+
+def decode_action(code, game):
+    """Rebuilds an action dict from its code, filling display fields from game's current board."""
+    kind, a, b, c = code
+    if kind == ACTION_MOVE:
+        piece = game.board.get_piece(a)
+        return {'type': 'move', 'start_pos': a, 'end_pos': b, 'piece_repr': str(piece)}
+    if kind == ACTION_ABILITY:
+        piece = game.board.get_piece(a)
+        ability_name = piece.ability.name if piece is not None and piece.ability else None
+        return {'type': 'ability', 'piece_pos': a, 'target_pos': b if b != a else None,
+                'ability_name': ability_name, 'piece_repr': str(piece)}
+    if kind == ACTION_SPECIAL and a < len(SPECIAL_KEYS):
+        key = SPECIAL_KEYS[a]
+        args = [PIECE_TYPE_CODES[b], game.board.squares.names[c]] if key == 'redeploy' else []
+        return {'type': 'special', 'key': key, 'args': args, 'name': game.SPECIAL_MOVES[key]['name']}
+    return None
@@ -0,0 +1,69 @@
+import random
+
+from game import Game
+from search import quiet
+from timers import due_after, turn_clock, turns_left
+import abilities as abilities_module
+
+# Compact, picklable snapshots of a Game.
+# A state is a plain tuple (no Board/Game back-references, no module objects), small
+# enough to ship to worker processes for every search task.
+
+STATE_VERSION = 3
+COLOR_CODES = {'white': 'w', 'black': 'b'}
+CODE_COLORS = {code: color for color, code in COLOR_CODES.items()}
+
+def ability_key(ability):
+    """Returns the ABILITIES_POOL key of an Ability object (None for no ability)."""
+    if ability is None: return None
+    for key, pooled in abilities_module.ABILITIES_POOL.items():
+        if pooled is ability or pooled.name == ability.name: return key
+    raise ValueError(f"Ability {ability!r} is not in ABILITIES_POOL.")
+
+def game_to_state(game):
+    """Encodes everything needed to continue the game from its current position."""
+    board = game.board; width = board.width; clock = turn_clock(game)
+    pieces = []; tiles = []
+    for sq, (p, effect) in enumerate(zip(board.grid, board.tile_effects)):
+        if p is not None:
+            pieces.append((sq, COLOR_CODES[p.color], p.piece_type_name, ability_key(p.ability),
+                           turns_left(p.ability_ready_at, clock), turns_left(p.status_effects.get('frozen', 0), clock),
+                           p.has_speed_buff))
+        if effect is not None: tiles.append((sq, effect))
+    return (STATE_VERSION, game.current_player, game.ai_player_color, game.full_turn_counter,
+            board.board_evolution_timer, board.turns_before_evolution, board.fog_of_war_on,
+            game.player_sp['white'], game.player_sp['black'],
+            tuple(game.player_lost_pieces['white']), tuple(game.player_lost_pieces['black']),
+            game.game_over, game.winner, tuple(pieces), tuple(tiles), width, board.height, board.evolution_seed)
+
+def game_from_state(state, **game_kwargs):
+    """Rebuilds a Game from game_to_state output. The global random state is left untouched."""
+    (version, current_player, ai_player_color, full_turn_counter, evolution_timer, turns_before_evolution,
+     fog_on, sp_white, sp_black, lost_white, lost_black, game_over, winner, pieces, tiles, width, height, evolution_seed) = state
+    if version != STATE_VERSION: raise ValueError(f"Unsupported state version {version}.")
+    rng_state = random.getstate()
+    try:
+        with quiet(): game = Game(ai_player_color=ai_player_color, width=width, height=height, **game_kwargs)
+    finally:
+        random.setstate(rng_state)
+    board = game.board
+    game.current_player = current_player; game.full_turn_counter = full_turn_counter; clock = turn_clock(game)
+    board.grid = [None] * board.squares.count
+    board.tile_effects = [board.NO_EFFECT] * board.squares.count
+    for sq, color_code, type_name, ab_key, cooldown, frozen, speed in pieces:
+        piece = board.create_piece_by_str_and_color(type_name, CODE_COLORS[color_code], sq)
+        piece.ability = abilities_module.ABILITIES_POOL[ab_key] if ab_key is not None else None
+        piece.ability_ready_at = due_after(piece.color, clock, cooldown)
+        if frozen: piece.status_effects['frozen'] = due_after(piece.color, clock, frozen)
+        piece.has_speed_buff = speed
+        board.grid[sq] = piece
+    for sq, effect in tiles: board.tile_effects[sq] = effect
+    board.board_evolution_timer = evolution_timer; board.turns_before_evolution = turns_before_evolution
+    board.evolution_seed = evolution_seed # Later evolutions roll the same tiles as in the original game
+    board.fog_of_war_on = fog_on
+    game.player_sp = {'white': sp_white, 'black': sp_black}
+    game.player_lost_pieces = {'white': list(lost_white), 'black': list(lost_black)}
+    game.game_over = game_over; game.winner = winner
+    board.update_visibility(current_player)
+    game.invalidate_legal_moves(); game.reset_timers(); game.reset_history()
+    return game
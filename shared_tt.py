@@ -0,0 +1,88 @@
+import struct
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+from search import EXACT, LOWER, UPPER
+
+# Transposition table in multiprocessing.shared_memory, shared by every AI worker and
+# simulator process on a host.
+#
+# Each bucket holds two 16-byte entries: a depth-preferred slot (kept unless the new
+# search is at least as deep) and an always-replace slot. Entries are written without
+# locks; an entry stores (hash ^ data, data), so a torn write by two processes at once
+# fails the key check on probe and reads as a miss instead of as corrupt data.
+#
+# data (64 bits): score (24, signed) | depth (6) | bound (2) | action code (4 x 8).
+
+ENTRY = struct.Struct('<QQ')
+BUCKET_SIZE = 2 * ENTRY.size
+SCORE_BITS = 24
+SCORE_LIMIT = (1 << (SCORE_BITS - 1)) - 1
+MAX_DEPTH = 63
+MASK64 = (1 << 64) - 1
+
+TTEntry = namedtuple('TTEntry', ['depth', 'score', 'bound', 'action'])
+
+def _pack(depth, score, bound, action):
+    score = max(-SCORE_LIMIT, min(SCORE_LIMIT, score)) & ((1 << SCORE_BITS) - 1)
+    kind, a, b, c = action if action is not None else (0, 0, 0, 0)
+    return (score << 40) | (min(depth, MAX_DEPTH) << 34) | (bound << 32) | (kind << 24) | (a << 16) | (b << 8) | c
+
+def _unpack(data):
+    score = data >> 40
+    if score > SCORE_LIMIT: score -= 1 << SCORE_BITS
+    kind, a, b, c = (data >> 24) & 0xFF, (data >> 16) & 0xFF, (data >> 8) & 0xFF, data & 0xFF
+    return TTEntry((data >> 34) & MAX_DEPTH, score, (data >> 32) & 3, (kind, a, b, c) if kind else None)
+
+class SharedTranspositionTable:
+    """Create with a bucket count, or attach to an existing table by name from any process."""
+
+    def __init__(self, buckets=1 << 16, name=None):
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=buckets * BUCKET_SIZE)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+            # Attaching processes must not unlink the segment when they exit
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self.buckets = self._shm.size // BUCKET_SIZE
+        self._buf = self._shm.buf
+
+    @property
+    def name(self): return self._shm.name
+
+    def __getstate__(self): return {'name': self.name} # Pickles as a reference; workers attach
+    def __setstate__(self, state): self.__init__(name=state['name'])
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info):
+        self.close()
+        if self._owner: self.unlink()
+
+    def close(self):
+        self._buf = None; self._shm.close()
+
+    def unlink(self): self._shm.unlink()
+
+    def clear(self):
+        self._buf[:self.buckets * BUCKET_SIZE] = bytes(self.buckets * BUCKET_SIZE)
+
+    def probe(self, pos_hash):
+        """Returns the TTEntry stored for pos_hash, or None."""
+        offset = (pos_hash % self.buckets) * BUCKET_SIZE
+        for slot_offset in (offset, offset + ENTRY.size):
+            key_xor, data = ENTRY.unpack_from(self._buf, slot_offset)
+            if data and key_xor ^ data == pos_hash: return _unpack(data)
+        return None
+
+    def store(self, pos_hash, depth, score, bound, action=None):
+        """Stores a search result; action is a 4-byte code from search.encode_action."""
+        data = _pack(depth, score, bound, action)
+        entry = ((pos_hash ^ data) & MASK64, data)
+        offset = (pos_hash % self.buckets) * BUCKET_SIZE
+        key_xor, old_data = ENTRY.unpack_from(self._buf, offset)
+        if not old_data or key_xor ^ old_data == pos_hash or _unpack(old_data).depth <= depth:
+            ENTRY.pack_into(self._buf, offset, *entry)
+        else:
+            ENTRY.pack_into(self._buf, offset + ENTRY.size, *entry)
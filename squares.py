@@ -0,0 +1,76 @@
+from utils import coords_to_algebraic
+import functools
+
+# Integer squares. The engine numbers the squares of a width x height board
+# row * width + col (row 0 is the top rank), so the standard board's squares are 0..63
+# with a8 = 0 and h1 = 63. Squares are the engine's only form of a position: the board's
+# grid, tile_effects and visibility_grid are flat lists indexed by square, piece
+# positions, action dicts and ability targets hold squares, and the internal entry points
+# (Game.play_move, Game.use_ability, Game.execute_action) take them directly. A
+# SquareTable holds every conversion for one board size as precomputed tables, plus
+# per-square step and ray tables for move generation; algebraic strings and (row, col)
+# tuples appear only at the I/O edge (play_turn, handle_ability_activation, display).
+
+class SquareTable:
+    def __init__(self, width=8, height=8):
+        self.width = width; self.height = height
+        self.count = width * height
+        self.coords = tuple(divmod(sq, width) for sq in range(self.count)) # square -> (row, col)
+        self.index = {pos: sq for sq, pos in enumerate(self.coords)} # (row, col) -> square
+        self.names = tuple(coords_to_algebraic(pos, width, height) for pos in self.coords) # square -> 'e2'
+        self.by_name = {name: sq for sq, name in enumerate(self.names)} # 'e2' -> square
+        self._steps = {}; self._rays = {}
+
+    def __deepcopy__(self, memo): return self # Read-only and shared by every board of this size
+
+    def square(self, where):
+        """Square of a (row, col) tuple, an algebraic string or a square; None if it is not on the board."""
+        if isinstance(where, str): return self.by_name.get(where[:1].lower() + where[1:])
+        if isinstance(where, tuple): return self.index.get(where)
+        return where if isinstance(where, int) and 0 <= where < self.count else None
+
+    def coords_of(self, name):
+        """algebraic_to_coords by table lookup."""
+        sq = self.square(name) if isinstance(name, str) else None
+        return self.coords[sq] if sq is not None else None
+
+    def name(self, pos):
+        """coords_to_algebraic by table lookup."""
+        sq = self.index.get(pos) if isinstance(pos, tuple) else None
+        return self.names[sq] if sq is not None else None
+
+    def line_step(self, a, b):
+        """Square step from a toward b if they share a rank, file or diagonal, else 0."""
+        (ar, ac), (br, bc) = self.coords[a], self.coords[b]
+        dr, dc = br - ar, bc - ac
+        if a == b or not (dr == 0 or dc == 0 or abs(dr) == abs(dc)): return 0
+        return ((dr > 0) - (dr < 0)) * self.width + (dc > 0) - (dc < 0)
+
+    def steps(self, offsets):
+        """Per square, the squares reached by the (dr, dc) offsets that stay on the board."""
+        table = self._steps.get(offsets)
+        if table is None:
+            table = self._steps[offsets] = tuple(
+                tuple(self.index[r + dr, c + dc] for dr, dc in offsets if (r + dr, c + dc) in self.index)
+                for r, c in self.coords)
+        return table
+
+    def rays(self, directions):
+        """Per square, one tuple of squares per (dr, dc) direction, nearest first, up to the edge."""
+        table = self._rays.get(directions)
+        if table is None:
+            rays = []
+            for r, c in self.coords:
+                square_rays = []
+                for dr, dc in directions:
+                    ray = []; tr, tc = r + dr, c + dc
+                    while (tr, tc) in self.index: ray.append(self.index[tr, tc]); tr += dr; tc += dc
+                    if ray: square_rays.append(tuple(ray))
+                rays.append(tuple(square_rays))
+            table = self._rays[directions] = tuple(rays)
+        return table
+
+@functools.lru_cache(maxsize=None)
+def square_table(width=8, height=8):
+    """The shared SquareTable for a board size."""
+    return SquareTable(width, height)
@@ -0,0 +1,327 @@
+import os
+import struct
+import zlib
+
+from board import HEAL_TILE_EFFECT
+from timers import turn_clock, turns_left
+
+# Retrograde-analysis endgame tables for king + one piece against a lone king.
+#
+# Tables are solved under the Chaos rules that stay fixed during an endgame: lava
+# squares cannot be entered and block sliding pieces and pawn pushes, pawns never
+# promote, and kings may not move into check. A table is specific to one lava layout.
+# Positions are only looked up when they fit that model: no piece is frozen and (for
+# pawn tables) there is no speed tile and no speed buff. SP specials, abilities and board
+# evolution are not modelled, and they do not stay out of reach: every action earns SP,
+# cooldowns tick and heal tiles cut them, and the evolution timer runs. So a result is
+# only trusted (probe) when the mate comes in fewer plies than the horizon: the first
+# ply at which a side could afford a special or use an ability, or the board evolves.
+# Draws are never trusted - a special or an ability may still win them. A Game with a
+# tablebase ends as soon as its position has a trusted result (see Game._check_game_end).
+#
+# Every table is solved with the strong side playing "up" the board like white; a
+# position with a black strong side is mirrored top-to-bottom before probing.
+#
+# Layout: index = ((stm * 64 + strong_king) * 64 + weak_king) * 64 + strong_piece,
+# stm 0 = strong side to move, 1 = weak side to move. One byte per position:
+# 0 means draw (or illegal), for stm 0 a value n > 0 means mate in n plies, for stm 1 a
+# value n > 0 means the weak king is mated in n - 1 plies.
+
+TB_MAGIC = b'CCTB'
+TB_VERSION = 1
+HEADER = struct.Struct('<4sHI') # magic, version, table count
+INDEX_ENTRY = struct.Struct('<8sQQI') # signature, lava mask, data offset, compressed length
+TABLE_SIZE = 2 * 64 * 64 * 64
+MAX_PLIES = 255
+
+TABLE_PIECES = {'KQvK': 'QUEEN', 'KRvK': 'ROOK', 'KPvK': 'PAWN'}
+SIGNATURES = {piece_type: sig for sig, piece_type in TABLE_PIECES.items()}
+
+KING_DIRECTIONS = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+ROOK_DIRECTIONS = [(0,1),(0,-1),(1,0),(-1,0)]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + [(1,1),(1,-1),(-1,1),(-1,-1)]
+
+def _on_board(r, c): return 0 <= r < 8 and 0 <= c < 8
+
+def mirror_square(sq): return (7 - sq // 8) * 8 + sq % 8
+
+def mirror_mask(mask):
+    return sum(1 << mirror_square(sq) for sq in range(64) if mask >> sq & 1)
+
+class _Geometry:
+    """Move and attack tables for one lava layout and one strong-piece type."""
+
+    def __init__(self, piece_type, lava_mask):
+        self.piece_type = piece_type
+        self.lava = [bool(lava_mask >> sq & 1) for sq in range(64)]
+        self.king_steps = [[] for _ in range(64)]
+        self.adjacent = [[False] * 64 for _ in range(64)]
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            for dr, dc in KING_DIRECTIONS:
+                if _on_board(r + dr, c + dc):
+                    t = (r + dr) * 8 + c + dc
+                    self.adjacent[sq][t] = True
+                    if not self.lava[t]: self.king_steps[sq].append(t)
+        # rays[sq]: per direction, the non-lava squares reachable from sq on an empty board
+        directions = QUEEN_DIRECTIONS if piece_type == 'QUEEN' else ROOK_DIRECTIONS
+        self.rays = [[] for _ in range(64)]
+        # between[x][t]: squares strictly between x and t if x attacks t past lava, else None
+        self.between = [[None] * 64 for _ in range(64)]
+        if piece_type in ('QUEEN', 'ROOK'):
+            for sq in range(64):
+                r, c = divmod(sq, 8)
+                for dr, dc in directions:
+                    ray = []; nr, nc = r + dr, c + dc
+                    while _on_board(nr, nc):
+                        t = nr * 8 + nc
+                        self.between[sq][t] = tuple(ray)
+                        if self.lava[t]: break
+                        ray.append(t); nr += dr; nc += dc
+                    if ray: self.rays[sq].append(ray)
+        self.pawn_attacks = [[] for _ in range(64)]
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            self.pawn_attacks[sq] = [(r - 1) * 8 + c + dc for dc in (-1, 1) if _on_board(r - 1, c + dc)]
+
+    def attacked(self, target, sk, x):
+        """Is the weak king on target attacked by the strong king on sk or strong piece on x?"""
+        if self.adjacent[sk][target]: return True
+        if x == target: return False
+        if self.piece_type == 'PAWN': return target in self.pawn_attacks[x]
+        between = self.between[x][target]
+        return between is not None and sk not in between
+
+    def piece_moves(self, sk, wk, x):
+        """Destinations of the strong piece (non-capturing; the only enemy is the king)."""
+        if self.piece_type == 'PAWN':
+            r = x // 8; moves = []
+            if r == 0: return moves # Pawns do not promote
+            one = x - 8
+            if one in (sk, wk) or self.lava[one]: return moves
+            moves.append(one)
+            if r == 6:
+                two = x - 16
+                if two not in (sk, wk) and not self.lava[two]: moves.append(two)
+            return moves
+        moves = []
+        for ray in self.rays[x]:
+            for t in ray:
+                if t == sk or t == wk: break
+                moves.append(t)
+        return moves
+
+    def piece_unmoves(self, sk, wk, x):
+        """Squares the strong piece could have come from to reach x."""
+        if self.piece_type != 'PAWN': return self.piece_moves(sk, wk, x)
+        r = x // 8; origins = []
+        if r >= 7: return origins
+        one = x + 8
+        if one in (sk, wk) or self.lava[one]: return origins
+        origins.append(one)
+        if r == 4:
+            two = x + 16
+            if two not in (sk, wk) and not self.lava[two]: origins.append(two)
+        return origins
+
+def _index(stm, sk, wk, x): return ((stm * 64 + sk) * 64 + wk) * 64 + x
+
+def generate_table(signature, lava_mask=0):
+    """Solves one table by retrograde analysis. Returns a bytearray of TABLE_SIZE values."""
+    geo = _Geometry(TABLE_PIECES[signature], lava_mask)
+    lava = geo.lava
+    values = bytearray(TABLE_SIZE)
+    counts = {} # weak-to-move index -> number of legal weak king moves not yet refuted
+    frontier = []
+    for sk in range(64):
+        if lava[sk]: continue
+        for wk in range(64):
+            if lava[wk] or wk == sk or geo.adjacent[sk][wk]: continue
+            for x in range(64):
+                if lava[x] or x == sk or x == wk: continue
+                moves = 0
+                for t in geo.king_steps[wk]:
+                    if t == sk or geo.adjacent[sk][t]: continue
+                    if t == x or not geo.attacked(t, sk, x): moves += 1
+                idx = _index(1, sk, wk, x)
+                if moves: counts[idx] = moves
+                elif geo.attacked(wk, sk, x):
+                    values[idx] = 1; frontier.append((sk, wk, x))
+    plies = 0
+    while frontier and plies < MAX_PLIES - 1:
+        plies += 1
+        next_frontier = []
+        if plies % 2: # Weak king mated in plies-1: strong-to-move predecessors win in plies
+            for sk, wk, x in frontier:
+                for origin in geo.king_steps[sk]:
+                    if origin == x or origin == wk or geo.adjacent[origin][wk]: continue
+                    idx = _index(0, origin, wk, x)
+                    if not values[idx] and not geo.attacked(wk, origin, x):
+                        values[idx] = plies; next_frontier.append((origin, wk, x))
+                for origin in geo.piece_unmoves(sk, wk, x):
+                    idx = _index(0, sk, wk, origin)
+                    if not values[idx] and not geo.attacked(wk, sk, origin):
+                        values[idx] = plies; next_frontier.append((sk, wk, origin))
+        else: # Strong side wins: weak-to-move predecessors lose once every escape is refuted
+            for sk, wk, x in frontier:
+                for origin in geo.king_steps[wk]:
+                    if origin == sk or origin == x or geo.adjacent[sk][origin]: continue
+                    idx = _index(1, sk, origin, x)
+                    remaining = counts.get(idx)
+                    if remaining is None: continue
+                    if remaining == 1:
+                        del counts[idx]; values[idx] = plies + 1; next_frontier.append((sk, origin, x))
+                    else: counts[idx] = remaining - 1
+        frontier = next_frontier
+    return values
+
+def build_tablebase(path, signatures=tuple(TABLE_PIECES), lava_masks=(0,)):
+    """Generates the given tables for each lava layout and writes them as one indexed file."""
+    blobs = [(sig, mask, zlib.compress(bytes(generate_table(sig, mask)), 9))
+             for sig in signatures for mask in lava_masks]
+    offset = HEADER.size + INDEX_ENTRY.size * len(blobs)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(TB_MAGIC, TB_VERSION, len(blobs)))
+        for sig, mask, blob in blobs:
+            f.write(INDEX_ENTRY.pack(sig.encode(), mask, offset, len(blob))); offset += len(blob)
+        for _, _, blob in blobs: f.write(blob)
+    os.replace(tmp_path, path)
+    return len(blobs)
+
+class Tablebase:
+    """Probes endgame tables from a file written by build_tablebase."""
+
+    def __init__(self, path=None, generate_missing=False):
+        self.path = path
+        self.generate_missing = generate_missing # Solve unknown lava layouts on demand (slow)
+        self._index = {} # (signature, lava_mask) -> (offset, length)
+        self._tables = {} # (signature, lava_mask) -> decompressed values
+        if path is not None:
+            with open(path, 'rb') as f:
+                magic, version, count = HEADER.unpack(f.read(HEADER.size))
+                if magic != TB_MAGIC or version != TB_VERSION: raise ValueError(f"{path} is not a tablebase file.")
+                for _ in range(count):
+                    sig, mask, offset, length = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+                    self._index[(sig.rstrip(b'\0').decode(), mask)] = (offset, length)
+
+    def _table(self, signature, lava_mask):
+        key = (signature, lava_mask)
+        if key not in self._tables:
+            if key in self._index:
+                offset, length = self._index[key]
+                with open(self.path, 'rb') as f:
+                    f.seek(offset); self._tables[key] = zlib.decompress(f.read(length))
+            elif self.generate_missing: self._tables[key] = bytes(generate_table(signature, lava_mask))
+            else: return None
+        return self._tables[key]
+
+    def _locate(self, game):
+        """Returns (table, strong_color, sk, wk, x) for an in-scope position, oriented for the table."""
+        board = game.board
+        if (board.width, board.height) != (8, 8): return None # Tables are for the standard board only
+        pieces = board.get_all_pieces()
+        if len(pieces) != 3: return None
+        extra = [p for p in pieces if p.piece_type_name != "KING"]
+        if len(extra) != 1 or extra[0].piece_type_name not in SIGNATURES: return None
+        piece = extra[0]; strong = piece.color
+        kings = {p.color: p for p in pieces if p.piece_type_name == "KING"}
+        if len(kings) != 2: return None
+        if any(p.status_effects.get('frozen', 0) > 0 for p in pieces): return None
+        lava_mask = 0; has_speed_tile = False
+        for sq, effect in enumerate(board.tile_effects):
+            if effect == board.LAVA_EFFECT: lava_mask |= 1 << sq
+            elif effect == "speed": has_speed_tile = True
+        if piece.piece_type_name == "PAWN" and (has_speed_tile or piece.has_speed_buff): return None
+        sk, wk, x = kings[strong].position, kings["black" if strong == "white" else "white"].position, piece.position
+        if strong == "black":
+            sk, wk, x, lava_mask = mirror_square(sk), mirror_square(wk), mirror_square(x), mirror_mask(lava_mask)
+        table = self._table(SIGNATURES[piece.piece_type_name], lava_mask)
+        if table is None: return None
+        return table, strong, sk, wk, x
+
+    def lookup(self, game):
+        """
+        Returns ('win' | 'loss' | 'draw', plies_to_mate) from the side to move's point of
+        view as the tables have it, or None if the position is outside the tables.
+        """
+        located = self._locate(game)
+        if located is None: return None
+        table, strong, sk, wk, x = located
+        stm = 0 if game.current_player == strong else 1
+        value = table[_index(stm, sk, wk, x)]
+        if not value: return ('draw', 0)
+        return ('win', value) if stm == 0 else ('loss', value - 1)
+
+    @staticmethod
+    def horizon(game):
+        """
+        Plies from now to the first turn on which something the tables do not model can
+        happen: a side can afford a special, an ability is ready, or the board evolves.
+        SP and cooldowns are bounded from above: each turn earns the action bonus plus the
+        zone SP of every own piece, and a heal tile cuts a cooldown by two on top of its tick.
+        """
+        board = game.board; pieces = board.get_all_pieces(); clock = turn_clock(game)
+        cheapest = min(m['sp_cost'] for m in game.SPECIAL_MOVES.values())
+        tick = 3 if HEAL_TILE_EFFECT in board.tile_effects else 1
+        def first_ply(turns, color): # Ply of color's turns-th turn from now (its current one is 0)
+            return 2 * turns if color == game.current_player else max(1, 2 * turns - 1)
+        plies = []
+        for color in ('white', 'black'):
+            own = [p for p in pieces if p.color == color]
+            gain = game.QUICK_DECISION_SP_BONUS + game.SP_PER_CENTRAL_ZONE * min(len(own), len(game.CENTRAL_ZONES))
+            plies.append(first_ply(-(-max(0, cheapest - game.player_sp[color]) // gain), color))
+            plies += [first_ply(-(-turns_left(p.ability_ready_at, clock) // tick), color) for p in own if p.ability is not None]
+        evolution = game.timers.pending.get(('evolution', None))
+        if evolution is not None: plies.append(evolution - clock)
+        return min(plies)
+
+    def probe(self, game):
+        """
+        Returns ('win' | 'loss', plies_to_mate) from the side to move's point of view if
+        the tables decide the game before the horizon, else None (draws included).
+        """
+        result = self.lookup(game)
+        if result is None or result[0] == 'draw' or result[1] >= self.horizon(game): return None
+        return result
+
+    def winner(self, game):
+        """Returns the color that wins with perfect play, or None if no trusted result (see probe)."""
+        result = self.probe(game)
+        if result is None: return None
+        other = "black" if game.current_player == "white" else "white"
+        return game.current_player if result[0] == 'win' else other
+
+    def best_action(self, game, actions):
+        """
+        Picks the table-perfect move among the game's legal actions: the fastest mate for
+        the strong side, the longest defence for the weak side. Returns None unless probe
+        trusts the position's result.
+        """
+        if self.probe(game) is None: return None
+        located = self._locate(game)
+        table, strong, sk, wk, x = located
+        mover_is_strong = game.current_player == strong
+        def orient(sq): return mirror_square(sq) if strong == "black" else sq
+        best, best_key = None, None
+        for action in actions:
+            if action['type'] != 'move': continue
+            start, end = orient(action['start_pos']), orient(action['end_pos'])
+            if mover_is_strong:
+                if start == sk: value = table[_index(1, end, wk, x)]
+                else: value = table[_index(1, sk, wk, end)]
+                if value and (best_key is None or value < best_key): best, best_key = action, value
+            else:
+                value = 0 if end == x else table[_index(0, sk, end, x)] # Capturing the piece draws
+                key = MAX_PLIES + 1 if not value else value
+                if best_key is None or key > best_key: best, best_key = action, key
+        return best
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate Chaos Chess endgame tables (no-lava layout).")
+    parser.add_argument('path')
+    parser.add_argument('--tables', nargs='*', default=list(TABLE_PIECES))
+    args = parser.parse_args()
+    count = build_tablebase(args.path, args.tables)
+    print(f"Wrote {count} tables to {args.path}.")
@@ -1,8 +1,46 @@
 import unittest
 from utils import algebraic_to_coords, coords_to_algebraic
-from pieces import Pawn, King # For testing get_revealed_squares and ability assignment
+from pieces import Pawn, Rook, Knight, Bishop, Queen, King # For testing get_revealed_squares, ability assignment and custom positions
 from board import Board # For context for get_revealed_squares, and LAVA_EFFECT
 import abilities as abilities_module # For testing ability assignment
+from game import Game
+from zobrist import position_hash
+from timers import due_after, turn_clock, turns_left
+from opening_book import OpeningBook, build_opening_book
+from tablebase import Tablebase, build_tablebase
+from renderer import DiffRenderer, changed_runs
+from serialization import game_to_state, game_from_state
+from parallel_search import ParallelSearcher
+from shared_tt import SharedTranspositionTable, EXACT, LOWER, UPPER
+from ponder import Ponderer
+from collections import Counter
+import tournament
+import math
+import pickle
+import contextlib
+import copy
+import functools
+import io
+import search
+import features
+import training_export
+import evaluator as evaluator_module
+from evaluator import NumpyEvaluator
+from move_ordering import MoveOrderer
+from squares import square_table
+import broadcast
+import fuzz
+import opening_book
+import game_stats
+import json
+import move_ordering
+import os
+import random
+import tempfile
+
+def sq(row, col, width=8):
+    """Integer square (see squares.py) of (row, col) on a board width files wide."""
+    return row * width + col
 
 class TestUtils(unittest.TestCase):
     def test_algebraic_to_coords(self):
@@ -25,7 +63,7 @@ class TestUtils(unittest.TestCase):
 class MockBoard:
     """A simplified board mock for testing piece methods that need board context."""
     def __init__(self):
-        self.tile_effects = [[None for _ in range(8)] for _ in range(8)]
+        self.tile_effects = [None] * 64 # Indexed by square, like Board
         # Define LAVA_EFFECT if pieces directly use it via board_object.LAVA_EFFECT
         self.LAVA_EFFECT = "lava"
         self.NO_EFFECT = None
@@ -48,43 +86,43 @@ class TestPieces(unittest.TestCase):
     def test_pawn_get_revealed_squares_white(self):
         # White pawn at e2 (6,4)
         # Piece constructor: color, position, piece_type_name, board_ref=None, abilities_module=None
-        pawn = Pawn("white", (6, 4), abilities_module=self.mock_game.abilities_module)
+        pawn = Pawn("white", sq(6, 4), abilities_module=self.mock_game.abilities_module)
 
         # Test case 1: No blockers
         # Revealed should be d3 (5,3) and f3 (5,5)
         revealed = pawn.get_revealed_squares(self.mock_board, {})
-        self.assertCountEqual(revealed, [(5, 3), (5, 5)])
+        self.assertCountEqual(revealed, [sq(5, 3), sq(5, 5)])
 
         # Test case 2: Blocker at d3 (piece or lava)
-        self.mock_board.tile_effects[5][3] = self.mock_board.LAVA_EFFECT
+        self.mock_board.tile_effects[sq(5, 3)] = self.mock_board.LAVA_EFFECT
         revealed_lava_block = pawn.get_revealed_squares(self.mock_board, {})
         # d3 is still revealed (the blocking square itself)
-        self.assertCountEqual(revealed_lava_block, [(5, 3), (5, 5)])
-        self.mock_board.tile_effects[5][3] = self.mock_board.NO_EFFECT # Reset
+        self.assertCountEqual(revealed_lava_block, [sq(5, 3), sq(5, 5)])
+        self.mock_board.tile_effects[sq(5, 3)] = self.mock_board.NO_EFFECT # Reset
 
-        revealed_piece_block = pawn.get_revealed_squares(self.mock_board, {(5,3)})
-        self.assertCountEqual(revealed_piece_block, [(5,3), (5,5)])
+        revealed_piece_block = pawn.get_revealed_squares(self.mock_board, {sq(5, 3)})
+        self.assertCountEqual(revealed_piece_block, [sq(5, 3), sq(5, 5)])
 
 
     def test_pawn_get_revealed_squares_black(self):
         # Black pawn at d7 (1,3)
-        pawn = Pawn("black", (1, 3), abilities_module=self.mock_game.abilities_module)
+        pawn = Pawn("black", sq(1, 3), abilities_module=self.mock_game.abilities_module)
         # Revealed should be c6 (2,2) and e6 (2,4)
         revealed = pawn.get_revealed_squares(self.mock_board, {})
-        self.assertCountEqual(revealed, [(2, 2), (2, 4)])
+        self.assertCountEqual(revealed, [sq(2, 2), sq(2, 4)])
 
     def test_pawn_get_revealed_squares_edge_board(self):
         # White pawn at a2 (6,0)
-        pawn_a2 = Pawn("white", (6,0), abilities_module=self.mock_game.abilities_module)
+        pawn_a2 = Pawn("white", sq(6, 0), abilities_module=self.mock_game.abilities_module)
         # Should only reveal b3 (5,1)
         revealed_a2 = pawn_a2.get_revealed_squares(self.mock_board, {})
-        self.assertCountEqual(revealed_a2, [(5,1)])
+        self.assertCountEqual(revealed_a2, [sq(5, 1)])
 
         # White pawn at h2 (6,7)
-        pawn_h2 = Pawn("white", (6,7), abilities_module=self.mock_game.abilities_module)
+        pawn_h2 = Pawn("white", sq(6, 7), abilities_module=self.mock_game.abilities_module)
         # Should only reveal g3 (5,6)
         revealed_h2 = pawn_h2.get_revealed_squares(self.mock_board, {})
-        self.assertCountEqual(revealed_h2, [(5,6)])
+        self.assertCountEqual(revealed_h2, [sq(5, 6)])
 
 
 class TestAbilityAssignment(unittest.TestCase):
@@ -99,19 +137,955 @@ class TestAbilityAssignment(unittest.TestCase):
         if not abilities_module.PIECE_ABILITIES.get("PAWN"):
             self.skipTest("No abilities defined for Pawn in abilities.py")
 
-        pawn = Pawn("white", (6,0), abilities_module=self.mock_game.abilities_module)
+        pawn = Pawn("white", sq(6, 0), abilities_module=self.mock_game.abilities_module)
         pawn.assign_ability() # assign_ability uses self.abilities_module
         self.assertIsNotNone(pawn.ability, "Pawn should be assigned an ability.")
         self.assertIn(pawn.ability, [ab_w[0] for ab_w in abilities_module.PIECE_ABILITIES["PAWN"]])
 
 
+    def test_registry_reach_tables(self):
+        teleport = abilities_module.ABILITIES_POOL["Teleport_R2"]
+        masks, squares = teleport.reach_tables()
+        self.assertEqual(len(squares[0]), 8) # a8 corner: 3x3 box minus itself
+        self.assertEqual(len(squares[4 * 8 + 4]), 24)
+        self.assertTrue(teleport.in_reach(sq(4, 4), sq(2, 6)))
+        self.assertFalse(teleport.in_reach(sq(4, 4), sq(1, 4)))
+        swap = abilities_module.ABILITIES_POOL["SwapWithAlly_Adj"]
+        self.assertEqual(bin(swap.reach_tables()[0][4 * 8 + 4]).count("1"), 8)
+        self.assertNotIn("KING", [t for t, options in abilities_module.PIECE_ABILITIES.items() if options])
+
+    def test_register_new_ability_from_table(self):
+        saved_pool = dict(abilities_module.ABILITIES_POOL)
+        saved_assignments = {t: list(options) for t, options in abilities_module.PIECE_ABILITIES.items()}
+        try:
+            abilities_module.register_abilities([("Hop_R3", "Hop (3)", "Teleport up to 3 squares.", 'teleport', 2,
+                                                  'empty_square', 3, {"ROOK": 1.0})])
+            hop = abilities_module.ABILITIES_POOL["Hop_R3"]
+            self.assertIn((hop, 1.0), abilities_module.PIECE_ABILITIES["ROOK"])
+            self.assertTrue(hop.in_reach(sq(7, 0), sq(4, 3)))
+        finally:
+            abilities_module.ABILITIES_POOL.clear(); abilities_module.ABILITIES_POOL.update(saved_pool)
+            abilities_module.PIECE_ABILITIES.clear(); abilities_module.PIECE_ABILITIES.update(saved_assignments)
+
     def test_king_gets_no_ability(self):
-        king = King("white", (7,4), abilities_module=self.mock_game.abilities_module)
+        king = King("white", sq(7, 4), abilities_module=self.mock_game.abilities_module)
         # King's assign_ability method is overridden to explicitly set ability to None
         king.assign_ability()
         self.assertIsNone(king.ability, "King should not be assigned an ability.")
 
 
+@functools.lru_cache(maxsize=None)
+def shared_tablebase():
+    """One in-memory Tablebase for all tests; generating a table takes seconds."""
+    return Tablebase(generate_missing=True)
+
+def make_position(pieces, current_player="white", **game_kwargs):
+    """Builds a quiet Game whose board holds only the given (PieceClass, color, square) pieces."""
+    with search.quiet():
+        game = Game(**game_kwargs)
+        game.board.grid = [None] * game.board.squares.count
+        for PieceClass, color, pos in pieces:
+            game.board.grid[pos] = PieceClass(color, pos, abilities_module=abilities_module)
+        game.current_player = current_player
+        game.board.update_visibility(current_player)
+        game.reset_history()
+    return game
+
+class TestSearchAndOpeningBook(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+        with search.quiet(): self.game = Game(ai_player_color='black')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.book_path = os.path.join(self.tmp_dir.name, "book.bin")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_simulate_leaves_original_game_untouched(self):
+        before = position_hash(self.game)
+        with search.quiet():
+            child = search.simulate(self.game, {'type': 'move', 'start_pos': sq(6, 4), 'end_pos': sq(4, 4)})
+        self.assertIsNotNone(child)
+        self.assertEqual(position_hash(self.game), before)
+        self.assertNotEqual(position_hash(child), before)
+        self.assertEqual(child.current_player, "black")
+
+    def test_action_codes_round_trip(self):
+        for action in self.game.generate_actions("white"):
+            decoded = search.decode_action(search.encode_action(action), self.game)
+            self.assertEqual(search.encode_action(decoded), search.encode_action(action))
+
+    def test_book_probe_returns_legal_reply(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out): count = build_opening_book(self.book_path, plies=2, samples=2, depth=1, width=2, seed=3)
+        self.assertGreater(count, 0)
+        self.assertEqual(out.getvalue(), "")
+        with OpeningBook(self.book_path) as book:
+            self.assertEqual(len(book), count)
+            for seed in (3, 50, 51): # Sampled setups and unseen ability assignments alike
+                random.seed(seed)
+                with search.quiet(): game = Game(ai_player_color='white')
+                action = book.probe(opening_book.book_hash(game), game)
+                self.assertIsNotNone(action)
+                legal_codes = {search.encode_action(a) for a in game.generate_actions("white")}
+                self.assertIn(search.encode_action(action), legal_codes)
+            self.assertIsNone(book.lookup(opening_book.book_hash(game) ^ 1))
+
+    def test_rejects_non_book_file(self):
+        with open(self.book_path, 'wb') as f: f.write(b"not a book at all")
+        with self.assertRaises(ValueError): OpeningBook(self.book_path)
+
+
+class TestTablebase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tablebase = shared_tablebase()
+
+    def test_mate_in_one_for_white(self):
+        game = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        self.assertEqual(self.tablebase.probe(game), ('win', 1))
+        action = self.tablebase.best_action(game, game.generate_actions("white"))
+        with search.quiet(): child = search.simulate(game, action)
+        self.assertEqual(self.tablebase.probe(child), ('loss', 0))
+        self.assertEqual(self.tablebase.winner(child), "white")
+
+    def test_mirrored_for_black_strong_side(self):
+        game = make_position([(King, "black", sq(5, 6)), (Queen, "black", sq(6, 0)), (King, "white", sq(7, 7))],
+                             current_player="black")
+        self.assertEqual(self.tablebase.probe(game), ('win', 1))
+
+    def test_draws_are_not_trusted(self):
+        game = make_position([(King, "white", sq(7, 0)), (Queen, "white", sq(1, 6)), (King, "black", sq(0, 7))],
+                             current_player="black")
+        self.assertEqual(self.tablebase.lookup(game), ('draw', 0)) # The lone king takes the undefended queen
+        self.assertIsNone(self.tablebase.probe(game))
+        self.assertIsNone(self.tablebase.best_action(game, game.generate_actions("black")))
+
+    def test_mates_past_the_horizon_are_not_trusted(self):
+        game = make_position([(King, "white", sq(5, 4)), (Rook, "white", sq(7, 0)), (King, "black", sq(2, 3))])
+        self.assertEqual(self.tablebase.horizon(game), 8) # White earns up to 3 SP a turn: 10 SP for a redeploy on its fourth turn from now
+        self.assertEqual(self.tablebase.lookup(game), ('win', 23))
+        self.assertIsNone(self.tablebase.probe(game))
+        queen = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        piece = queen.board.get_piece(sq(1, 0))
+        piece.ability = abilities_module.ABILITIES_POOL["Teleport_R2"]; piece.ability_ready_at = due_after("white", turn_clock(queen), 2)
+        self.assertEqual(self.tablebase.horizon(queen), 4)
+        queen.board.tile_effects[sq(7, 7)] = "heal" # A heal tile can make the ability ready a turn sooner
+        self.assertEqual(self.tablebase.horizon(queen), 2)
+        self.assertEqual(self.tablebase.probe(queen), ('win', 1))
+
+    def test_out_of_scope_positions(self):
+        game = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        game.board.get_piece(sq(1, 0)).ability = abilities_module.ABILITIES_POOL["Teleport_R2"]
+        self.assertIsNone(self.tablebase.probe(game))
+        self.assertIsNone(self.tablebase.probe(make_position(
+            [(King, "white", sq(7, 4)), (Bishop, "white", sq(7, 2)), (King, "black", sq(0, 4))])))
+
+    def test_affordable_specials_are_out_of_scope(self):
+        game = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        game.player_sp['black'] = 10 # Enough to redeploy: the tables do not model it
+        self.assertIsNone(self.tablebase.probe(game))
+
+    def test_decided_endgames_end_immediately(self):
+        game = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7)), (Pawn, "black", sq(1, 1))],
+                             tablebase=self.tablebase)
+        self.assertFalse(game.game_over)
+        with search.quiet(): self.assertTrue(game.play_turn("a7", "b7")) # Leaves KQvK with black to move
+        self.assertEqual((game.game_over, game.winner), (True, "white"))
+        drawn = make_position([(King, "white", sq(7, 4)), (Pawn, "white", sq(6, 3)), (King, "black", sq(0, 4))], tablebase=self.tablebase)
+        with search.quiet(): self.assertTrue(drawn.play_turn("d2", "d3"))
+        self.assertFalse(drawn.game_over) # Table draws are played out
+
+    def test_file_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "tables.bin")
+            self.assertEqual(build_tablebase(path, ['KPvK']), 1)
+            game = make_position([(King, "white", sq(7, 4)), (Pawn, "white", sq(6, 3)), (King, "black", sq(0, 4))])
+            self.assertEqual(Tablebase(path).lookup(game), ('draw', 0)) # Pawns never promote in Chaos Chess
+            self.assertIsNone(Tablebase(path).probe(make_position(
+                [(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])))
+
+
+class TestDiffRenderer(unittest.TestCase):
+    def setUp(self):
+        random.seed(11)
+        with search.quiet(): self.game = Game()
+        self.stream = io.StringIO()
+        self.renderer = DiffRenderer(self.stream)
+
+    def test_display_matches_frame_lines(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out): self.game.board.display(self.game)
+        self.assertEqual(out.getvalue(), "\n".join(self.game.board.frame_lines()) + "\n")
+        self.assertEqual(out.getvalue().count("\n"), 30) # Same 30 lines the per-line prints produced
+
+    def test_first_frame_full_then_only_changes(self):
+        full = self.renderer.render(self.game.board, None)
+        self.assertIn("\x1b[2J", self.stream.getvalue())
+        self.assertEqual(self.renderer.render(self.game.board, None), 0)
+        with search.quiet(): self.game.play_turn("e2", "e4")
+        self.stream.seek(0); self.stream.truncate()
+        diff = self.renderer.render(self.game.board, None)
+        self.assertGreater(diff, 0); self.assertLess(diff, full)
+        self.assertNotIn("\x1b[2J", self.stream.getvalue())
+        self.assertIn("wP", self.stream.getvalue())
+
+    def test_viewers_cached_separately(self):
+        white_out, black_out = io.StringIO(), io.StringIO()
+        self.renderer.attach("white", white_out); self.renderer.attach("black", black_out)
+        self.renderer.render(self.game.board, "white"); self.renderer.render(self.game.board, "black")
+        self.assertNotEqual(white_out.getvalue(), black_out.getvalue())
+        self.assertEqual(self.renderer.render(self.game.board, "white"), 0)
+
+    def test_changed_runs_merges_nearby_changes(self):
+        self.assertEqual(list(changed_runs("abcdefghij", "aXcdefghiY")), [(1, "X"), (9, "Y")])
+        self.assertEqual(list(changed_runs("abcdef", "aXcYef")), [(1, "XcY")])
+
+
+class TestLegalMoves(unittest.TestCase):
+    def setUp(self):
+        random.seed(5)
+        with search.quiet(): self.game = Game()
+
+    def moves(self, actions): return [a for a in actions if a['type'] == 'move']
+
+    def test_initial_position_and_per_square_queries(self):
+        self.assertEqual(len(self.moves(self.game.legal_moves())), 20)
+        self.assertCountEqual([a['end_pos'] for a in self.moves(self.game.legal_moves_for("e2"))], [sq(5, 4), sq(4, 4)])
+        self.assertEqual(self.game.legal_moves_for(sq(7, 6)), self.game.legal_moves_for("g1"))
+        self.assertEqual(self.game.legal_moves_for("e7"), []) # Black piece, white to move
+
+    def test_cached_until_state_changes(self):
+        calls = []
+        original = self.game._iter_legal_actions
+        def counting(player_color):
+            calls.append(player_color); return original(player_color)
+        self.game._iter_legal_actions = counting
+        self.game.legal_moves(); self.game.legal_moves_for("d2"); self.game.legal_moves()
+        self.assertEqual(calls, ["white"])
+        with search.quiet(): self.game.play_turn("e2", "e4")
+        self.assertEqual(len(self.moves(self.game.legal_moves())), 20)
+        self.assertEqual(calls, ["white", "black"])
+
+    def test_ability_targets_and_cooldown_invalidation(self):
+        knight = self.game.board.get_piece(sq(7, 1))
+        knight.ability = abilities_module.ABILITIES_POOL["Teleport_R2"]
+        self.game.invalidate_legal_moves() # Direct edits to pieces bypass the game's entry points
+        uses = [a for a in self.game.legal_moves_for("b1") if a['type'] == 'ability']
+        self.assertCountEqual([a['target_pos'] for a in uses], [sq(5, 0), sq(5, 1), sq(5, 2), sq(5, 3)])
+        with search.quiet(): self.assertTrue(self.game.handle_ability_activation("b1", "c3"))
+        with search.quiet(): self.game.play_turn("e7", "e5")
+        self.assertEqual([a for a in self.game.legal_moves_for("c3") if a['type'] == 'ability'], [])
+
+    def test_generating_actions_prints_nothing(self):
+        knight = self.game.board.get_piece(sq(7, 1))
+        knight.ability = abilities_module.ABILITIES_POOL["Teleport_R2"]; self.game.invalidate_legal_moves()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out): actions = self.game.generate_actions("white")
+        self.assertTrue(any(a['type'] == 'ability' for a in actions)) # Hypothetical effects did run
+        self.assertEqual(out.getvalue(), "")
+        with contextlib.redirect_stdout(out): self.assertTrue(self.game.handle_ability_activation("b1", "c3"))
+        self.assertEqual(out.getvalue().count("teleported"), 1) # Only the real use reports
+
+    def test_affordable_specials_listed(self):
+        self.assertFalse([a for a in self.game.legal_moves() if a['type'] == 'special'])
+        self.game.player_lost_pieces['white'].append("KNIGHT")
+        with search.quiet(): self.game.add_sp("white", 15)
+        specials = [a for a in self.game.legal_moves() if a['type'] == 'special']
+        self.assertIn('freeze_pawns', [a['key'] for a in specials])
+        self.assertNotIn('redeploy', [a['key'] for a in specials]) # Back rank is full
+
+    def test_unfreezing_invalidates(self):
+        self.game.board.get_piece(sq(6, 4)).status_effects['frozen'] = due_after('white', turn_clock(self.game), 1)
+        self.game.invalidate_legal_moves(); self.game.reset_timers()
+        self.assertEqual(self.game.legal_moves_for("e2"), [])
+        with search.quiet():
+            self.game.play_turn("d2", "d3"); self.game.play_turn("d7", "d6")
+        self.assertEqual(len(self.moves(self.game.legal_moves_for("e2"))), 2)
+
+
+class TestGameEnd(unittest.TestCase):
+    def test_checkmate_ends_game(self):
+        game = make_position([(King, "white", sq(2, 5)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        with search.quiet(): self.assertTrue(game.play_turn("a7", "g7"))
+        self.assertTrue(game.game_over)
+        self.assertEqual(game.winner, "white")
+        with search.quiet(): self.assertFalse(game.play_turn("h8", "h7"))
+
+    def test_stalemate_is_a_draw(self):
+        game = make_position([(King, "white", sq(7, 0)), (Queen, "white", sq(2, 0)), (King, "black", sq(0, 7))])
+        with search.quiet(): self.assertTrue(game.play_turn("a6", "g6"))
+        self.assertTrue(game.game_over)
+        self.assertIsNone(game.winner)
+
+    def test_special_keeps_game_alive(self):
+        game = make_position([(King, "white", sq(7, 0)), (Queen, "white", sq(2, 0)), (King, "black", sq(0, 7))])
+        game.player_sp['black'] = 15
+        with search.quiet(): game.play_turn("a6", "g6")
+        self.assertFalse(game.game_over) # Black can still use Global Freeze Pawns
+
+    def test_specials_only_count_in_check_if_they_answer_it(self):
+        def back_rank_check(lost):
+            game = make_position([(King, "white", sq(2, 6)), (Rook, "white", sq(7, 0)), (King, "black", sq(0, 7))])
+            game.player_sp['black'] = 15; game.player_lost_pieces['black'] = lost
+            with search.quiet(): game.play_turn("a1", "a8")
+            return game
+        game = back_rank_check([])
+        self.assertEqual((game.game_over, game.winner), (True, "white")) # Freezing pawns leaves the king in check
+        game = back_rank_check(["KNIGHT"])
+        self.assertFalse(game.game_over) # A redeployed knight can block
+        self.assertEqual({(a['key'], a['args'][1]) for a in game.legal_moves()}, {('redeploy', f"{f}8") for f in "bcdefg"})
+        with search.quiet(): self.assertFalse(game.handle_special_move("black", "freeze_pawns"))
+
+    def test_destroyed_king_loses(self):
+        game = make_position([(King, "white", sq(7, 0)), (Rook, "white", sq(6, 0)), (King, "black", sq(0, 7))])
+        game.board.grid[sq(0, 7)] = None # e.g. swallowed by lava
+        with search.quiet(): game.switch_player()
+        self.assertTrue(game.game_over)
+        self.assertEqual(game.winner, "white")
+
+    def test_has_legal_action_stops_early(self):
+        random.seed(1)
+        with search.quiet(): game = Game()
+        seen = []
+        original = game._iter_standard_moves
+        def tracking(pieces):
+            for action in original(pieces): seen.append(action); yield action
+        game._iter_standard_moves = tracking
+        self.assertTrue(game.has_legal_action("white"))
+        self.assertEqual(len(seen), 1)
+
+
+class TestSerializationAndParallelSearch(unittest.TestCase):
+    def test_state_round_trip(self):
+        random.seed(9)
+        with search.quiet():
+            game = Game()
+            game.board.get_piece(sq(6, 2)).ability = abilities_module.ABILITIES_POOL["SwapWithAlly_Adj"]
+            game.play_turn("e2", "e4"); game.play_turn("d7", "d5"); game.play_turn("e4", "d5")
+        game.board.tile_effects[sq(4, 4)] = "lava"
+        state = game_to_state(game)
+        rng_before = random.getstate()
+        restored = game_from_state(pickle.loads(pickle.dumps(state)))
+        self.assertEqual(random.getstate(), rng_before)
+        self.assertEqual(position_hash(restored), position_hash(game))
+        self.assertEqual(game_to_state(restored), state)
+        self.assertEqual(restored.legal_moves(), game.legal_moves())
+
+    def test_restored_game_evolves_the_same_tiles(self):
+        random.seed(10)
+        with search.quiet(): game = Game()
+        restored = game_from_state(game_to_state(game))
+        self.assertEqual(restored.board.evolution_seed, game.board.evolution_seed)
+        with search.quiet():
+            for g in (game, restored):
+                g.full_turn_counter = 3; g.board.generate_tile_effects(g)
+        self.assertEqual(restored.board.tile_effects, game.board.tile_effects)
+
+    def test_parallel_search_finds_mate(self):
+        game = make_position([(King, "white", sq(2, 5)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))])
+        with ParallelSearcher(workers=2) as searcher:
+            ranked = searcher.rank_actions(game, 1)
+        self.assertEqual(ranked[0][0], search.MATE_SCORE)
+        self.assertEqual(ranked[0][1]['end_pos'], sq(1, 6))
+        self.assertEqual(ranked[0][0], search.rank_actions(game, 1)[0][0])
+
+
+class TestSharedTranspositionTable(unittest.TestCase):
+    def setUp(self):
+        self.tt = SharedTranspositionTable(buckets=8)
+
+    def tearDown(self):
+        self.tt.close(); self.tt.unlink()
+
+    def test_store_and_probe(self):
+        self.tt.store(12345, 3, -4200, LOWER, (1, 52, 36, 0))
+        entry = self.tt.probe(12345)
+        self.assertEqual((entry.depth, entry.score, entry.bound, entry.action), (3, -4200, LOWER, (1, 52, 36, 0)))
+        self.assertIsNone(self.tt.probe(12345 + 8)) # Same bucket, different key
+
+    def test_depth_preferred_replacement(self):
+        self.tt.store(1, 5, 10, EXACT)
+        self.tt.store(9, 2, 20, UPPER) # Same bucket, shallower: goes to the always-replace slot
+        self.tt.store(17, 1, 30, EXACT) # Evicts the always-replace slot only
+        self.assertEqual(self.tt.probe(1).score, 10)
+        self.assertIsNone(self.tt.probe(9))
+        self.assertEqual(self.tt.probe(17).score, 30)
+        self.tt.store(25, 6, 40, EXACT) # Deeper: takes the depth-preferred slot
+        self.assertEqual(self.tt.probe(25).score, 40)
+
+    def test_attached_tables_share_entries(self):
+        other = pickle.loads(pickle.dumps(self.tt))
+        try:
+            other.store(77, 4, 123, EXACT)
+            self.assertEqual(self.tt.probe(77).score, 123)
+        finally:
+            other.close()
+
+    def test_search_scores_unchanged(self):
+        random.seed(4)
+        with search.quiet(): game = Game()
+        with search.quiet():
+            plain = search.negamax(game, 2)
+            cached = search.negamax(game, 2, tt=self.tt)
+            again = search.negamax(game, 2, tt=self.tt)
+        self.assertEqual(plain, cached)
+        self.assertEqual(cached, again)
+        self.assertEqual(self.tt.probe(position_hash(game)).bound, EXACT)
+
+
+class TestPonder(unittest.TestCase):
+    def setUp(self):
+        random.seed(2)
+        self.ponderer = Ponderer(predict_depth=1)
+        with search.quiet(): self.game = Game(ai_player_color='black', ai_depth=1, ponderer=self.ponderer)
+
+    def tearDown(self):
+        self.ponderer.stop()
+
+    def test_pondered_reply_used_when_prediction_hits(self):
+        expected = search.best_action(self.game, 1)
+        self.ponderer.start(self.game, 1)
+        self.assertTrue(self.ponderer.active)
+        with search.quiet():
+            self.game.execute_action(expected)
+            reply = search.best_action(self.game, 1)
+            self.game.handle_ai_turn()
+        self.assertEqual(self.ponderer.hits, 1)
+        self.assertFalse(self.ponderer.active)
+        self.assertEqual(self.game.current_player, "white")
+        moved = self.game.board.get_piece(reply['end_pos'])
+        self.assertIsNotNone(moved); self.assertEqual(moved.color, "black")
+
+    def test_ponder_dropped_on_unexpected_move(self):
+        expected = search.best_action(self.game, 1)
+        self.ponderer.start(self.game, 1)
+        other = next(a for a in self.game.legal_moves() if a != expected)
+        with search.quiet():
+            self.game.execute_action(other)
+            self.assertIsNone(self.ponderer.take(self.game))
+        self.assertEqual(self.ponderer.misses, 1)
+        self.assertFalse(self.ponderer.active)
+
+    def test_book_move_stops_pondering(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "book.bin")
+            build_opening_book(path, plies=2, samples=1, depth=1, width=2, seed=2)
+            with OpeningBook(path) as book:
+                self.game.opening_book = book
+                with search.quiet():
+                    booked = next(a for a in self.game.legal_moves() if a['type'] == 'move' and
+                                  book.lookup(opening_book.book_hash(search.simulate(self.game, a))) is not None)
+                    self.ponderer.start(self.game, 1)
+                    self.game.execute_action(booked); self.game.handle_ai_turn()
+                self.assertFalse(self.ponderer.active)
+                self.assertEqual(self.game.current_player, "white")
+                self.game.opening_book = None
+
+    def test_tablebase_move_beats_ponder_result(self):
+        game = make_position([(King, "white", sq(2, 6)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))],
+                             ai_player_color='white', ai_depth=1, ponderer=self.ponderer, tablebase=shared_tablebase())
+        self.ponderer.start(game, 1) # Set up directly, so not yet adjudicated
+        with search.quiet(): game.handle_ai_turn()
+        self.assertFalse(self.ponderer.active)
+        self.assertEqual((self.ponderer.hits, self.ponderer.misses), (0, 0)) # Never consulted
+        self.assertEqual((game.game_over, game.winner), (True, "white"))
+
+
+class TestTournament(unittest.TestCase):
+    def test_evolution_rolls_ignore_ai_randomness(self):
+        games = []
+        for ai_draws in (0, 50): # The random AI and search draw from the global RNG between evolutions
+            random.seed(9)
+            with search.quiet(): game = Game()
+            for _ in range(ai_draws): random.random()
+            with search.quiet(): game.board.generate_tile_effects(game)
+            games.append(game)
+        self.assertEqual(games[0].board.tile_effects, games[1].board.tile_effects)
+        self.assertTrue(any(games[0].board.tile_effects))
+
+    def test_pairs_are_reproducible_and_leave_rng_alone(self):
+        random.seed(123); before = random.getstate()
+        first = tournament.play_pair({}, {}, seed=5, max_plies=12)
+        self.assertEqual(random.getstate(), before)
+        self.assertEqual(tournament.play_pair({}, {}, seed=5, max_plies=12), first)
+
+    def test_sprt_decisions(self):
+        clear_win = Counter({1.0: 30, 0.75: 10, 0.5: 2})
+        self.assertGreater(tournament.sprt_llr(clear_win, 0, 20), math.log(0.95 / 0.05))
+        clear_loss = Counter({0.0: 30, 0.25: 10, 0.5: 2})
+        self.assertLess(tournament.sprt_llr(clear_loss, 0, 20), math.log(0.05 / 0.95))
+        self.assertEqual(tournament.sprt_llr(Counter({0.5: 10}), 0, 20), 0.0)
+
+    def test_match_summary(self):
+        result = tournament.run_match({}, {}, max_pairs=2, workers=0, max_plies=6)
+        self.assertEqual(result.pairs, 2)
+        self.assertEqual(result.wins + result.draws + result.losses, 4)
+        self.assertEqual(result.decision, 'inconclusive')
+        self.assertLessEqual(result.elo_low, result.elo)
+        self.assertLessEqual(result.elo, result.elo_high)
+
+
+class TestHistory(unittest.TestCase):
+    def position(self, state): return state[:2] + state[3:] # ai_player_color is not part of the history
+    def play_random_plies(self, plies, seed=3):
+        random.seed(seed)
+        with search.quiet():
+            game = Game(ai_player_color='white'); states = [game_to_state(game)]
+            for _ in range(plies):
+                if game.game_over: break
+                game.ai_player_color = game.current_player; game.handle_ai_turn()
+                states.append(game_to_state(game))
+        return game, states
+
+    def test_undo_redo_console_commands(self):
+        random.seed(4)
+        with search.quiet():
+            game = Game(ai_player_color='black')
+            self.assertTrue(game.handle_command("move e2 e4")); game.play_turn("e7", "e5") # The AI's reply
+            self.assertTrue(game.handle_command("UNDO")) # Takes back the AI's ply and the human's
+            self.assertEqual((game.ply, game.current_player), (0, 'white'))
+            self.assertTrue(game.handle_command("redo"))
+            self.assertEqual(game.ply, 2)
+            self.assertIsNotNone(game.board.get_piece(sq(3, 4)))
+            self.assertTrue(game.handle_command("")); self.assertTrue(game.handle_command("bogus"))
+        self.assertFalse(game.handle_command("quit"))
+
+    def test_undo_redo_restore_every_ply(self):
+        game, states = self.play_random_plies(12)
+        self.assertEqual(game.ply, len(states) - 1)
+        for ply in range(len(states) - 2, -1, -1):
+            self.assertTrue(game.undo()); self.assertEqual(self.position(game_to_state(game)), self.position(states[ply]))
+        self.assertFalse(game.undo())
+        for ply in range(1, len(states)):
+            self.assertTrue(game.redo()); self.assertEqual(self.position(game_to_state(game)), self.position(states[ply]))
+        self.assertFalse(game.redo())
+        self.assertTrue(game.jump_to_ply(5)); self.assertEqual(self.position(game_to_state(game)), self.position(states[5]))
+        self.assertEqual(game.legal_moves(), game_from_state(states[5]).legal_moves())
+
+    def test_new_action_discards_redo_plies(self):
+        game, states = self.play_random_plies(6)
+        game.jump_to_ply(2)
+        with search.quiet(): game.ai_player_color = game.current_player; game.handle_ai_turn()
+        self.assertEqual(game.ply, 3); self.assertEqual(len(game.history), 4)
+        self.assertFalse(game.redo())
+
+    def test_versions_share_unchanged_rows(self):
+        game, states = self.play_random_plies(20)
+        versions = game.history.versions
+        distinct_rows = {id(row) for version in versions for row in version.rows}
+        self.assertLess(len(distinct_rows), 8 + 3 * (len(versions) - 1)) # A ply touches at most a few rows
+        self.assertIn(versions[1].action['type'], ('move', 'ability', 'special'))
+
+@unittest.skipIf(features.np is None, "numpy is not installed")
+class TestTrainingExport(unittest.TestCase):
+    def test_encode_start_position(self):
+        random.seed(0)
+        with search.quiet(): game = Game()
+        planes, scalars = features.encode_position(game)
+        self.assertEqual(planes.shape, (len(features.PLANES), 8, 8))
+        self.assertEqual(planes[features.PIECE_PLANE['white', 'PAWN'], 6].sum(), 8)
+        self.assertEqual(planes[features.PIECE_PLANE['black', 'KING'], 0, 4], 1)
+        self.assertEqual(scalars[features.SCALARS.index('side_to_move')], 0)
+
+    def test_self_play_export_and_backfill(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rows = training_export.export_self_play(directory, games=2, depth=0, max_plies=30, chunk_size=8)
+            chunks = list(training_export.load_chunks(directory))
+            self.assertEqual(sum(len(chunk['results']) for chunk in chunks), rows)
+            self.assertEqual(len(chunks), -(-rows // 8))
+            first = chunks[0]
+            self.assertEqual(int(first['planes'][0, :12].sum()), 32) # All pieces on the board at ply 0
+            self.assertTrue(all(code[0] in (1, 2, 3) for chunk in chunks for code in chunk['actions']))
+
+    def test_finish_game_fills_results_across_chunks(self):
+        game = make_position([(King, "white", sq(7, 0)), (Queen, "white", sq(2, 0)), (King, "black", sq(0, 7))])
+        with tempfile.TemporaryDirectory() as directory:
+            with training_export.TrainingExporter(directory, chunk_size=2) as exporter:
+                for _ in range(5): exporter.record(game, game.legal_moves()[0])
+                game.winner = 'white'; exporter.finish_game(game)
+            results = [int(r) for chunk in training_export.load_chunks(directory) for r in chunk['results']]
+        self.assertEqual(results, [1] * 5)
+
+    def test_human_ending_the_game_fills_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with training_export.TrainingExporter(directory) as exporter:
+                game = make_position([(King, "white", sq(2, 5)), (Queen, "white", sq(1, 0)), (King, "black", sq(0, 7))],
+                                     current_player="black", ai_player_color="black", training_exporter=exporter)
+                with search.quiet():
+                    game.handle_ai_turn() # Kg8, the only move: recorded
+                    self.assertTrue(game.play_turn("a7", "g7")) # The human mates
+                self.assertEqual((game.game_over, game.export_token, exporter._open_games), (True, None, {}))
+            results = [int(r) for chunk in training_export.load_chunks(directory) for r in chunk['results']]
+        self.assertEqual(results, [-1])
+
+@unittest.skipIf(features.np is None, "numpy is not installed")
+class TestNumpyEvaluator(unittest.TestCase):
+    def test_material_model_scores_side_to_move(self):
+        evaluator = NumpyEvaluator.material(Game.PIECE_SP_VALUES)
+        game = make_position([(King, "white", sq(7, 0)), (Queen, "white", sq(2, 0)), (King, "black", sq(0, 7))])
+        self.assertEqual(evaluator.evaluate_batch([game]), [9])
+        game.current_player = "black"
+        self.assertEqual(evaluator.evaluate_batch([game]), [-9])
+        self.assertEqual(evaluator.evaluate(game, "white"), 9)
+
+    def test_rejects_non_standard_boards(self):
+        evaluator = NumpyEvaluator.material(Game.PIECE_SP_VALUES)
+        with search.quiet():
+            with self.assertRaisesRegex(ValueError, "8x8 boards, not 10x8"): Game(evaluator=evaluator, width=10)
+            game = Game(width=10)
+        with self.assertRaisesRegex(ValueError, "not 10x8"): evaluator.evaluate_batch([game]) # Attached later
+
+    def test_save_load_mlp(self):
+        rng = features.np.random.default_rng(0)
+        layers = [(rng.normal(size=(evaluator_module.FEATURE_SIZE, 8)), rng.normal(size=8)),
+                  (rng.normal(size=(8, 1)), rng.normal(size=1))]
+        model = NumpyEvaluator(layers, scale=10)
+        random.seed(0)
+        with search.quiet(): game = Game()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.npz'); model.save(path)
+            self.assertEqual(NumpyEvaluator.load(path).evaluate_batch([game]), model.evaluate_batch([game]))
+
+    def test_batched_depth_one_matches_single_leaf_scores(self):
+        random.seed(2)
+        with search.quiet(): game = Game(evaluator=NumpyEvaluator.material(Game.PIECE_SP_VALUES, scale=100))
+        with search.quiet():
+            children = [search.simulate(game, action) for action in game.legal_moves()]
+            expected = max(-search.leaf_score(child, child.current_player) for child in children if child is not None)
+            self.assertEqual(search.negamax(game, 1), expected)
+
+class TestBoardDimensions(unittest.TestCase):
+    def test_multi_digit_ranks(self):
+        self.assertEqual(algebraic_to_coords("a12", 12, 12), (0, 0))
+        self.assertEqual(algebraic_to_coords("l1", 12, 12), (11, 11))
+        self.assertIsNone(algebraic_to_coords("a13", 12, 12))
+        self.assertIsNone(algebraic_to_coords("m1", 12, 12))
+        self.assertEqual(coords_to_algebraic((2, 9), 10, 10), "j8")
+
+    def test_wide_board_setup_and_moves(self):
+        random.seed(4)
+        with search.quiet(): game = Game(width=12, height=12)
+        names = [p.piece_type_name for p in game.board.grid[11 * 12:]]
+        self.assertEqual(names, ["ROOK", "KNIGHT", "BISHOP", "KNIGHT", "BISHOP", "QUEEN", "KING",
+                                 "BISHOP", "KNIGHT", "BISHOP", "KNIGHT", "ROOK"])
+        moves = [a for a in game.legal_moves() if a['type'] == 'move']
+        self.assertEqual(len(moves), 12 * 2 + 4 * 2)
+        with search.quiet(): self.assertTrue(game.play_turn("f2", "f4"))
+        self.assertEqual(game.board.get_piece(sq(8, 5, 12)).piece_type_name, "PAWN")
+        self.assertEqual(len(game.board.frame_lines()), 3 + 3 * 12 - 1 + 4)
+
+    def test_state_and_hash_carry_size(self):
+        random.seed(4)
+        with search.quiet(): game = Game(width=10, height=10)
+        copy_game = game_from_state(game_to_state(game))
+        self.assertEqual((copy_game.board.width, copy_game.board.height), (10, 10))
+        self.assertEqual(position_hash(copy_game), position_hash(game))
+        action = search.best_action(game, 1)
+        self.assertEqual(search.decode_action(search.game_action_code(game, action), game)['end_pos'], action.get('end_pos'))
+
+    def test_candidate_squares_follow_mobility(self):
+        game = make_position([(King, "white", sq(15, 0, 16)), (Rook, "white", sq(8, 8, 16)), (King, "black", sq(0, 15, 16))],
+                             width=16, height=16)
+        rook = game.board.get_piece(sq(8, 8, 16))
+        self.assertEqual(len(rook.candidate_squares(game.board)), 30)
+        self.assertEqual(len([a for a in game.legal_moves_for(sq(8, 8, 16)) if a['type'] == 'move']), 30)
+
+class TestMoveOrdering(unittest.TestCase):
+    def setUp(self):
+        # White pawn and queen can both take the black queen; the queen can also take a pawn
+        self.game = make_position([(King, 'white', sq(7, 0)), (King, 'black', sq(0, 0)), (Pawn, 'white', sq(5, 3)),
+                                   (Queen, 'white', sq(4, 7)), (Queen, 'black', sq(4, 4)), (Pawn, 'black', sq(2, 7))])
+        self.orderer = MoveOrderer()
+
+    def test_mvv_lva_orders_cheapest_attacker_on_best_victim_first(self):
+        ordered = self.orderer.order(self.game, self.game.generate_actions('white'))
+        firsts = [(a['start_pos'], a['end_pos']) for a in ordered[:3]]
+        self.assertEqual(firsts, [(sq(5, 3), sq(4, 4)), (sq(4, 7), sq(4, 4)), (sq(4, 7), sq(2, 7))])
+
+    def test_staged_generation_yields_every_action_once_with_tt_action_first(self):
+        actions = self.game.generate_actions('white')
+        tt_action = search.game_action_code(self.game, actions[-1])
+        staged = list(self.orderer.staged(self.game, 0, tt_action))
+        codes = [search.game_action_code(self.game, a) for a in staged]
+        self.assertEqual(codes[0], tt_action)
+        self.assertEqual(Counter(codes), Counter(search.game_action_code(self.game, a) for a in actions))
+
+    def test_cutoffs_feed_killers_and_history(self):
+        quiet_move = {'type': 'move', 'start_pos': sq(7, 0), 'end_pos': sq(7, 1)}
+        capture = {'type': 'move', 'start_pos': sq(5, 3), 'end_pos': sq(4, 4)}
+        self.orderer.record_cutoff(self.game, quiet_move, 2, 3); self.orderer.record_cutoff(self.game, capture, 2, 3)
+        code = search.game_action_code(self.game, quiet_move)
+        self.assertEqual(self.orderer.killers[2], [code])
+        self.assertEqual(self.orderer.history[('white', code)], 9)
+        self.assertEqual(self.orderer.sort_key(self.game, quiet_move, 2)[0], move_ordering.STAGE_KILLER)
+        ordered = self.orderer.order(self.game, self.game.generate_actions('white'), 2)
+        codes = [search.game_action_code(self.game, a) for a in ordered]
+        self.assertEqual(codes.index(code), 3) # Right after the three captures
+
+    def test_ordered_search_scores_match_unordered_search(self):
+        with search.quiet():
+            for action in self.game.generate_actions('white')[:6]:
+                child = search.simulate(self.game, action)
+                self.assertEqual(search.negamax(child, 2, orderer=MoveOrderer(), ply=1), search.negamax(child, 2))
+
+class TestQuiescence(unittest.TestCase):
+    def test_capture_squares_skip_quiet_moves_lava_and_frozen_pieces(self):
+        game = make_position([(King, 'white', sq(7, 0)), (King, 'black', sq(0, 0)), (Rook, 'white', sq(4, 4)),
+                              (Pawn, 'black', sq(4, 7)), (Knight, 'black', sq(1, 4)), (Pawn, 'white', sq(5, 2)), (Bishop, 'black', sq(4, 1))])
+        rook, pawn = game.board.get_piece(sq(4, 4)), game.board.get_piece(sq(5, 2))
+        self.assertEqual(sorted(rook.capture_squares(game.board)), [sq(1, 4), sq(4, 1), sq(4, 7)])
+        self.assertEqual(pawn.capture_squares(game.board), [sq(4, 1)])
+        game.board.tile_effects[sq(4, 7)] = game.board.LAVA_EFFECT
+        self.assertEqual(sorted(rook.capture_squares(game.board)), [sq(1, 4), sq(4, 1)])
+        rook.status_effects['frozen'] = due_after('white', turn_clock(game), 1)
+        self.assertEqual(rook.capture_squares(game.board), [])
+        moves = [(a['start_pos'], a['end_pos']) for a in game._iter_capture_moves(game._movable_pieces('white'))]
+        self.assertEqual(moves, [(sq(5, 2), sq(4, 1))])
+
+    def test_check_evasions_match_the_legal_moves(self):
+        # Black rook checks along the e-file; white can capture it, block, or step aside
+        game = make_position([(King, 'white', sq(7, 4)), (King, 'black', sq(0, 0)), (Rook, 'black', sq(2, 4)),
+                              (Bishop, 'white', sq(4, 2)), (Knight, 'white', sq(4, 6)), (Pawn, 'white', sq(6, 0))])
+        self.assertEqual(game.checkers('white'), [sq(2, 4)])
+        evasions = {(a['start_pos'], a['end_pos']) for a in game._iter_check_evasions('white')}
+        legal = {(a['start_pos'], a['end_pos']) for a in game.legal_moves() if a['type'] == 'move'}
+        self.assertEqual(evasions, legal)
+        self.assertIn((sq(4, 6), sq(5, 4)), evasions) # Knight blocks
+        self.assertIn((sq(4, 2), sq(2, 4)), evasions) # Bishop takes the checker
+
+    def test_quiescence_sees_the_recapture(self):
+        # Rxd5 wins a pawn at depth 1, but the knight recaptures the rook
+        game = make_position([(King, 'white', sq(7, 0)), (King, 'black', sq(0, 0)), (Rook, 'white', sq(7, 3)),
+                              (Pawn, 'black', sq(3, 3)), (Knight, 'black', sq(1, 2))])
+        capture = {'type': 'move', 'start_pos': sq(7, 3), 'end_pos': sq(3, 3)}
+        with search.quiet():
+            child = search.simulate(game, capture)
+            self.assertGreater(-search.negamax(child, 0), search.evaluate(game, 'white'))
+            self.assertLess(-search.quiescence(child), search.evaluate(game, 'white'))
+            game.quiescence_depth = 4
+            self.assertNotEqual(search.game_action_code(game, search.best_action(game, 1)), search.game_action_code(game, capture))
+
+class TestSquares(unittest.TestCase):
+    def test_tables_match_the_notation_helpers(self):
+        for width, height in ((8, 8), (10, 12)):
+            table = square_table(width, height)
+            self.assertEqual(table.count, width * height)
+            for sq, pos in enumerate(table.coords):
+                name = coords_to_algebraic(pos, width, height)
+                self.assertEqual(table.names[sq], name)
+                self.assertEqual((table.square(pos), table.square(name), table.square(name.upper())), (sq, sq, sq))
+                self.assertEqual(table.coords_of(name), algebraic_to_coords(name, width, height))
+        table = square_table()
+        self.assertEqual((table.square('a8'), table.square('h1')), (0, 63))
+        for bad in ('z9', 'a', 'a12', 12 * 8, (8, 0), None): self.assertIsNone(table.square(bad))
+        self.assertIsNone(table.name(('a', 'b')))
+
+    def test_step_and_ray_tables(self):
+        table = square_table()
+        self.assertEqual(set(table.steps(Knight.STEPS)[0]), {table.square('b6'), table.square('c7')})
+        rays = table.rays(Rook.RAYS)[table.square('a1')]
+        self.assertEqual(sorted(len(ray) for ray in rays), [7, 7])
+        self.assertIs(copy.deepcopy(table), table)
+
+    def test_square_entry_points_play_like_the_notation_ones(self):
+        with search.quiet():
+            random.seed(5); by_name = Game()
+            random.seed(5); by_square = Game() # Same ability assignments
+            self.assertFalse(by_square.play_move(sq(6, 4), sq(3, 4)))
+            self.assertTrue(by_name.play_turn('e2', 'e4'))
+            self.assertTrue(by_square.play_move(sq(6, 4), sq(4, 4)))
+        self.assertEqual(position_hash(by_name), position_hash(by_square))
+        self.assertEqual(by_square.history.versions[-1].action, {'type': 'move', 'start_pos': 52, 'end_pos': 36})
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertFalse(by_square.play_move(64, 0)) # Off the board
+            self.assertFalse(by_square.play_move((1, 4), (3, 4))) # Tuples are for the I/O edge only
+            self.assertFalse(by_square.use_ability(-1))
+        self.assertEqual(output.getvalue().split("\n")[:2], ["Invalid coords.", "Invalid coords."])
+
+class TestFuzz(unittest.TestCase):
+    def test_chaos_fen_round_trip(self):
+        rng = random.Random(1); game = fuzz.new_game()
+        for _ in range(20):
+            position = fuzz.random_position(rng, game=game)
+            parsed = fuzz.parse_chaos_fen(fuzz.to_chaos_fen(position))
+            self.assertEqual((parsed.side, sorted(parsed.pieces), sorted(parsed.tiles)),
+                             (position.side, sorted(position.pieces), sorted(position.tiles)))
+        fen = "4k3/8/8/3p4/8/8/8/R3K3 w d5L,e4S a1=c2/f1/s"
+        self.assertEqual(fuzz.to_chaos_fen(fuzz.parse_chaos_fen(fen)), fen)
+        with self.assertRaises(ValueError): fuzz.parse_chaos_fen("4k3/8 w - -")
+
+    def test_fast_paths_agree_with_the_reference(self):
+        mismatches, rate = fuzz.fuzz(60, seed=2)
+        self.assertEqual(mismatches, [])
+        self.assertEqual(fuzz.fuzz(5, seed=2, width=10, height=9)[0], [])
+
+    def test_mismatch_is_shrunk_to_a_minimal_repro(self):
+        original = Knight.capture_squares
+        Knight.capture_squares = lambda self, board: [] # A broken fast path: knights never capture
+        try:
+            rng = random.Random(0); game = fuzz.new_game()
+            while True:
+                position = fuzz.random_position(rng, game=game)
+                if 'captures' in fuzz.failing_checks(game, ['captures']): break
+            minimal = fuzz.parse_chaos_fen(fuzz.to_chaos_fen(fuzz.shrink(position, 'captures', game)))
+            self.assertEqual(len(minimal.pieces), 4) # Two kings, the knight and its victim
+            self.assertIn((minimal.side, 'KNIGHT'), [(p[1], p[2]) for p in minimal.pieces])
+            self.assertEqual(minimal.tiles, ())
+            self.assertIn('captures', fuzz.failing_checks(fuzz.load_position(game, minimal), ['captures']))
+        finally:
+            Knight.capture_squares = original
+
+    def test_reference_moves_do_not_trust_the_fast_king_safety_test(self):
+        game = fuzz.load_position(fuzz.new_game(), fuzz.parse_chaos_fen("4k3/8/8/8/8/8/4r3/4K3 w - -"))
+        original = Game._move_exposes_king
+        Game._move_exposes_king = lambda self, color, start, end: False # A broken fast path: nothing is ever pinned or attacked
+        try:
+            self.assertIn('moves', fuzz.failing_checks(game, ['moves']))
+            self.assertIn('king_safety', fuzz.failing_checks(game, ['king_safety']))
+        finally:
+            Game._move_exposes_king = original
+        self.assertEqual(fuzz.failing_checks(game), [])
+
+class TestGameStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def played_game(self, seed):
+        random.seed(seed)
+        with search.quiet():
+            game = Game()
+            for start, end in (('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5')): self.assertTrue(game.play_turn(start, end))
+        return game
+
+    def test_record_is_read_from_the_history(self):
+        record = game_stats.game_record(self.played_game(1), seed=1)
+        self.assertEqual((record['plies'], record['winner'], record['seed']), (3, None, 1))
+        self.assertIn(['capture', 3, 'white', 'PAWN', None], record['events'])
+        # Move bonus, e4 held at the start of white's turn, then capture (1) plus move bonus
+        self.assertEqual([e[4] for e in record['events'] if e[0] == 'sp' and e[2] == 'white'], [1, 1, 2])
+        self.assertEqual(len(record['abilities']['white']), 15) # Every piece but the king
+        self.assertEqual((record['sp']['white'], record['sp']['black']), ([2, 4], [1, 1]))
+
+    def test_logs_stream_and_shards_merge(self):
+        paths = [os.path.join(self.tmp_dir.name, f"shard{i}.jsonl.gz") for i in range(2)]
+        records = [game_stats.game_record(self.played_game(seed), seed) for seed in range(3)]
+        for path, shard in zip(paths, (records[:2], records[2:])):
+            with game_stats.GameLogWriter(path) as writer:
+                for record in shard: writer.write(record)
+        reader = game_stats.read_records(paths)
+        self.assertEqual(next(reader), records[0]) # A generator: nothing is loaded up front
+        self.assertEqual(list(reader), records[1:])
+        merged = game_stats.aggregate(paths)
+        whole = game_stats.GameStats().update(records)
+        self.assertEqual(merged.report(), whole.report())
+        restored = game_stats.GameStats.from_json(json.loads(json.dumps(merged.to_json())))
+        self.assertEqual(restored.report(), whole.report())
+        report = whole.report()
+        self.assertEqual((report['games'], report['results']['draw'], report['captures']), (3, 1.0, {'PAWN': 3}))
+        self.assertEqual(report['sp_curve'], [(0, 1.5), (1, 2.5)])
+
+class TestBroadcast(unittest.TestCase):
+    def setUp(self):
+        random.seed(5)
+        with search.quiet(): self.game = Game()
+        self.hub = broadcast.Broadcaster()
+        self.inboxes = {view: [[] for _ in range(3)] for view in broadcast.VIEWS}
+        for view, inboxes in self.inboxes.items():
+            for inbox in inboxes: self.hub.subscribe(view, inbox.append)
+
+    def play(self, *moves):
+        with search.quiet():
+            for start, end in moves: self.assertTrue(self.game.play_turn(start, end)); self.hub.publish(self.game)
+
+    def test_views_are_encoded_once_and_shared(self):
+        self.hub.publish(self.game); self.play(('e2', 'e4'), ('d7', 'd5'))
+        self.assertEqual(self.hub.encoded, 3 * 3) # Three views over three plies, whatever the audience
+        for inboxes in self.inboxes.values():
+            self.assertTrue(all(a is b for a, b in zip(inboxes[0], inboxes[1])))
+        delta = self.inboxes['white'][0][-1]
+        self.assertEqual(delta[0], broadcast.DELTA)
+        self.assertLess(len(delta), len(self.inboxes['white'][0][0]) // 4)
+
+    def test_decoders_track_each_fog_view(self):
+        self.hub.publish(self.game); self.play(('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5'))
+        for view in broadcast.VIEWS:
+            decoder = broadcast.ViewDecoder()
+            for message in self.inboxes[view][2]: decoder.apply(message)
+            self.assertEqual(decoder.cells, list(broadcast.view_cells(self.game, view)))
+            self.assertEqual((decoder.current_player, decoder.player_sp), (self.game.current_player, self.game.player_sp))
+        omniscient = broadcast.ViewDecoder().apply(self.inboxes[None][0][0])
+        self.assertNotIn(broadcast.FOG_CELL, omniscient.cells)
+        self.assertEqual(omniscient.square(self.game.board.squares.square('d7'))[0], ('black', 'PAWN'))
+
+    def test_late_subscriber_starts_from_a_keyframe(self):
+        self.hub.publish(self.game); self.play(('e2', 'e4'))
+        late = broadcast.ViewDecoder()
+        self.hub.subscribe('black', late.apply)
+        self.play(('d7', 'd5'))
+        self.assertEqual(late.cells, list(broadcast.view_cells(self.game, 'black')))
+        with self.assertRaises(ValueError): broadcast.ViewDecoder().apply(self.inboxes['black'][0][-1])
+
+class TestTimers(unittest.TestCase):
+    def setUp(self):
+        random.seed(2)
+        with search.quiet(): self.game = Game()
+        self.rook = self.game.board.get_piece(sq(7, 0))
+        self.rook.ability = abilities_module.ABILITIES_POOL["Teleport_R2"]
+
+    def play(self, *moves):
+        with search.quiet():
+            for start, end in moves: self.assertTrue(self.game.play_turn(start, end))
+
+    def test_cooldowns_tick_down_on_the_owners_turns(self):
+        with search.quiet(): self.assertTrue(self.game.handle_ability_activation("a1", "a3"))
+        self.assertEqual(self.rook.ability_ready_at, 8) # Ready on white's fourth turn from now
+        cooldowns = [turns_left(self.rook.ability_ready_at, turn_clock(self.game))]
+        for move in (("e7", "e6"), ("e2", "e3"), ("d7", "d6"), ("e3", "e4"), ("d6", "d5"), ("g1", "f3"), ("g8", "f6")):
+            self.assertEqual(self.game.timers.pending[('cooldown', self.rook)], 8) # Scheduled once, at its expiry
+            self.play(move); cooldowns.append(turns_left(self.rook.ability_ready_at, turn_clock(self.game)))
+        self.assertEqual(cooldowns, [4, 3, 3, 2, 2, 1, 1, 0]) # Counts down as white's turns start
+        self.assertEqual(self.rook.ability_ready_at, 0)
+        self.assertIn(sq(5, 0), {a['piece_pos'] for a in self.game.generate_actions("white") if a['type'] == 'ability'})
+
+    def test_heal_tile_moves_the_expiry_earlier(self):
+        with search.quiet(): self.assertTrue(self.game.handle_ability_activation("a1", "a3"))
+        self.game.board.tile_effects[sq(4, 0)] = "heal"
+        self.play(("e7", "e6"), ("a3", "a4")) # Cooldown 3 -> 1 on white's first turn after the use
+        self.assertEqual((self.rook.ability_ready_at, self.game.timers.pending[('cooldown', self.rook)]), (4, 4))
+        self.play(("d7", "d6"))
+        self.assertEqual(self.rook.ability_ready_at, 0)
+        self.assertNotIn(('cooldown', self.rook), self.game.timers.pending) # The entry left at clock 8 is stale
+
+    def test_only_due_entries_fire(self):
+        pawn = self.game.board.get_piece(sq(1, 0))
+        pawn.status_effects['frozen'] = due_after('black', turn_clock(self.game), 2); self.game.reset_timers()
+        self.assertEqual(len(self.game.timers), 2) # The frozen pawn and the next board evolution
+        self.play(("e2", "e4"))
+        self.assertEqual(turns_left(pawn.status_effects['frozen'], turn_clock(self.game)), 1)
+        self.assertEqual(sorted(self.game.timers.buckets), [3, 10]) # Nothing re-scheduled on the way
+        self.play(("e7", "e6"), ("d2", "d3"))
+        self.assertNotIn('frozen', pawn.status_effects)
+        self.assertEqual(len(self.game.timers), 1)
+
+    def test_board_evolves_on_schedule_and_restores(self):
+        moves = [("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")] * 3
+        with search.quiet():
+            for i, (start, end) in enumerate(moves[:8]):
+                evolved = any(self.game.board.tile_effects)
+                self.assertFalse(evolved, f"evolved before ply {i}")
+                self.game.play_turn(start, end)
+            self.assertEqual(self.game.board.board_evolution_timer, 4)
+            for start, end in moves[8:10]: self.game.play_turn(start, end)
+        self.assertEqual(self.game.board.board_evolution_timer, 0) # Evolved at the start of full turn 5
+        self.assertEqual(self.game.timers.pending[('evolution', None)], 20)
+        self.game.undo(); self.game.undo()
+        self.assertEqual(self.game.timers.pending[('evolution', None)], 10) # Rebuilt from the restored counters
+
 # Conceptual Review Notes (to be summarized later):
 # - Interaction of Abilities and Tile Effects: Generally separate, which is simpler. Speed buff + Teleport: Teleport range is fixed. Stun + Heal Tile: Heal tile reduces ability CD, not status effects. This seems fine.
 # - Fog of War and AI: AI sees true state. Standard.
@@ -0,0 +1,85 @@
+# Turn timers. Frozen pieces, ability cooldowns and board evolution all wait for a turn.
+# Instead of walking every piece at every turn boundary, a Game keeps a TimerWheel: a
+# dict from turn clock to the entries due at that clock. Each timer is scheduled once, at
+# its absolute expiry clock, and a turn boundary pops only its own bucket, so a turn costs
+# time only for the timers that actually expire on it.
+#
+# The clock is derived from state the game already keeps:
+#   turn_clock = 2 * full_turn_counter + (1 if black is to move else 0)
+# so it is even on white's turns and survives undo, redo and save/load unchanged.
+# Pieces store expiry clocks, not counters:
+#   piece.status_effects['frozen']  clock of the turn start at which the piece thaws
+#   piece.ability_ready_at          clock of the turn start at which the ability is ready
+#                                   (0: ready now)
+# Remaining turns, where hashes, features or saved states need them, are
+# turns_left(due, clock); due_after() turns a count back into a clock. Entries are
+# (kind, piece) with kind 'frozen', 'cooldown' or 'evolution' (piece None: the board
+# evolves at the start of the white turn on which board_evolution_timer reaches
+# turns_before_evolution). A due entry re-checks its piece - a captured piece, or an
+# expiry moved by a heal tile, ends it - so nothing needs to be cancelled. Code that
+# rewrites pieces wholesale (history restore, game_from_state, fuzz positions) calls
+# Game.reset_timers(), which rebuilds the wheel from the board.
+
+def turn_clock(game): return 2 * game.full_turn_counter + (game.current_player == 'black')
+
+def next_turn_of(color, clock):
+    """Clock of the next turn start of color strictly after clock."""
+    return clock + 2 if (clock % 2 == 0) == (color == 'white') else clock + 1
+
+def due_after(color, clock, turns):
+    """Expiry clock of a timer of color that runs out at color's turns-th turn start after clock (0 if turns <= 0)."""
+    return next_turn_of(color, clock) + 2 * (turns - 1) if turns > 0 else 0
+
+def turns_left(due, clock):
+    """Turn starts of the timer's owner left until due, as seen at clock (0 for no timer)."""
+    return max(0, (due - clock + 1) // 2) if due else 0
+
+class TimerWheel:
+    def __init__(self):
+        self.buckets = {} # clock -> [(kind, piece)]
+        self.pending = {} # (kind, piece) -> clock, so a timer is never scheduled twice
+
+    def __len__(self): return len(self.pending)
+
+    def schedule(self, due, kind, piece=None):
+        """Sets the (kind, piece) timer to fire at clock due; a new due replaces the old one."""
+        if self.pending.get((kind, piece)) == due: return
+        self.pending[kind, piece] = due; self.buckets.setdefault(due, []).append((kind, piece))
+
+    def track(self, game, piece, kind):
+        """Schedules piece's 'frozen' or 'cooldown' expiry (status_effects['frozen'] or ability_ready_at)."""
+        due = piece.status_effects.get('frozen', 0) if kind == 'frozen' else piece.ability_ready_at
+        if due > turn_clock(game): self.schedule(due, kind, piece)
+
+    def schedule_evolution(self, game):
+        board = game.board; clock = turn_clock(game)
+        first = clock + 2 if clock % 2 == 0 else clock + 1 # Next white turn; this one has already counted
+        self.schedule(first + 2 * (max(1, board.turns_before_evolution - board.board_evolution_timer) - 1), 'evolution')
+
+    def rebuild(self, game):
+        """Reschedules every timer from the board's expiry clocks (after the position was rewritten)."""
+        self.buckets.clear(); self.pending.clear()
+        for piece in game.board.get_all_pieces():
+            if piece.status_effects.get('frozen', 0): self.track(game, piece, 'frozen')
+            if piece.ability_ready_at: self.track(game, piece, 'cooldown')
+        self.schedule_evolution(game)
+
+    def advance(self, game):
+        """Fires the entries due at the game's current clock; call once per turn start."""
+        clock = turn_clock(game)
+        due = self.buckets.pop(clock, None)
+        if not due: return 0
+        due.sort(key=lambda entry: entry[0] != 'evolution') # The board evolves before pieces thaw, as before
+        fired = 0
+        for kind, piece in due:
+            if self.pending.get((kind, piece)) != clock: continue # Rescheduled (heal tile) or already fired
+            del self.pending[kind, piece]; fired += 1
+            if kind == 'evolution':
+                game.board.generate_tile_effects(game); self.schedule_evolution(game); continue
+            if game.board.get_piece(piece.position) is not piece: continue # Captured, or destroyed by lava
+            if kind == 'frozen':
+                if piece.status_effects.get('frozen') == clock:
+                    del piece.status_effects['frozen']; game.invalidate_legal_moves()
+                    print(f"{piece} @ {game.board.squares.names[piece.position]} unfrozen.")
+            elif piece.ability_ready_at == clock: piece.ability_ready_at = 0; game.invalidate_legal_moves()
+        return fired
@@ -0,0 +1,150 @@
+import math
+import os
+import random
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from game import Game
+from search import quiet
+
+# AI-vs-AI matches between two Game configurations.
+#
+# A configuration is a dict of Game attributes for the side it plays, e.g.
+# {'ai_depth': 2}; 'opening_book_path', 'tablebase_path' and 'evaluator_path' open
+# those files in the worker. Games are played in pairs from the same seed (so both get
+# the same ability assignments and, through Board.evolution_seed, the same board
+# evolution rolls whatever randomness the AIs use) with colors swapped, and the
+# match is stopped by a sequential probability ratio test on the pair scores as soon
+# as the result is clear.
+
+MatchResult = namedtuple('MatchResult', ['wins', 'draws', 'losses', 'pairs', 'elo', 'elo_low', 'elo_high',
+                                         'llr', 'decision'])
+
+_resources = {} # path -> opened OpeningBook / Tablebase, per worker process
+_PATH_ATTRS = {'opening_book_path': 'opening_book', 'tablebase_path': 'tablebase', 'evaluator_path': 'evaluator'}
+
+def _apply_config(game, config):
+    for key, value in config.items():
+        if key == 'opening_book_path':
+            from opening_book import OpeningBook
+            if value not in _resources: _resources[value] = OpeningBook(value)
+            game.opening_book = _resources[value]
+        elif key == 'tablebase_path':
+            from tablebase import Tablebase
+            if value not in _resources: _resources[value] = Tablebase(value)
+            game.tablebase = _resources[value]
+        elif key == 'evaluator_path':
+            from evaluator import NumpyEvaluator
+            if value not in _resources: _resources[value] = NumpyEvaluator.load(value)
+            game.evaluator = _resources[value]
+        else: setattr(game, key, value)
+
+def play_game(white_config, black_config, seed, max_plies=300):
+    """Plays one game; returns 1.0 for a white win, 0.0 for a black win, 0.5 for a draw or the ply cap."""
+    configs = {'white': white_config, 'black': black_config}
+    rng_state = random.getstate()
+    random.seed(seed)
+    try:
+        with quiet():
+            game = Game(ai_player_color='white')
+            attrs = {_PATH_ATTRS.get(key, key) for config in configs.values() for key in config}
+            baseline = {attr: getattr(game, attr, None) for attr in attrs} # Undone before the other side moves
+            for _ in range(max_plies):
+                if game.game_over: break
+                game.ai_player_color = game.current_player
+                for attr, value in baseline.items(): setattr(game, attr, value)
+                _apply_config(game, configs[game.current_player])
+                game.handle_ai_turn()
+    finally:
+        random.setstate(rng_state)
+    if not game.game_over or game.winner is None: return 0.5
+    return 1.0 if game.winner == 'white' else 0.0
+
+def play_pair(config_a, config_b, seed, max_plies=300):
+    """Plays A as white and then as black from the same seed; returns A's two scores."""
+    return (play_game(config_a, config_b, seed, max_plies),
+            1.0 - play_game(config_b, config_a, seed, max_plies))
+
+def expected_score(elo): return 1.0 / (1.0 + 10 ** (-elo / 400.0))
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+def pair_statistics(pair_counts):
+    """Mean and variance of the per-pair score (0, 0.25, ..., 1) from {pair_score: count}."""
+    n = sum(pair_counts.values())
+    mean = sum(score * count for score, count in pair_counts.items()) / n
+    var = sum(count * (score - mean) ** 2 for score, count in pair_counts.items()) / n
+    return n, mean, var
+
+def sprt_llr(pair_counts, elo0, elo1):
+    """Generalized SPRT log-likelihood ratio of H1 (elo1) against H0 (elo0) on pair scores."""
+    if len(pair_counts) < 2: return 0.0 # No variance yet; every pair scored the same
+    n, mean, var = pair_statistics(pair_counts)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var) if var > 0 else 0.0
+
+def summarize(pair_counts, game_counts, llr, decision, z=1.96):
+    n, mean, var = pair_statistics(pair_counts) if pair_counts else (0, 0.5, 0.0)
+    margin = z * math.sqrt(var / n) if n else 0.5
+    return MatchResult(game_counts[1.0], game_counts[0.5], game_counts[0.0], n, elo_from_score(mean),
+                       elo_from_score(mean - margin), elo_from_score(mean + margin), llr, decision)
+
+def run_match(config_a, config_b, max_pairs=200, workers=None, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05,
+              seed=0, max_plies=300, min_pairs=10):
+    """
+    Plays color-balanced pairs of A vs B until the SPRT accepts H0 (A is not elo1 better
+    than B), accepts H1, or max_pairs is reached. The variance estimate is too noisy to
+    stop on before min_pairs pairs. workers=0 plays in this process.
+    Returns a MatchResult from A's point of view.
+    """
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    pair_counts = Counter(); game_counts = Counter({1.0: 0, 0.5: 0, 0.0: 0})
+    llr = 0.0; decision = 'inconclusive'
+
+    def record(scores):
+        nonlocal llr, decision
+        for score in scores: game_counts[score] += 1
+        pair_counts[sum(scores) / 2] += 1
+        llr = sprt_llr(pair_counts, elo0, elo1)
+        if sum(pair_counts.values()) < min_pairs: return False
+        if llr >= upper: decision = 'H1'
+        elif llr <= lower: decision = 'H0'
+        return decision != 'inconclusive'
+
+    if workers == 0:
+        for pair in range(max_pairs):
+            if record(play_pair(config_a, config_b, seed + pair, max_plies)): break
+        return summarize(pair_counts, game_counts, llr, decision)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        next_pair = 0; pending = set()
+        window = 2 * (workers or os.cpu_count() or 1) # Pairs in flight; few wasted once the SPRT stops
+        while next_pair < max_pairs or pending:
+            while next_pair < max_pairs and len(pending) < window:
+                pending.add(executor.submit(play_pair, config_a, config_b, seed + next_pair, max_plies)); next_pair += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(record(future.result()) for future in done):
+                for future in pending: future.cancel()
+                break
+    return summarize(pair_counts, game_counts, llr, decision)
+
+if __name__ == '__main__':
+    import argparse, json
+    parser = argparse.ArgumentParser(description="Play an SPRT match between two AI configurations.")
+    parser.add_argument('config_a', help='JSON dict of Game attributes, e.g. \'{"ai_depth": 1}\'')
+    parser.add_argument('config_b')
+    parser.add_argument('--pairs', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--min-pairs', type=int, default=10)
+    args = parser.parse_args()
+    result = run_match(json.loads(args.config_a), json.loads(args.config_b), args.pairs, args.workers,
+                       args.elo0, args.elo1, seed=args.seed, max_plies=args.max_plies, min_pairs=args.min_pairs)
+    print(f"A vs B: +{result.wins} ={result.draws} -{result.losses} over {result.pairs} pairs")
+    print(f"Elo {result.elo:+.1f} (95% CI {result.elo_low:+.1f} .. {result.elo_high:+.1f}), "
+          f"LLR {result.llr:.2f}, decision: {result.decision}")
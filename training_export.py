@@ -0,0 +1,153 @@
+import json
+import os
+
+from features import PLANES, SCALARS, encode_position, np, require_numpy
+from search import game_action_code
+
+# Self-play training data, written straight into memory-mapped .npy chunks.
+#
+# An export directory holds index.json (feature layout, board size, chunk size and the
+# number of rows written to each chunk) and, per chunk, four pre-allocated arrays:
+#   chunk_NNNNN_planes.npy  (chunk_size, len(PLANES), height, width) uint8
+#   chunk_NNNNN_scalars.npy (chunk_size, len(SCALARS)) int16
+#   chunk_NNNNN_actions.npy (chunk_size, 4) uint8       action codes (search.encode_action)
+#   chunk_NNNNN_results.npy (chunk_size,) int8          final result for the side to move:
+#                                                       1 win, 0 draw, -1 loss, RESULT_UNKNOWN
+# Positions are encoded directly into the mapped rows, and results are filled in when
+# the game ends. Loaders open the chunks with mmap_mode='r' and slice them in place.
+
+EXPORT_VERSION = 1
+INDEX_FILE = 'index.json'
+RESULT_UNKNOWN = -128 # Game not finished (yet), e.g. stopped at a ply cap
+ARRAYS = ('planes', 'scalars', 'actions', 'results')
+
+def array_layout(width=8, height=8):
+    """name -> (dtype, row shape) of the chunk arrays for a board size."""
+    return {'planes': ('uint8', (len(PLANES), height, width)), 'scalars': ('int16', (len(SCALARS),)),
+            'actions': ('uint8', (4,)), 'results': ('int8', ())}
+
+def chunk_path(directory, chunk, name): return os.path.join(directory, f"chunk_{chunk:05d}_{name}.npy")
+
+class TrainingExporter:
+    """
+    Collects the positions the AI moves from (Game(training_exporter=...) calls record()
+    from handle_ai_turn) and the actions it chose. Several games may be recorded at once,
+    all on boards of the exporter's size.
+    """
+
+    def __init__(self, directory, chunk_size=1 << 16, width=8, height=8):
+        require_numpy()
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.width = width; self.height = height
+        os.makedirs(directory, exist_ok=True)
+        self.counts = [] # Rows written per chunk
+        self._arrays = None # Memmaps of the chunk being filled
+        self._open_games = {} # export token (game.export_token) -> [(row, side to move)]
+        self._next_token = 0
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def __len__(self): return sum(self.counts)
+
+    def _start_chunk(self):
+        self._flush_chunk()
+        chunk = len(self.counts)
+        self._arrays = {name: np.lib.format.open_memmap(chunk_path(self.directory, chunk, name), mode='w+', dtype=dtype,
+                                                        shape=(self.chunk_size,) + shape)
+                        for name, (dtype, shape) in array_layout(self.width, self.height).items()}
+        self._arrays['results'][:] = RESULT_UNKNOWN
+        self.counts.append(0)
+
+    def _flush_chunk(self):
+        if self._arrays is None: return
+        for array in self._arrays.values(): array.flush()
+        self._arrays = None
+        self._write_index()
+
+    def _write_index(self):
+        index = {'version': EXPORT_VERSION, 'chunk_size': self.chunk_size, 'width': self.width, 'height': self.height,
+                 'planes': list(PLANES),
+                 'scalars': list(SCALARS), 'result_unknown': RESULT_UNKNOWN, 'counts': self.counts}
+        tmp_path = os.path.join(self.directory, INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w') as f: json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
+
+    def record(self, game, action):
+        """Appends game's current position with the action about to be played from it. Returns the row."""
+        if (game.board.width, game.board.height) != (self.width, self.height):
+            raise ValueError(f"Exporter is for {self.width}x{self.height} boards.")
+        if self._arrays is None or self.counts[-1] == self.chunk_size: self._start_chunk()
+        offset = self.counts[-1]
+        encode_position(game, self._arrays['planes'][offset], self._arrays['scalars'][offset])
+        self._arrays['actions'][offset] = game_action_code(game, action)
+        self.counts[-1] += 1
+        row = (len(self.counts) - 1) * self.chunk_size + offset
+        if game.export_token is None: game.export_token = self._next_token; self._next_token += 1
+        self._open_games.setdefault(game.export_token, []).append((row, game.current_player))
+        return row
+
+    def discard_last(self, game):
+        """Drops the row last recorded for game (its action was rejected)."""
+        rows = self._open_games.get(game.export_token)
+        if not rows or rows[-1][0] != (len(self.counts) - 1) * self.chunk_size + self.counts[-1] - 1: return
+        rows.pop(); self.counts[-1] -= 1
+
+    def finish_game(self, game):
+        """Fills in the result of every recorded position of game (game.winner None is a draw); Game calls it when the game ends."""
+        rows = self._open_games.pop(game.export_token, []); game.export_token = None
+        current_chunk = len(self.counts) - 1
+        for row, color in rows:
+            chunk, offset = divmod(row, self.chunk_size)
+            result = 0 if game.winner is None else (1 if game.winner == color else -1)
+            if chunk == current_chunk and self._arrays is not None: self._arrays['results'][offset] = result
+            else:
+                results = np.load(chunk_path(self.directory, chunk, 'results'), mmap_mode='r+')
+                results[offset] = result; results.flush()
+
+    def close(self):
+        """Flushes the chunk being filled and writes the index; unfinished games keep RESULT_UNKNOWN."""
+        self._flush_chunk(); self._write_index()
+
+def load_chunks(directory):
+    """Yields {name: read-only memmap} per chunk, each array trimmed to the rows written."""
+    require_numpy()
+    with open(os.path.join(directory, INDEX_FILE)) as f: index = json.load(f)
+    if index['version'] != EXPORT_VERSION: raise ValueError(f"Unsupported export version {index['version']}.")
+    for chunk, count in enumerate(index['counts']):
+        yield {name: np.load(chunk_path(directory, chunk, name), mmap_mode='r')[:count] for name in ARRAYS}
+
+def export_self_play(directory, games=100, depth=1, seed=0, max_plies=300, chunk_size=1 << 16, width=8, height=8):
+    """Plays games AI-vs-AI at the given search depth and exports every position moved from."""
+    import random
+    from game import Game
+    from search import quiet
+    rng_state = random.getstate()
+    try:
+        with TrainingExporter(directory, chunk_size, width, height) as exporter, quiet():
+            for game_index in range(games):
+                random.seed(seed + game_index)
+                game = Game(ai_player_color='white', ai_depth=depth, training_exporter=exporter, width=width, height=height)
+                for _ in range(max_plies):
+                    if game.game_over: break
+                    game.ai_player_color = game.current_player; game.handle_ai_turn()
+    finally:
+        random.setstate(rng_state)
+    return len(exporter)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Export self-play positions as memory-mapped training arrays.")
+    parser.add_argument('directory')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--chunk-size', type=int, default=1 << 16)
+    parser.add_argument('--width', type=int, default=8)
+    parser.add_argument('--height', type=int, default=8)
+    args = parser.parse_args()
+    rows = export_self_play(args.directory, args.games, args.depth, args.seed, args.max_plies, args.chunk_size,
+                            args.width, args.height)
+    print(f"Exported {rows} positions to {args.directory}.")
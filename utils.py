@@ -1,30 +1,32 @@
-def algebraic_to_coords(algebraic_notation_str):
+MAX_FILES = 26 # Files are single letters a..z
+
+def algebraic_to_coords(algebraic_notation_str, width=8, height=8):
     """
-    Converts algebraic notation (e.g., "e2") to board coordinates (row, col).
-    (0,0) is 'a8', (7,7) is 'h1'.
-    Row index maps from '8' (0) down to '1' (7).
-    Col index maps from 'a' (0) to 'h' (7).
+    Converts algebraic notation (e.g., "e2", or "b12" on tall boards) to board coordinates (row, col).
+    On the standard 8x8 board (0,0) is 'a8', (7,7) is 'h1'.
+    Row index maps from the top rank (0) down to '1' (height - 1).
+    Col index maps from 'a' (0) to the last file (width - 1).
     """
-    if not isinstance(algebraic_notation_str, str) or len(algebraic_notation_str) != 2:
+    if not isinstance(algebraic_notation_str, str) or not 2 <= len(algebraic_notation_str) <= 1 + len(str(height)):
         # print(f"Invalid algebraic notation format: {algebraic_notation_str}")
         return None
 
     col_char = algebraic_notation_str[0].lower()
-    row_char = algebraic_notation_str[1]
+    row_str = algebraic_notation_str[1:]
 
-    if not ('a' <= col_char <= 'h' and '1' <= row_char <= '8'):
+    if not ('a' <= col_char < chr(ord('a') + width) and row_str.isdigit() and row_str[0] != '0' and 1 <= int(row_str) <= height):
         # print(f"Invalid algebraic notation values: {algebraic_notation_str}")
         return None
 
     col = ord(col_char) - ord('a')
-    row = 8 - int(row_char) # '8' becomes row 0, '1' becomes row 7
+    row = height - int(row_str) # The top rank becomes row 0, '1' becomes row height - 1
 
     return (row, col)
 
-def coords_to_algebraic(coords_tuple):
+def coords_to_algebraic(coords_tuple, width=8, height=8):
     """
     Converts board coordinates (row, col) to algebraic notation (e.g., "e2").
-    (0,0) is 'a8', (7,7) is 'h1'.
+    On the standard 8x8 board (0,0) is 'a8', (7,7) is 'h1'.
     """
     if not isinstance(coords_tuple, tuple) or len(coords_tuple) != 2:
         # print(f"Invalid coordinate format: {coords_tuple}")
@@ -32,12 +34,12 @@ def coords_to_algebraic(coords_tuple):
 
     row, col = coords_tuple
 
-    if not (0 <= row <= 7 and 0 <= col <= 7):
+    if not (isinstance(row, int) and isinstance(col, int) and 0 <= row < height and 0 <= col < width):
         # print(f"Invalid coordinate values: {coords_tuple}")
         return None
 
     col_char = chr(ord('a') + col)
-    row_char = str(8 - row)
+    row_char = str(height - row)
 
     return col_char + row_char
 
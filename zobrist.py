@@ -0,0 +1,50 @@
+import hashlib
+from functools import lru_cache
+
+from timers import turn_clock, turns_left
+
+# Position hashing for the opening book and search caches.
+# Keys are derived from a hash of the feature name instead of a seeded RNG, so every
+# process (book builder, AI workers, simulators) computes identical hashes without
+# having to agree on table generation order.
+
+COOLDOWN_CAP = 15 # Cooldowns above this hash identically; no ability has a longer cooldown
+SP_CAP = 63 # Likewise for SP; the most expensive special costs 15
+
+@lru_cache(maxsize=None)
+def feature_key(*parts):
+    """Returns a stable 64-bit key for a feature, e.g. feature_key('piece', 'white', 'PAWN', 52)."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def square_hash(piece, tile_effect, sq, abilities=True, clock=0):
+    """Hash contribution of one square: its piece (with ability/status state) and its tile effect. Timers count from clock."""
+    h = feature_key('tile', tile_effect, sq) if tile_effect is not None else 0
+    if piece is None: return h
+    h ^= feature_key('piece', piece.color, piece.piece_type_name, sq)
+    if abilities and piece.ability is not None:
+        h ^= feature_key('ability', piece.ability.name, min(turns_left(piece.ability_ready_at, clock), COOLDOWN_CAP), sq)
+    frozen = turns_left(piece.status_effects.get('frozen', 0), clock)
+    if frozen > 0: h ^= feature_key('frozen', frozen, sq)
+    if piece.has_speed_buff: h ^= feature_key('speed', sq)
+    return h
+
+def position_hash(game, abilities=True):
+    """
+    Hashes everything that affects which actions are legal and how the game continues:
+    pieces and their ability/status state, tile effects, side to move, SP, captured
+    pieces available for redeploy, the board evolution timer and (if not 8x8) the board size.
+    abilities=False leaves out the pieces' abilities and cooldowns (see opening_book.py).
+    """
+    board = game.board; clock = turn_clock(game)
+    h = feature_key('to_move', game.current_player)
+    if (board.width, board.height) != (8, 8): h ^= feature_key('size', board.width, board.height)
+    for sq, (piece, tile_effect) in enumerate(zip(board.grid, board.tile_effects)):
+        if piece is not None or tile_effect is not None:
+            h ^= square_hash(piece, tile_effect, sq, abilities, clock)
+    for color in ('white', 'black'):
+        h ^= feature_key('sp', color, min(game.player_sp[color], SP_CAP))
+        for type_name in set(game.player_lost_pieces[color]):
+            h ^= feature_key('lost', color, type_name, game.player_lost_pieces[color].count(type_name))
+    h ^= feature_key('evolution', board.board_evolution_timer)
+    return h